@@ -0,0 +1,84 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.authentication import TokenAuthentication
+
+TOKEN_KEY = 'token:{}'
+REVOKED = 'revoked'
+
+
+class LRUCache:
+    """Ограниченный по размеру словарь процесса с вытеснением
+    давно не использованных записей и сроком жизни timeout секунд."""
+
+    def __init__(self, size, timeout):
+        self.size = size
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self.items = OrderedDict()
+
+    def get(self, key):
+        with self.lock:
+            item = self.items.get(key)
+            if item is None:
+                return None
+            expires, value = item
+            if expires <= time.monotonic():
+                del self.items[key]
+                return None
+            self.items.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.items[key] = (time.monotonic() + self.timeout, value)
+            self.items.move_to_end(key)
+            while len(self.items) > self.size:
+                self.items.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.items.pop(key, None)
+
+
+tokens = LRUCache(settings.TOKEN_CACHE_SIZE, settings.TOKEN_LOCAL_TIMEOUT)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Аутентификация по токену без запроса к БД на каждый запрос.
+
+    Токен с пользователем хранится в LRU процесса не дольше
+    TOKEN_LOCAL_TIMEOUT и в общем кеше не дольше TOKEN_CACHE_TIMEOUT.
+    Выход, смена пароля и любое сохранение пользователя убирают токен
+    из общего кеша и LRU своего процесса; остальные процессы перестают
+    принимать его, когда истечёт их запись LRU.
+    """
+
+    def authenticate_credentials(self, key):
+        token = tokens.get(key)
+        if token is not None:
+            return token.user, token
+        cache_key = TOKEN_KEY.format(key)
+        token = cache.get(cache_key)
+        if token is None or token == REVOKED:
+            revoked = token is not None
+            _, token = super().authenticate_credentials(key)
+            if revoked:
+                return token.user, token
+            # add, а не set: запрос, прочитавший токен до отзыва, не
+            # перезапишет отметку об отзыве.
+            cache.add(cache_key, token, settings.TOKEN_CACHE_TIMEOUT)
+        tokens.set(key, token)
+        return token.user, token
+
+
+def invalidate_tokens(keys):
+    """Отзыв токенов: в общем кеше на их месте остаётся отметка, пока
+    идущие запросы ещё могут прочитать из БД прежний токен."""
+    cache.set_many({TOKEN_KEY.format(key): REVOKED for key in keys},
+                   settings.TOKEN_LOCAL_TIMEOUT)
+    for key in keys:
+        tokens.delete(key)
@@ -0,0 +1,18 @@
+from django.core.checks import Warning, register
+
+from .exporters import format_error
+
+
+@register()
+def check_pdf_font(app_configs, **kwargs):
+    """Без шрифта выгрузка списка покупок в PDF отвечает ошибкой 503."""
+    error = format_error('pdf')
+    if error is None:
+        return []
+    return [Warning(
+        error,
+        hint=('Установите шрифт с кириллицей (например, пакет '
+              'fonts-dejavu-core) или укажите путь к нему в '
+              'SHOPPING_CART_FONT.'),
+        id='api.W001',
+    )]
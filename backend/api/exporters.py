@@ -0,0 +1,106 @@
+import csv
+import os
+from functools import lru_cache
+from itertools import chain
+
+from django.conf import settings
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.utils import simpleSplit
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+
+TITLE = 'Список покупок:'
+BUFFER_SIZE = 8 * 1024
+
+PDF_FONT = 'ShoppingList'
+PDF_FONT_SIZE = 12
+PDF_LEADING = 16
+PDF_MARGIN = 50
+
+
+class Echo:
+    """Псевдофайл для csv.writer, возвращающий записанную строку."""
+
+    def write(self, value):
+        return value
+
+
+def buffered(chunks, size=BUFFER_SIZE):
+    """Склеивает мелкие куски ответа в блоки около size байт."""
+    buffer, length = [], 0
+    for chunk in chunks:
+        buffer.append(chunk)
+        length += len(chunk)
+        if length >= size:
+            yield b''.join(buffer)
+            buffer, length = [], 0
+    if buffer:
+        yield b''.join(buffer)
+
+
+def export_txt(ingredients):
+    yield f'{TITLE}\n'.encode()
+    for name, unit, amount in ingredients:
+        yield f'{name} - {amount}, {unit}\n'.encode()
+
+
+def export_csv(ingredients):
+    writer = csv.writer(Echo())
+    yield '\ufeff'.encode()
+    yield writer.writerow(('Ингредиент', 'Количество', 'Единица')).encode()
+    for name, unit, amount in ingredients:
+        yield writer.writerow((name, amount, unit)).encode()
+
+
+def format_error(file_format):
+    """Сообщение, если выгрузка в формате file_format недоступна."""
+    font = settings.SHOPPING_CART_FONT
+    if file_format == 'pdf' and not os.path.isfile(font):
+        return f'Выгрузка в PDF недоступна: не найден шрифт {font}'
+    return None
+
+
+@lru_cache(maxsize=1)
+def register_font(path):
+    """Шрифт с кириллицей; reportlab встраивает в PDF только
+    использованные глифы."""
+    pdfmetrics.registerFont(TTFont(PDF_FONT, path))
+    return PDF_FONT
+
+
+def export_pdf(ingredients):
+    font = register_font(settings.SHOPPING_CART_FONT)
+    page_width, page_height = A4
+    width = page_width - 2 * PDF_MARGIN
+    top = page_height - PDF_MARGIN
+    pdf = canvas.Canvas(None, pagesize=A4)
+    pdf.setFont(font, PDF_FONT_SIZE)
+    y = top
+    lines = chain((TITLE, ''), (f'{name} - {amount}, {unit}'
+                                for name, unit, amount in ingredients))
+    for line in lines:
+        for part in simpleSplit(line, font, PDF_FONT_SIZE, width) or ['']:
+            if y < PDF_MARGIN:
+                pdf.showPage()
+                pdf.setFont(font, PDF_FONT_SIZE)
+                y = top
+            pdf.drawString(PDF_MARGIN, y, part)
+            y -= PDF_LEADING
+    # Canvas собирает документ целиком при сохранении: ответ отдаёт его
+    # блоками.
+    data = pdf.getpdfdata()
+    for start in range(0, len(data), BUFFER_SIZE):
+        yield data[start:start + BUFFER_SIZE]
+
+
+EXPORTERS = {
+    'txt': export_txt,
+    'csv': export_csv,
+    'pdf': export_pdf,
+}
+
+
+def export(ingredients, file_format):
+    """Итератор байтов списка покупок в заданном формате."""
+    return buffered(EXPORTERS[file_format](ingredients))
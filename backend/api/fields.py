@@ -0,0 +1,60 @@
+import json
+
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
+from drf_extra_fields.fields import Base64FieldMixin, Base64ImageField
+from rest_framework import serializers
+
+
+class RecipeImageField(Base64ImageField):
+    """Изображение рецепта: base64-строка или файл из multipart-запроса.
+
+    Размер проверяется до декодирования base64 и чтения файла,
+    число пикселей — по заголовку изображения, без загрузки растра.
+    """
+
+    default_error_messages = {
+        'too_large': 'Размер изображения не должен превышать {max_size} байт',
+        'too_many_pixels': ('Изображение не должно превышать '
+                            '{max_pixels} пикселей'),
+    }
+
+    def to_internal_value(self, data):
+        if isinstance(data, UploadedFile):
+            self.check_size(data.size)
+            image = super(Base64FieldMixin, self).to_internal_value(data)
+        else:
+            if isinstance(data, str):
+                self.check_size(len(data.partition(';base64,')[2] or data)
+                                * 3 // 4)
+            image = super().to_internal_value(data)
+        width, height = image.image.size
+        if width * height > settings.RECIPE_IMAGE_MAX_PIXELS:
+            self.fail('too_many_pixels',
+                      max_pixels=settings.RECIPE_IMAGE_MAX_PIXELS)
+        return image
+
+    def check_size(self, size):
+        if size > settings.RECIPE_IMAGE_MAX_SIZE:
+            self.fail('too_large', max_size=settings.RECIPE_IMAGE_MAX_SIZE)
+
+
+def parse_multipart(data, json_fields):
+    """Обычный словарь из QueryDict multipart-запроса.
+
+    Поля json_fields передаются строкой JSON, список тегов можно
+    передать и повторяющимся полем.
+    """
+    parsed = data.dict()
+    for field in json_fields:
+        values = data.getlist(field)
+        if len(values) == 1 and isinstance(values[0], str):
+            try:
+                value = json.loads(values[0])
+            except ValueError:
+                raise serializers.ValidationError(
+                    {field: ['Ожидается строка JSON']})
+            parsed[field] = value if isinstance(value, list) else [value]
+        elif values:
+            parsed[field] = values
+    return parsed
@@ -1,24 +1,45 @@
+from django.conf import settings
+from django.db.models import Case, IntegerField, Value, When
 from django_filters import rest_framework as filters
+from rest_framework.filters import OrderingFilter
 
+from recipes.cache import LocalCache
 from recipes.models import Ingredient, Recipe, Tag
 
 
 class IngredienFilter(filters.FilterSet):
-    name = filters.CharFilter(
-        field_name='name',
-        lookup_expr='icontains'
-    )
+    name = filters.CharFilter(method='get_name')
 
     class Meta:
         model = Ingredient
         fields = ('name',)
 
+    def get_name(self, queryset, name, value):
+        """Сначала совпадения по началу названия, затем внутри него."""
+        return queryset.filter(name__icontains=value).annotate(
+            is_prefix=Case(
+                When(name__istartswith=value, then=Value(0)),
+                default=Value(1),
+                output_field=IntegerField()
+            )
+        ).order_by('is_prefix', 'name')[:settings.INGREDIENT_SEARCH_LIMIT]
+
+
+def get_tag_ids():
+    return dict(Tag.objects.values_list('slug', 'pk'))
+
+
+tag_ids = LocalCache('tags', get_tag_ids)
+
 
 class RecipeFilter(filters.FilterSet):
-    tags = filters.ModelMultipleChoiceFilter(
-        queryset=Tag.objects.all(),
-        field_name='tags__slug',
-        to_field_name='slug'
+    tags = filters.MultipleChoiceFilter(
+        choices=lambda: [(slug, slug) for slug in tag_ids.get()],
+        method='get_tags'
+    )
+    tags_match = filters.ChoiceFilter(
+        choices=(('any', 'Любой из тегов'), ('all', 'Все теги')),
+        method='get_tags_match'
     )
     is_favorite = filters.BooleanFilter(
         method='get_is_favorite'
@@ -26,10 +47,23 @@ class RecipeFilter(filters.FilterSet):
     is_in_shopping_cart = filters.BooleanFilter(
         method='get_is_in_shopping_cart'
     )
+    search = filters.CharFilter(method='get_search')
 
     class Meta:
         model = Recipe
-        fields = ('tags', 'author', 'is_favorite', 'is_in_shopping_cart')
+        fields = ('tags', 'tags_match', 'author', 'is_favorite',
+                  'is_in_shopping_cart', 'search')
+
+    def get_tags(self, queryset, name, value):
+        """Отбор по битовой маске тегов, слаги сверяются с кешем."""
+        ids = tag_ids.get()
+        return queryset.with_tags(
+            (ids[slug] for slug in value if slug in ids),
+            match_all=self.form.cleaned_data.get('tags_match') == 'all'
+        )
+
+    def get_tags_match(self, queryset, name, value):
+        return queryset
 
     def get_is_favorite(self, queryset, name, value):
         if self.request.user.is_authenticated and value:
@@ -40,3 +74,22 @@ class RecipeFilter(filters.FilterSet):
         if self.request.user.is_authenticated and value:
             return queryset.filter(carts__user=self.request.user)
         return queryset
+
+    def get_search(self, queryset, name, value):
+        return queryset.search(value)
+
+
+class RecipeOrderingFilter(OrderingFilter):
+    """Сортировка рецептов с id последним ключом для устойчивого порядка.
+
+    Результаты поиска без явной сортировки идут по релевантности.
+    """
+
+    def get_ordering(self, request, queryset, view):
+        if ('search_rank' in queryset.query.annotations
+                and not request.query_params.get(self.ordering_param)):
+            return ('-search_rank', '-id')
+        ordering = super().get_ordering(request, queryset, view)
+        if ordering and ordering[-1].lstrip('-') != 'id':
+            ordering = (*ordering, '-id')
+        return ordering
@@ -0,0 +1,285 @@
+import base64
+import json
+import statistics
+import tempfile
+from collections import Counter, defaultdict
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment
+from django.urls import resolve
+from rest_framework.test import APIClient
+
+from api.management.seeding import (add_subscriptions, add_to_lists,
+                                    create_ingredients, create_recipes,
+                                    create_tags, create_users, get_client,
+                                    make_image, measure, percentile, rollback)
+from api.urls import urlpatterns, v1_router
+from jobs.models import Job
+from recipes.feed import fan_out_author
+from recipes.models import Carts, Favorite, Recipe, ShoppingListItem
+from users.models import User
+
+PASSWORD = 'benchmark-password'
+NEW_PASSWORD = 'benchmark-password-new'
+CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+}
+
+
+class Command(BaseCommand):
+    help = ('Задержка, число запросов к БД и размер ответа для каждого '
+            'маршрута API на синтетических данных')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--authors', type=int, default=200)
+        parser.add_argument('--recipes-per-author', type=int, default=25)
+        parser.add_argument('--ingredients', type=int, default=2000)
+        parser.add_argument('--ingredients-per-recipe', type=int, default=8)
+        parser.add_argument('--tags', type=int, default=20)
+        parser.add_argument('--favorites', type=int, default=20,
+                            help='Рецептов в избранном и корзине '
+                                 'каждого пользователя')
+        parser.add_argument('--subscriptions', type=int, default=20,
+                            help='Подписок у каждого пользователя')
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--output', default='benchmark_api.json',
+                            help='Файл для результатов в JSON')
+
+    def validate(self, options):
+        """Сценарии подписки и добавления в списки требуют автора без
+        подписки и рецепта вне избранного и корзины пользователя."""
+        if options['recipes_per_author'] < 1:
+            raise CommandError('--recipes-per-author должно быть больше 0')
+        if options['subscriptions'] >= options['authors']:
+            raise CommandError('--subscriptions должно быть меньше '
+                               '--authors: нужен автор без подписки')
+        if (options['favorites']
+                >= options['authors'] * options['recipes_per_author']):
+            raise CommandError('--favorites должно быть меньше числа '
+                               'рецептов: нужен рецепт вне избранного')
+
+    def handle(self, *args, **options):
+        self.validate(options)
+        setup_test_environment()
+        self.timings = defaultdict(list)
+        self.queries = defaultdict(list)
+        self.sizes = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+        self.covered = set()
+        with tempfile.TemporaryDirectory() as media, \
+                override_settings(MEDIA_ROOT=media, CACHES=CACHES), \
+                rollback():
+            self.seed(options)
+            # Прогрев: ленивые импорты и кеши не должны попасть в замер.
+            self.recording = False
+            self.exercise(0)
+            self.recording = True
+            for iteration in range(1, options['iterations'] + 1):
+                self.exercise(iteration)
+        results = {
+            'database': connection.vendor,
+            'scale': {
+                name: options[name] for name in (
+                    'users', 'authors', 'recipes_per_author', 'ingredients',
+                    'ingredients_per_recipe', 'tags', 'favorites',
+                    'subscriptions', 'iterations',
+                )
+            },
+            'routes': {
+                route: self.summary(route) for route in self.timings
+            },
+            'uncovered': self.uncovered(),
+        }
+        with open(options['output'], 'w') as file:
+            json.dump(results, file, ensure_ascii=False, indent=2,
+                      sort_keys=True)
+            file.write('\n')
+        self.report(results)
+
+    def seed(self, options):
+        users = create_users(options['users'], prefix='reader')
+        authors = create_users(options['authors'])
+        self.tags = create_tags(options['tags'])
+        self.ingredients = create_ingredients(options['ingredients'])
+        recipes = create_recipes(
+            authors, options['recipes_per_author'], self.ingredients,
+            self.tags, options['ingredients_per_recipe']
+        )
+        add_to_lists(users, recipes, options['favorites'])
+        add_subscriptions(users, authors, options['subscriptions'])
+        for author in authors:
+            fan_out_author(author.pk)
+        ShoppingListItem.objects.rebuild()
+        # Вход и выход — отдельным пользователем: выход удаляет токен,
+        # которым авторизован основной клиент.
+        self.user, self.login_user = users[:2]
+        for user in users[:2]:
+            user.set_password(PASSWORD)
+            user.save(update_fields=('password',))
+        self.client = get_client(self.user)
+        self.author = authors[0]
+        self.recipe = recipes[0]
+        self.job = Job.objects.create(name='api.export_shopping_list',
+                                      user=self.user, status=Job.DONE)
+        self.listed = Recipe.objects.exclude(
+            pk__in=Favorite.objects.filter(user=self.user).values('recipe')
+        ).exclude(
+            pk__in=Carts.objects.filter(user=self.user).values('recipe')
+        ).first()
+        self.unfollowed = User.objects.filter(recipes_count__gt=0).exclude(
+            following__user=self.user
+        ).first()
+        self.image = ('data:image/jpeg;base64,'
+                      + base64.b64encode(make_image(0.01)).decode())
+
+    def call(self, route, expected, method, path, data=None, client=None,
+             **kwargs):
+        """Запрос с замером; route — шаблон маршрута для отчёта."""
+        elapsed, queries, response = measure(client or self.client, path,
+                                             method, data=data, **kwargs)
+        if response.status_code != expected:
+            raise CommandError(f'{method.upper()} {path}: ответ '
+                               f'{response.status_code}, ожидался {expected}')
+        if self.recording:
+            self.timings[route].append(elapsed * 1000)
+            self.queries[route].append(queries)
+            self.sizes[route].append(response.size)
+            self.statuses[route][response.status_code] += 1
+            self.covered.add(resolve(path.partition('?')[0]).url_name)
+        return response
+
+    def exercise(self, iteration):
+        """Один проход по всем маршрутам API.
+
+        Изменяющие запросы идут парами, поэтому каждый проход
+        начинается с одного и того же состояния данных.
+        """
+        call = self.call
+        author, recipe = self.author, self.recipe
+        tags = f'tags={self.tags[0].slug}&tags={self.tags[1].slug}'
+        call('GET /api/', 200, 'get', '/api/')
+
+        call('GET /api/users/', 200, 'get', '/api/users/')
+        call('GET /api/users/{id}/', 200, 'get', f'/api/users/{author.pk}/')
+        call('GET /api/users/me/', 200, 'get', '/api/users/me/')
+        call('POST /api/users/', 201, 'post', '/api/users/', {
+            'username': f'new{iteration}',
+            'email': f'new{iteration}@example.com',
+            'first_name': 'new', 'last_name': str(iteration),
+            'password': PASSWORD,
+        }, client=APIClient(), format='json')
+        call('POST /api/users/set_password/', 204, 'post',
+             '/api/users/set_password/',
+             {'current_password': PASSWORD, 'new_password': NEW_PASSWORD},
+             format='json')
+        call('POST /api/users/set_password/', 204, 'post',
+             '/api/users/set_password/',
+             {'current_password': NEW_PASSWORD, 'new_password': PASSWORD},
+             format='json')
+
+        anonymous = APIClient()
+        token = call('POST /api/auth/token/login/', 200, 'post',
+                     '/api/auth/token/login/',
+                     {'email': self.login_user.email, 'password': PASSWORD},
+                     client=anonymous, format='json').data['auth_token']
+        anonymous.credentials(HTTP_AUTHORIZATION=f'Token {token}')
+        call('POST /api/auth/token/logout/', 204, 'post',
+             '/api/auth/token/logout/', client=anonymous)
+
+        call('GET /api/users/subscriptions/', 200, 'get',
+             '/api/users/subscriptions/')
+        call('GET /api/users/subscriptions/?recipes_limit=3', 200, 'get',
+             '/api/users/subscriptions/?recipes_limit=3')
+        call('GET /api/users/subscriptions/?pagination=cursor', 200, 'get',
+             '/api/users/subscriptions/?pagination=cursor')
+        subscribe = f'/api/users/{self.unfollowed.pk}/subscribe/'
+        call('POST /api/users/{id}/subscribe/', 201, 'post', subscribe)
+        call('DELETE /api/users/{id}/subscribe/', 204, 'delete', subscribe)
+
+        call('GET /api/tags/', 200, 'get', '/api/tags/')
+        call('GET /api/tags/{id}/', 200, 'get',
+             f'/api/tags/{self.tags[0].pk}/')
+        call('GET /api/ingredients/', 200, 'get', '/api/ingredients/')
+        call('GET /api/ingredients/?name=', 200, 'get',
+             '/api/ingredients/?name=bench-ingredient-1')
+        call('GET /api/ingredients/{id}/', 200, 'get',
+             f'/api/ingredients/{self.ingredients[0].pk}/')
+
+        for query in ('', 'page=2', 'pagination=cursor', tags,
+                      f'{tags}&tags_match=all', f'author={author.pk}',
+                      'is_favorite=1', 'is_in_shopping_cart=1',
+                      'ordering=-favorites_count'):
+            route = '/api/recipes/' + (f'?{query.partition("=")[0]}'
+                                       if query else '')
+            call(f'GET {route}', 200, 'get',
+                 f'/api/recipes/?{query}' if query else '/api/recipes/')
+        call('GET /api/recipes/{id}/', 200, 'get',
+             f'/api/recipes/{recipe.pk}/')
+        call('GET /api/recipes/feed/', 200, 'get', '/api/recipes/feed/')
+        match = '&'.join(f'ingredients={ingredient.pk}'
+                         for ingredient in self.ingredients[:10])
+        call('GET /api/recipes/match/', 200, 'get',
+             f'/api/recipes/match/?{match}')
+        call('GET /api/recipes/match/?mode', 200, 'get',
+             f'/api/recipes/match/?{match}&mode=full')
+        for file_format in ('txt', 'csv', 'pdf'):
+            call(f'GET /api/recipes/download_shopping_cart/?format='
+                 f'{file_format}', 200, 'get',
+                 f'/api/recipes/download_shopping_cart/?format={file_format}')
+        for action in ('favorite', 'shopping_cart'):
+            path = f'/api/recipes/{self.listed.pk}/{action}/'
+            call(f'POST /api/recipes/{{id}}/{action}/', 201, 'post', path)
+            call(f'DELETE /api/recipes/{{id}}/{action}/', 204, 'delete',
+                 path)
+
+        data = {
+            'name': f'benchmark {iteration}', 'text': 'benchmark',
+            'cooking_time': 10, 'image': self.image,
+            'tags': [self.tags[0].pk],
+            'ingredients': [{'id': ingredient.pk, 'amount': 1}
+                            for ingredient in self.ingredients[:5]],
+        }
+        pk = call('POST /api/recipes/', 201, 'post', '/api/recipes/', data,
+                  format='json').data['id']
+        call('PATCH /api/recipes/{id}/', 200, 'patch', f'/api/recipes/{pk}/',
+             {**data, 'tags': [self.tags[1].pk]}, format='json')
+        call('DELETE /api/recipes/{id}/', 204, 'delete',
+             f'/api/recipes/{pk}/')
+
+        call('GET /api/jobs/{id}/', 200, 'get', f'/api/jobs/{self.job.pk}/')
+
+    def summary(self, route):
+        timings = self.timings[route]
+        return {
+            'requests': len(timings),
+            'statuses': {str(code): count for code, count
+                         in self.statuses[route].items()},
+            'p50_ms': round(statistics.median(timings), 3),
+            'p95_ms': round(percentile(timings, 95), 3),
+            'p99_ms': round(percentile(timings, 99), 3),
+            'mean_ms': round(statistics.mean(timings), 3),
+            'queries': max(self.queries[route]),
+            'bytes': max(self.sizes[route]),
+        }
+
+    def uncovered(self):
+        """Маршруты api/urls.py, не попавшие в замер (кроме djoser)."""
+        names = {pattern.name for pattern in (*urlpatterns, *v1_router.urls)
+                 if getattr(pattern, 'name', None)}
+        return sorted(names - self.covered)
+
+    def report(self, results):
+        self.stdout.write(f'{"route":58} {"p50":>8} {"p95":>8} {"p99":>8} '
+                          f'{"queries":>7} {"bytes":>8}')
+        for route, stats in sorted(results['routes'].items()):
+            self.stdout.write(
+                f'{route:58} {stats["p50_ms"]:8.2f} {stats["p95_ms"]:8.2f} '
+                f'{stats["p99_ms"]:8.2f} {stats["queries"]:7} '
+                f'{stats["bytes"]:8}'
+            )
+        if results['uncovered']:
+            self.stdout.write(self.style.WARNING(
+                'Маршруты без замера: ' + ', '.join(results['uncovered'])
+            ))
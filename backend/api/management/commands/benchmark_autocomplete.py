@@ -0,0 +1,89 @@
+import random
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test.utils import setup_test_environment
+
+from api.filters import IngredienFilter
+from api.management.seeding import (bulk_create, get_client, percentile,
+                                    rollback)
+from recipes.autocomplete import IngredientIndex
+from recipes.models import Ingredient
+from users.models import User
+
+SYLLABLES = ('ка', 'ро', 'ми', 'ла', 'со', 'ус', 'пер', 'гов', 'ядь',
+             'мо', 'рок', 'ва', 'ник', 'ель', 'ту', 'ри', 'бо', 'ша')
+
+
+class Command(BaseCommand):
+    help = 'Задержка автодополнения ингредиентов на каждое нажатие клавиши'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, default=100000)
+        parser.add_argument('--queries', type=int, default=500)
+        parser.add_argument(
+            '--backend', choices=('index', 'db', 'api'), default='index',
+            help='index — индекс в памяти, db — запрос к БД, '
+                 'api — полный запрос через API'
+        )
+
+    def handle(self, *args, **options):
+        generator = random.Random(0)
+        names = [
+            ''.join(generator.choice(SYLLABLES)
+                    for _ in range(generator.randint(2, 5)))
+            + f' {n}' for n in range(options['size'])
+        ]
+        keystrokes = [
+            word[:length]
+            for word in generator.sample(names, options['queries'])
+            for length in range(1, min(len(word), 8) + 1)
+        ]
+        limit = settings.INGREDIENT_SEARCH_LIMIT
+        if options['backend'] == 'index':
+            index = IngredientIndex(
+                (pk, name, 'г') for pk, name in enumerate(names)
+            )
+            self.report(lambda query: index.search(query, limit), keystrokes)
+            return
+        setup_test_environment()
+        with rollback():
+            bulk_create(Ingredient, [
+                Ingredient(name=name, measurement_unit='г') for name in names
+            ], 'name')
+            client = get_client(User.objects.create(
+                username='autocomplete', email='autocomplete@example.com'
+            ))
+            if options['backend'] == 'db':
+                ingredients = IngredienFilter(
+                    queryset=Ingredient.objects.all()
+                )
+                self.report(
+                    lambda query: list(ingredients.get_name(
+                        ingredients.queryset, 'name', query
+                    )),
+                    keystrokes
+                )
+            else:
+                self.report(
+                    lambda query: client.get(
+                        '/api/ingredients/', {'name': query}
+                    ),
+                    keystrokes
+                )
+
+    def report(self, search, keystrokes):
+        search(keystrokes[0])
+        timings = []
+        for query in keystrokes:
+            started = time.perf_counter()
+            search(query)
+            timings.append((time.perf_counter() - started) * 1000)
+        self.stdout.write(
+            f'запросов: {len(timings)}, '
+            f'p50: {statistics.median(timings):.3f} мс, '
+            f'p95: {percentile(timings, 95):.3f} мс, '
+            f'p99: {percentile(timings, 99):.3f} мс'
+        )
@@ -0,0 +1,187 @@
+import random
+import statistics
+import time
+from collections import Counter
+from heapq import merge
+from itertools import islice
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import (CaptureQueriesContext, override_settings,
+                               setup_test_environment)
+
+from api.management.seeding import (IMAGE, count_followers, create_recipes,
+                                    create_users, get_client, measure,
+                                    percentile, rollback)
+from recipes.feed import fan_out, fan_out_author, read_feed
+from recipes.models import FeedItem, Recipe, Subscribe
+from users.models import User
+
+PAGE_SIZE = 10
+DISTRIBUTIONS = ('uniform', 'zipf', 'celebrity')
+
+
+class Command(BaseCommand):
+    help = ('Лента подписок: запись при публикации, чтение по курсору '
+            'и сравнение с выборкой по каждому автору при разных '
+            'распределениях числа подписчиков')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--authors', type=int, default=200)
+        parser.add_argument('--follows-per-user', type=int, default=30)
+        parser.add_argument('--recipes-per-author', type=int, default=10)
+        parser.add_argument('--threshold', type=int, default=300,
+                            help='Порог подписчиков для чтения при запросе')
+        parser.add_argument('--distributions', nargs='+',
+                            choices=DISTRIBUTIONS, default=DISTRIBUTIONS)
+        parser.add_argument('--pages', type=int, default=5,
+                            help='Страниц ленты, пролистываемых курсором')
+        parser.add_argument('--iterations', type=int, default=50)
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        self.stdout.write(f'{"distribution":12} {"scenario":22} '
+                          f'{"p50":>8} {"p95":>8} {"p99":>8} '
+                          f'{"queries":>7}')
+        with override_settings(FEED_FAN_OUT_LIMIT=options['threshold']):
+            for distribution in options['distributions']:
+                with rollback():
+                    self.run(distribution, options)
+
+    def weights(self, distribution, count):
+        if distribution == 'zipf':
+            return [1 / (rank + 1) for rank in range(count)]
+        if distribution == 'celebrity':
+            # Один процент авторов собирает большую часть подписок.
+            top = max(1, count // 100)
+            return [count if rank < top else 1 for rank in range(count)]
+        return [1] * count
+
+    def run(self, distribution, options):
+        generator = random.Random(0)
+        readers = create_users(options['users'], prefix='feed')
+        authors = create_users(options['authors'])
+        weights = self.weights(distribution, len(authors))
+        follows = min(options['follows_per_user'], len(authors))
+        subscriptions = []
+        for reader in readers:
+            followed = set()
+            while len(followed) < follows:
+                followed.update(generator.choices(
+                    authors, weights, k=follows - len(followed)
+                ))
+            subscriptions.extend(Subscribe(user=reader, author=author)
+                                 for author in followed)
+        Subscribe.objects.bulk_create(subscriptions, batch_size=1000)
+        count_followers(authors)
+        create_recipes(authors, options['recipes_per_author'])
+        started = time.perf_counter()
+        for author in authors:
+            fan_out_author(author.pk)
+        celebrities = set(User.objects.filter(
+            pk__in=[author.pk for author in authors],
+            followers_count__gte=settings.FEED_FAN_OUT_LIMIT
+        ).values_list('pk', flat=True))
+        self.stdout.write(
+            f'{distribution}: подписок {len(subscriptions)}, популярных '
+            f'авторов {len(celebrities)}, записей ленты '
+            f'{FeedItem.objects.count()} за '
+            f'{time.perf_counter() - started:.1f} с'
+        )
+        self.report_publish(distribution, authors, generator, options)
+        # Читатель с наибольшим числом популярных авторов в подписках:
+        # его лента сливается из обоих источников.
+        reader = Counter(
+            item.user_id for item in subscriptions
+            if item.author_id in celebrities
+        ).most_common(1)
+        reader = User.objects.get(
+            pk=reader[0][0] if reader else readers[0].pk
+        )
+        client = get_client(reader)
+        self.report(distribution, 'лента, 1 страница', options,
+                    lambda: measure(client,
+                                    f'/api/recipes/feed/?limit={PAGE_SIZE}'))
+        self.report(distribution, f'лента, {options["pages"]} страниц',
+                    options, lambda: self.scroll(client, options['pages']))
+        self.report(distribution, 'ключи ленты', options,
+                    lambda: self.feed_keys(reader))
+        followed = list(Subscribe.objects.filter(
+            user=reader
+        ).values_list('author', flat=True))
+        self.report(distribution, 'по каждому автору', options,
+                    lambda: self.per_author(followed))
+        self.report(distribution, 'author IN (...)', options,
+                    lambda: self.author_in(followed))
+
+    def report_publish(self, distribution, authors, generator, options):
+        """Время записи нового рецепта в ленты подписчиков."""
+        timings = []
+        for _ in range(options['iterations']):
+            author = generator.choice(authors)
+            recipe = Recipe.objects.create(
+                author=author, name='новый рецепт', text='-', image=IMAGE,
+                cooking_time=10
+            )
+            started = time.perf_counter()
+            fan_out(recipe.pk)
+            timings.append((time.perf_counter() - started) * 1000)
+        self.write(distribution, 'публикация', timings, '-')
+
+    def scroll(self, client, pages):
+        path = f'/api/recipes/feed/?limit={PAGE_SIZE}'
+        elapsed = queries = 0
+        for _ in range(pages):
+            took, count, response = measure(client, path)
+            elapsed += took
+            queries += count
+            path = response.data['next']
+            if path is None:
+                break
+        return elapsed, queries, response
+
+    def feed_keys(self, reader):
+        """Чтение страницы ленты без сериализации рецептов."""
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            read_feed(reader, limit=PAGE_SIZE)
+            elapsed = time.perf_counter() - started
+        return elapsed, len(queries), None
+
+    def per_author(self, followed):
+        """Эмуляция ленты запросом к рецептам каждого автора."""
+        started = time.perf_counter()
+        pages = [
+            list(Recipe.objects.filter(author=author).order_by(
+                '-pub_date', '-id'
+            ).values_list('pub_date', 'pk')[:PAGE_SIZE])
+            for author in followed
+        ]
+        list(islice(merge(*pages, reverse=True), PAGE_SIZE))
+        return time.perf_counter() - started, len(followed), None
+
+    def author_in(self, followed):
+        started = time.perf_counter()
+        list(Recipe.objects.filter(author__in=followed).order_by(
+            '-pub_date', '-id'
+        ).values_list('pk', flat=True)[:PAGE_SIZE])
+        return time.perf_counter() - started, 1, None
+
+    def report(self, distribution, name, options, run):
+        run()
+        timings, queries = [], []
+        for _ in range(options['iterations']):
+            elapsed, count, _ = run()
+            timings.append(elapsed * 1000)
+            queries.append(count)
+        self.write(distribution, name, timings, max(queries))
+
+    def write(self, distribution, name, timings, queries):
+        self.stdout.write(
+            f'{distribution:12} {name:22} '
+            f'{statistics.median(timings):8.2f} '
+            f'{percentile(timings, 95):8.2f} '
+            f'{percentile(timings, 99):8.2f} {queries:>7}'
+        )
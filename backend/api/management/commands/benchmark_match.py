@@ -0,0 +1,178 @@
+import random
+import statistics
+import sys
+import time
+from itertools import accumulate
+
+from django.core.management.base import BaseCommand
+from django.db.models import Count, F, FloatField, Q
+from django.db.models.functions import Cast
+from django.test.utils import setup_test_environment
+
+from api.management.seeding import (IMAGE, create_users, get_client, measure,
+                                    percentile, rollback)
+from recipes.matching import ingredient_match
+from recipes.models import Ingredient, Recipe, RecipeIngredient
+
+PAGE_SIZE = 6
+
+
+class Command(BaseCommand):
+    help = ('Время подбора рецептов по имеющимся ингредиентам: '
+            'индекс процесса, API и агрегирующий SQL')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=1000000)
+        parser.add_argument('--authors', type=int, default=1000)
+        parser.add_argument('--ingredients', type=int, default=2000)
+        parser.add_argument('--min-ingredients', type=int, default=3)
+        parser.add_argument('--max-ingredients', type=int, default=12)
+        parser.add_argument('--iterations', type=int, default=50,
+                            help='Запросов на каждый сценарий')
+        parser.add_argument('--sql-iterations', type=int, default=5)
+        parser.add_argument('--batch-size', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        self.generator = random.Random(0)
+        with rollback():
+            user, ingredients = self.seed(options)
+            started = time.perf_counter()
+            ingredient_match.index = None
+            ingredient_match.match([])
+            self.stdout.write(f'Построение индекса: '
+                              f'{time.perf_counter() - started:.2f} с')
+            client = get_client(user)
+            pantries = {
+                '3 частых': ingredients[:3],
+                '10 случайных': self.pantry(ingredients, 10),
+                '30 случайных': self.pantry(ingredients, 30),
+            }
+            self.stdout.write(f'{"scenario":24} {"count":>8} {"p50":>8} '
+                              f'{"p95":>8} {"p99":>8}')
+            for name, pantry in pantries.items():
+                for mode in ('partial', 'full'):
+                    self.report(f'{name}, {mode}', options['iterations'],
+                                lambda: self.index_match(pantry, mode))
+                query = '&'.join(f'ingredients={pk}' for pk in pantry)
+                self.report(
+                    f'{name}, API', options['iterations'],
+                    lambda: measure(
+                        client,
+                        f'/api/recipes/match/?{query}&limit={PAGE_SIZE}'
+                    )[2].data['count']
+                )
+                self.report(f'{name}, SQL', options['sql_iterations'],
+                            lambda: self.sql_match(pantry))
+            self.report_updates(ingredients, options['iterations'])
+
+    def pantry(self, ingredients, size):
+        return self.generator.sample(ingredients, size)
+
+    def seed(self, options):
+        authors = create_users(options['authors'])
+        user, = create_users(1, prefix='match')
+        names = [f'ингредиент {n}' for n in range(options['ingredients'])]
+        Ingredient.objects.bulk_create(
+            Ingredient(name=name, measurement_unit='г') for name in names
+        )
+        ingredients = list(Ingredient.objects.filter(
+            name__in=names
+        ).order_by('id').values_list('pk', flat=True))
+        # Популярность ингредиентов по закону Ципфа: соль встречается
+        # почти везде, редкие специи — в единицах рецептов.
+        weights = list(accumulate(
+            1 / (rank + 1) for rank in range(len(ingredients))
+        ))
+        batch_size = options['batch_size']
+        created = 0
+        while created < options['recipes']:
+            count = min(batch_size, options['recipes'] - created)
+            Recipe.objects.bulk_create(
+                (Recipe(author=self.generator.choice(authors),
+                        name=f'рецепт {created + n}', text='-', image=IMAGE,
+                        cooking_time=10)
+                 for n in range(count)),
+                batch_size=1000
+            )
+            batch = Recipe.objects.order_by('-id').values_list(
+                'pk', flat=True
+            )[:count]
+            RecipeIngredient.objects.bulk_create(
+                (RecipeIngredient(recipe_id=pk, ingredient_id=ingredient,
+                                  amount=1)
+                 for pk in batch
+                 for ingredient in self.recipe_ingredients(ingredients,
+                                                           weights, options)),
+                batch_size=1000
+            )
+            created += count
+            self.stdout.write(f'Создано рецептов: {created}')
+        return user, ingredients
+
+    def recipe_ingredients(self, ingredients, weights, options):
+        size = self.generator.randint(options['min_ingredients'],
+                                      options['max_ingredients'])
+        chosen = set()
+        while len(chosen) < size:
+            chosen.update(self.generator.choices(
+                ingredients, cum_weights=weights, k=size - len(chosen)
+            ))
+        return chosen
+
+    def index_match(self, pantry, mode):
+        matches = ingredient_match.match(pantry, mode == 'full')
+        matches[:PAGE_SIZE]
+        return len(matches)
+
+    def sql_match(self, pantry):
+        """Тот же подбор агрегирующим запросом к RecipeIngredient."""
+        rows = RecipeIngredient.objects.values('recipe').annotate(
+            total=Count('id'),
+            matched=Count('id', filter=Q(ingredient__in=pantry))
+        ).filter(matched__gt=0).annotate(
+            coverage=Cast(F('matched'), FloatField()) / F('total')
+        ).order_by('-coverage', '-matched', '-recipe')
+        list(rows[:PAGE_SIZE])
+        return rows.count()
+
+    def report(self, name, iterations, run):
+        run()
+        timings = []
+        for _ in range(iterations):
+            started = time.perf_counter()
+            total = run()
+            timings.append((time.perf_counter() - started) * 1000)
+        self.stdout.write(
+            f'{name:24} {total:>8} {statistics.median(timings):8.2f} '
+            f'{percentile(timings, 95):8.2f} {percentile(timings, 99):8.2f}'
+        )
+
+    def report_updates(self, ingredients, iterations):
+        """Время применения изменённого рецепта к индексу."""
+        index = ingredient_match.index
+        recipes = self.generator.sample(range(1, len(index.sizes)),
+                                        iterations)
+        timings = []
+        for recipe in recipes:
+            rows = [(recipe, ingredient)
+                    for ingredient in self.pantry(ingredients, 5)]
+            started = time.perf_counter()
+            index.update([recipe], rows)
+            timings.append((time.perf_counter() - started) * 1000)
+        self.stdout.write(
+            f'{"обновление рецепта":24} {len(recipes):>8} '
+            f'{statistics.median(timings):8.2f} '
+            f'{percentile(timings, 95):8.2f} {percentile(timings, 99):8.2f}'
+        )
+        bitsets = [postings for postings in index.postings.values()
+                   if isinstance(postings, int)]
+        size = sum(map(sys.getsizeof, index.postings.values()))
+        reverse = sys.getsizeof(index.ingredients) + sum(
+            map(sys.getsizeof, index.ingredients.values())
+        )
+        self.stdout.write(
+            f'Индекс: {len(index.postings)} ингредиентов, из них '
+            f'{len(bitsets)} битовыми множествами; {size / 1024 ** 2:.1f} МБ, '
+            f'карта рецептов {reverse / 1024 ** 2:.1f} МБ'
+        )
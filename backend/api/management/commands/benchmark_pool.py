@@ -0,0 +1,127 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connection, connections
+from django.test.utils import setup_test_environment
+
+from api.management.seeding import (create_recipes, create_users, get_client,
+                                    percentile)
+from recipes.models import Recipe
+from users.models import User
+
+PREFIX = 'poolbench'
+
+
+class Command(BaseCommand):
+    help = ('Запросов в секунду на переключении избранного '
+            'с пулом соединений и без него (только PostgreSQL)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--duration', type=float, default=10,
+                            help='Длительность замера каждого режима, с')
+        parser.add_argument('--pool-size', type=int, default=4)
+        parser.add_argument('--pool-overflow', type=int, default=2)
+        parser.add_argument('--mode', choices=('direct', 'pooled'),
+                            help='Замер одного режима в текущем процессе')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Замер пула требует PostgreSQL')
+        if options['mode']:
+            self.stdout.write(json.dumps(self.run_load(options)))
+            return
+        # Данные фиксируются: их читают другие процессы и потоки.
+        users = create_users(options['threads'], prefix=PREFIX)
+        recipe, = create_recipes(users[:1], 1)
+        for user in users:
+            get_client(user)
+        try:
+            results = {mode: self.run_child(mode, options)
+                       for mode in ('direct', 'pooled')}
+        finally:
+            Recipe.objects.filter(pk=recipe.pk).delete()
+            User.objects.filter(username__startswith=PREFIX).delete()
+        self.stdout.write('mode      requests    rps    p50_ms  p99_ms  '
+                          'errors')
+        for mode, result in results.items():
+            self.stdout.write(
+                f'{mode:9} {result["requests"]:8} {result["rps"]:6.0f} '
+                f'{result["p50_ms"]:9.2f} {result["p99_ms"]:7.2f} '
+                f'{result["errors"]:7}'
+            )
+        self.stdout.write('Пул: ' + json.dumps(results['pooled']['pool']))
+
+    def run_child(self, mode, options):
+        """Замер в отдельном процессе: движок БД выбирается при запуске."""
+        environment = {
+            **os.environ,
+            'DB_POOL': str(mode == 'pooled'),
+            'DB_POOL_SIZE': str(options['pool_size']),
+            'DB_POOL_OVERFLOW': str(options['pool_overflow']),
+        }
+        child = subprocess.run(
+            [sys.executable, sys.argv[0], 'benchmark_pool', '--mode', mode,
+             '--threads', str(options['threads']),
+             '--duration', str(options['duration'])],
+            env=environment, capture_output=True, text=True
+        )
+        if child.returncode:
+            raise CommandError(f'Замер {mode} завершился с ошибкой:\n'
+                               f'{child.stderr}')
+        return json.loads(child.stdout.splitlines()[-1])
+
+    def run_load(self, options):
+        setup_test_environment()
+        users = list(User.objects.filter(
+            username__startswith=PREFIX
+        ).order_by('id'))
+        recipe = Recipe.objects.get(author=users[0])
+        connections.close_all()
+        timings, errors = [], []
+        deadline = time.monotonic() + options['duration']
+
+        def worker(user):
+            client = get_client(user)
+            path = f'/api/recipes/{recipe.pk}/favorite/'
+            # Как обработчик WSGI: соединение закрывается после
+            # каждого запроса, с пулом — возвращается в пул.
+            close_old_connections()
+            while time.monotonic() < deadline:
+                for method in ('post', 'delete'):
+                    started = time.perf_counter()
+                    try:
+                        response = getattr(client, method)(path)
+                    except Exception as error:
+                        errors.append(repr(error))
+                    else:
+                        if response.status_code >= 400:
+                            errors.append(response.status_code)
+                    finally:
+                        close_old_connections()
+                    timings.append(time.perf_counter() - started)
+            connections.close_all()
+
+        threads = [threading.Thread(target=worker, args=(user,))
+                   for user in users[:options['threads']]]
+        started = time.monotonic()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.monotonic() - started
+        pool = getattr(connection, 'pool_stats', lambda: {})()
+        return {
+            'requests': len(timings),
+            'rps': len(timings) / elapsed,
+            'p50_ms': statistics.median(timings) * 1000,
+            'p99_ms': percentile(timings, 99) * 1000,
+            'errors': len(errors),
+            'pool': pool,
+        }
@@ -0,0 +1,144 @@
+import random
+import statistics
+from itertools import accumulate
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment
+
+from api.management.seeding import (IMAGE, add_to_lists, create_tags,
+                                    create_users, get_client, measure,
+                                    percentile, rollback)
+from recipes.models import Ingredient, Recipe, RecipeIngredient, tags_mask
+from recipes.search import update_search_index
+
+SYLLABLES = ('ка', 'ро', 'ми', 'ла', 'со', 'ус', 'пер', 'гов', 'ядь',
+             'мо', 'рок', 'ва', 'ник', 'ель', 'ту', 'ри', 'бо', 'ша')
+
+
+class Command(BaseCommand):
+    help = ('Время полнотекстового поиска рецептов через API '
+            'на синтетическом корпусе')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--recipes', type=int, default=1000000)
+        parser.add_argument('--authors', type=int, default=1000)
+        parser.add_argument('--ingredients', type=int, default=2000)
+        parser.add_argument('--ingredients-per-recipe', type=int, default=5)
+        parser.add_argument('--words', type=int, default=5000,
+                            help='Размер словаря корпуса')
+        parser.add_argument('--tags', type=int, default=20)
+        parser.add_argument('--iterations', type=int, default=50,
+                            help='Запросов на каждый сценарий')
+        parser.add_argument('--batch-size', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Полнотекстовый поиск есть только в '
+                               'PostgreSQL')
+        setup_test_environment()
+        self.generator = random.Random(0)
+        words = sorted({
+            ''.join(self.generator.choice(SYLLABLES)
+                    for _ in range(self.generator.randint(2, 4)))
+            for _ in range(options['words'] * 2)
+        })[:options['words']]
+        self.generator.shuffle(words)
+        # Частоты слов по закону Ципфа: у корпуса есть и частые,
+        # и редкие слова.
+        self.words = words
+        self.weights = list(accumulate(
+            1 / (rank + 1) for rank in range(len(words))
+        ))
+        with rollback():
+            user, tags = self.seed(options)
+            client = get_client(user)
+            common, rare = words[0], words[len(words) // 2]
+            scenarios = {
+                'частое слово': f'search={common}',
+                'редкое слово': f'search={rare}',
+                'два слова': f'search={common} {words[1]}',
+                'ингредиент': f'search={self.ingredient_names[0]}',
+                'с тегом': f'search={common}&tags={tags[0].slug}',
+                'в избранном': f'search={common}&is_favorite=1',
+                'вторая страница': f'search={common}&page=2',
+                'курсор': f'search={common}&pagination=cursor',
+            }
+            self.stdout.write(f'{"scenario":18} {"count":>8} {"p50":>8} '
+                              f'{"p95":>8} {"p99":>8} {"queries":>7}')
+            for name, query in scenarios.items():
+                self.report(client, name, f'/api/recipes/?{query}',
+                            options['iterations'])
+
+    def text(self, low, high):
+        return ' '.join(self.generator.choices(
+            self.words, cum_weights=self.weights,
+            k=self.generator.randint(low, high)
+        ))
+
+    def seed(self, options):
+        authors = create_users(options['authors'])
+        user, = create_users(1, prefix='search')
+        tags = create_tags(options['tags'])
+        self.ingredient_names = [self.text(1, 2) + f' {n}'
+                                 for n in range(options['ingredients'])]
+        Ingredient.objects.bulk_create(
+            Ingredient(name=name, measurement_unit='г')
+            for name in self.ingredient_names
+        )
+        ingredients = list(Ingredient.objects.filter(
+            name__in=self.ingredient_names
+        ).values_list('pk', flat=True))
+        batch_size = options['batch_size']
+        pks = []
+        for start in range(0, options['recipes'], batch_size):
+            count = min(batch_size, options['recipes'] - start)
+            recipes = [
+                Recipe(author=self.generator.choice(authors),
+                       name=self.text(2, 4), text=self.text(10, 30),
+                       image=IMAGE, cooking_time=10,
+                       tags_mask=tags_mask([tags[n % len(tags)].pk]))
+                for n in range(start, start + count)
+            ]
+            Recipe.objects.bulk_create(recipes, batch_size=1000)
+            batch = list(Recipe.objects.order_by('-id').values_list(
+                'pk', flat=True
+            )[:count])[::-1]
+            Recipe.tags.through.objects.bulk_create(
+                (Recipe.tags.through(recipe_id=pk,
+                                     tag=tags[n % len(tags)])
+                 for n, pk in enumerate(batch, start)),
+                batch_size=1000
+            )
+            RecipeIngredient.objects.bulk_create(
+                (RecipeIngredient(recipe_id=pk, ingredient_id=ingredient,
+                                  amount=1)
+                 for pk in batch
+                 for ingredient in self.generator.sample(
+                     ingredients, options['ingredients_per_recipe'])),
+                batch_size=1000
+            )
+            with connection.cursor() as cursor:
+                # Статистика нужна подзапросу с именами ингредиентов.
+                cursor.execute('ANALYZE recipes_recipeingredient')
+            update_search_index(batch)
+            pks.extend(batch)
+            self.stdout.write(f'Создано рецептов: {len(pks)}')
+        favorites = [Recipe(pk=pk) for pk in pks[::100]]
+        add_to_lists([user], favorites, len(favorites))
+        return user, tags
+
+    def report(self, client, name, path, iterations):
+        measure(client, path)
+        timings, queries = [], []
+        for _ in range(iterations):
+            elapsed, count, response = measure(client, path)
+            timings.append(elapsed * 1000)
+            queries.append(count)
+        total = response.data.get('count')
+        self.stdout.write(
+            f'{name:18} {"-" if total is None else total:>8} '
+            f'{statistics.median(timings):8.2f} '
+            f'{percentile(timings, 95):8.2f} '
+            f'{percentile(timings, 99):8.2f} {max(queries):7}'
+        )
@@ -0,0 +1,57 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test.utils import setup_test_environment
+
+from api.management.seeding import (create_recipes, create_users, get_client,
+                                    measure, rollback, subscribe)
+
+
+class Command(BaseCommand):
+    help = ('Число запросов и время чтения всех страниц подписок '
+            'в зависимости от числа подписок и recipes_limit')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--subscriptions', type=int, nargs='+',
+                            default=[10, 100, 500])
+        parser.add_argument('--recipes-limit', type=int, nargs='+',
+                            default=[1, 3, 10])
+        parser.add_argument('--recipes-per-author', type=int, default=12)
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        self.stdout.write('subscriptions recipes_limit pages '
+                          'page_min page_max queries ms')
+        with rollback():
+            reader, = create_users(1, prefix='reader')
+            client = get_client(reader)
+            followed = []
+            for count in sorted(options['subscriptions']):
+                authors = create_users(count - len(followed))
+                create_recipes(authors, options['recipes_per_author'])
+                subscribe(reader, authors)
+                followed.extend(authors)
+                for recipes_limit in options['recipes_limit']:
+                    queries, elapsed = self.read_all(
+                        client, min(count, settings.MAX_PAGE_SIZE),
+                        recipes_limit
+                    )
+                    self.stdout.write(
+                        f'{count:13} {recipes_limit:13} {len(queries):5} '
+                        f'{min(queries):8} {max(queries):8} '
+                        f'{sum(queries):7} {elapsed * 1000:.1f}'
+                    )
+
+    def read_all(self, client, limit, recipes_limit):
+        """Обход всех страниц подписок: limit не больше MAX_PAGE_SIZE.
+
+        Возвращает число запросов каждой страницы и общее время.
+        """
+        path = (f'/api/users/subscriptions/?limit={limit}'
+                f'&recipes_limit={recipes_limit}')
+        queries, elapsed = [], 0
+        while path:
+            took, count, response = measure(client, path)
+            queries.append(count)
+            elapsed += took
+            path = response.data['next']
+        return queries, elapsed
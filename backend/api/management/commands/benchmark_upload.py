@@ -0,0 +1,88 @@
+import base64
+import io
+import json
+import multiprocessing
+import resource
+import tempfile
+import tracemalloc
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test.utils import override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from api.management.seeding import (create_ingredients, create_tags,
+                                    create_users, make_image, rollback)
+from api.views import RecipeViewSet
+
+
+def build_request(path, image, tag, ingredient):
+    data = {'name': 'benchmark', 'text': 'benchmark', 'cooking_time': 10}
+    ingredients = [{'id': ingredient.id, 'amount': 1}]
+    if path == 'base64':
+        return APIRequestFactory().post('/api/recipes/', {
+            **data, 'tags': [tag.id], 'ingredients': ingredients,
+            'image': 'data:image/jpeg;base64,'
+                     + base64.b64encode(image).decode(),
+        }, format='json')
+    file = io.BytesIO(image)
+    file.name = 'benchmark.jpg'
+    return APIRequestFactory().post('/api/recipes/', {
+        **data, 'tags': tag.id, 'ingredients': json.dumps(ingredients),
+        'image': file,
+    }, format='multipart')
+
+
+def run(path, image, queue):
+    """Замер в отдельном процессе, чтобы пик RSS не зависел от других."""
+    connections.close_all()
+    with tempfile.TemporaryDirectory() as media, \
+            override_settings(MEDIA_ROOT=media), rollback():
+        user, = create_users(1, prefix='upload')
+        tag, = create_tags(1)
+        ingredient, = create_ingredients(1)
+        view = RecipeViewSet.as_view({'post': 'create'})
+        # Прогрев: ленивые импорты и кеши не должны попасть в замер.
+        warmup = build_request(path, make_image(0.01), tag, ingredient)
+        force_authenticate(warmup, user)
+        view(warmup)
+        request = build_request(path, image, tag, ingredient)
+        force_authenticate(request, user)
+        baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        tracemalloc.start()
+        response = view(request)
+        _, traced = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    connections.close_all()
+    queue.put((response.status_code, int(request.META['CONTENT_LENGTH']),
+               (peak - baseline) * 1024, traced))
+
+
+class Command(BaseCommand):
+    help = ('Пиковое потребление памяти при загрузке изображения рецепта '
+            'в base64 и через multipart/form-data')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--megapixels', type=float, nargs='+',
+                            default=[1, 4, 12])
+
+    def handle(self, *args, **options):
+        context = multiprocessing.get_context('fork')
+        self.stdout.write('path      megapixels status body_kb '
+                          'rss_delta_kb python_peak_kb')
+        for megapixels in options['megapixels']:
+            image = make_image(megapixels)
+            for path in ('base64', 'multipart'):
+                queue = context.Queue()
+                process = context.Process(target=run,
+                                          args=(path, image, queue))
+                process.start()
+                process.join()
+                if process.exitcode:
+                    raise CommandError(f'Замер {path} завершился с ошибкой')
+                status, body, rss, traced = queue.get()
+                self.stdout.write(
+                    f'{path:9} {megapixels:10} {status:6} {body // 1024:7} '
+                    f'{rss // 1024:12} {traced // 1024:14}'
+                )
@@ -0,0 +1,187 @@
+import json
+import re
+from itertools import combinations, product
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+
+from api.management.seeding import (add_to_lists, create_ingredients,
+                                    create_recipes, create_tags, create_users,
+                                    get_client, rollback)
+from recipes.models import Carts, Favorite, Recipe, RecipeIngredient, Subscribe
+from recipes.search import update_search_index
+from users.models import User
+
+LARGE_MODELS = (User, Recipe, RecipeIngredient, Recipe.tags.through,
+                Favorite, Carts, Subscribe)
+# COUNT(*), читающий хотя бы такую долю таблицы, индекс не ускорит.
+COUNT_SHARE = 0.1
+# Условие на битовую маску тегов индексом не поддерживается.
+TAGS_MASK_FILTER = re.compile(r'^\(+tags_mask & [^)]+\)+ [=>] [^()]+\)$')
+
+
+def walk(plan):
+    yield plan
+    for child in plan.get('Plans', ()):
+        yield from walk(child)
+
+
+class Command(BaseCommand):
+    help = ('Проверка планов запросов списка рецептов со всеми '
+            'сочетаниями фильтров: ошибка при полном сканировании или '
+            'сортировке большой таблицы')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--authors', type=int, default=2000)
+        parser.add_argument('--recipes-per-author', type=int, default=25)
+        parser.add_argument('--tags', type=int, default=20)
+        parser.add_argument('--ingredients', type=int, default=2000)
+        parser.add_argument('--per-user', type=int, default=10,
+                            help='Рецептов в избранном и корзине '
+                                 'каждого пользователя')
+        parser.add_argument('--min-rows', type=int, default=10000,
+                            help='Размер таблицы, начиная с которого '
+                                 'она считается большой')
+        parser.add_argument('--verbose-plans', action='store_true')
+
+    def handle(self, *args, **options):
+        # Тестовому клиенту нужен только хост testserver: тестовое
+        # окружение целиком не настраивается, его может уже настроить
+        # pytest.
+        with override_settings(
+            ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']
+        ), rollback():
+            violations = self.check_plans(options)
+        if violations:
+            raise CommandError('Найдены проблемные планы:\n'
+                               + '\n'.join(violations))
+        self.stdout.write(self.style.SUCCESS('Все планы используют индексы'))
+
+    def seed(self, options):
+        authors = create_users(options['authors'])
+        tags = create_tags(options['tags'])
+        recipes = create_recipes(
+            authors, options['recipes_per_author'],
+            create_ingredients(options['ingredients']), tags, 5
+        )
+        add_to_lists(authors, recipes, options['per_user'])
+        with connection.cursor() as cursor:
+            # Без статистики подзапрос с именами ингредиентов в
+            # update_search_index перебирает всю таблицу на каждый рецепт.
+            cursor.execute('ANALYZE')
+            update_search_index([recipe.pk for recipe in recipes])
+            cursor.execute('ANALYZE')
+        return authors, tags
+
+    def check_plans(self, options):
+        authors, tags = self.seed(options)
+        sizes = {model._meta.db_table: model.objects.count()
+                 for model in LARGE_MODELS}
+        self.large = {table: size for table, size in sizes.items()
+                      if size >= options['min_rows']}
+        self.stdout.write('Большие таблицы: ' + ', '.join(sorted(self.large)))
+        client = get_client(authors[0])
+        # У фильтра может быть несколько вариантов запроса.
+        filters = {
+            'tags': [f'tags={tags[0].slug}&tags={tags[1].slug}',
+                     f'tags={tags[0].slug}&tags={tags[1].slug}'
+                     '&tags_match=all'],
+            'author': [f'author={authors[1].pk}'],
+            'is_favorite': ['is_favorite=true'],
+            'is_in_shopping_cart': ['is_in_shopping_cart=true'],
+        }
+        # Полнотекстовый индекс есть только в PostgreSQL.
+        if connection.vendor == 'postgresql':
+            filters['search'] = [f'search={authors[1].username}']
+        violations = []
+        for size in range(len(filters) + 1):
+            for names in combinations(filters, size):
+                for params in product(*(filters[name] for name in names)):
+                    for pagination in ('pagination=cursor', 'page=1'):
+                        path = '/api/recipes/?' + '&'.join(
+                            (pagination, *params)
+                        )
+                        violations.extend(self.check_path(client, path,
+                                                          options))
+        return violations
+
+    def check_path(self, client, path, options):
+        violations = []
+        for sql in self.capture(client, path):
+            problems = self.explain(sql, options)
+            violations.extend(f'{path}: {problem}\n  {sql}'
+                              for problem in problems)
+        self.stdout.write(path)
+        return violations
+
+    def capture(self, client, path):
+        """SQL всех SELECT-запросов первой и второй страницы выдачи."""
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(path)
+            if response.status_code != 200:
+                raise CommandError(f'{path}: ответ {response.status_code}')
+            if response.data['next']:
+                client.get(response.data['next'])
+        return [query['sql'] for query in queries.captured_queries
+                if query['sql'].startswith('SELECT')]
+
+    def explain(self, sql, options):
+        if connection.vendor == 'postgresql':
+            return self.explain_postgresql(sql, options)
+        if connection.vendor == 'sqlite':
+            return self.explain_sqlite(sql, options)
+        raise CommandError(f'СУБД {connection.vendor} не поддерживается')
+
+    def explain_postgresql(self, sql, options):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}')
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        problems = []
+        for node in walk(plan[0]['Plan']):
+            if options['verbose_plans']:
+                self.stdout.write(f'  {node["Node Type"]} '
+                                  f'{node.get("Relation Name", "")} '
+                                  f'rows={node["Plan Rows"]}')
+            if (node['Node Type'] == 'Seq Scan'
+                    and node['Relation Name'] in self.large
+                    and not self.expected_count_scan(sql, node)):
+                problems.append(f'Seq Scan {node["Relation Name"]}')
+            if (node['Node Type'] in ('Sort', 'Incremental Sort')
+                    and node['Plans'][0]['Plan Rows'] >= options['min_rows']):
+                problems.append(
+                    f'{node["Node Type"]} {node["Plans"][0]["Plan Rows"]} '
+                    f'строк по {", ".join(node["Sort Key"])}'
+                )
+        return problems
+
+    def expected_count_scan(self, sql, node):
+        """Число записей постраничной выдачи без избирательных фильтров
+        или только по маске тегов: счёт всё равно читает заметную часть
+        таблицы либо проверяет маску у каждой строки."""
+        if not sql.startswith('SELECT COUNT(*)'):
+            return False
+        return (node['Plan Rows']
+                >= COUNT_SHARE * self.large[node['Relation Name']]
+                or bool(TAGS_MASK_FILTER.match(node.get('Filter', ''))))
+
+    def explain_sqlite(self, sql, options):
+        # SQLite не оценивает число строк, поэтому проверяются только
+        # полные сканирования, кроме счёта записей постраничной выдачи.
+        if sql.startswith('SELECT COUNT(*)'):
+            return []
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            details = [row[-1] for row in cursor.fetchall()]
+        problems = []
+        for detail in details:
+            if options['verbose_plans']:
+                self.stdout.write(f'  {detail}')
+            words = detail.replace('SCAN TABLE', 'SCAN').split()
+            if (words[0] == 'SCAN' and 'INDEX' not in words
+                    and words[1] in self.large):
+                problems.append(detail)
+        return problems
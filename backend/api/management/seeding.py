@@ -0,0 +1,188 @@
+import io
+import time
+from contextlib import contextmanager
+
+from django.db import connection, transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from recipes.models import (Carts, Favorite, Ingredient, Recipe,
+                            RecipeIngredient, Subscribe, Tag, tags_mask)
+from users.models import User
+
+IMAGE = 'recipes/images/benchmark.jpg'
+
+
+class Rollback(Exception):
+    pass
+
+
+@contextmanager
+def rollback():
+    """Выполнение блока в транзакции, которая всегда откатывается."""
+    try:
+        with transaction.atomic():
+            yield
+            raise Rollback
+    except Rollback:
+        pass
+
+
+def bulk_create(model, objs, field, batch_size=1000):
+    """bulk_create, возвращающий объекты с первичными ключами на любой СУБД."""
+    created = model.objects.bulk_create(objs, batch_size=batch_size)
+    if created and created[0].pk is None:
+        values = [getattr(obj, field) for obj in created]
+        created = list(model.objects.filter(
+            **{f'{field}__in': values}
+        ).order_by('id'))
+    return created
+
+
+def create_users(count, prefix='bench'):
+    start = User.objects.count()
+    return bulk_create(User, [
+        User(
+            username=f'{prefix}{start + i}',
+            email=f'{prefix}{start + i}@example.com',
+            first_name=prefix,
+            last_name=str(start + i),
+        ) for i in range(count)
+    ], 'username')
+
+
+def create_tags(count):
+    start = Tag.objects.count()
+    return bulk_create(Tag, [
+        Tag(name=f'bench-tag-{start + i}', slug=f'bench-tag-{start + i}')
+        for i in range(count)
+    ], 'slug')
+
+
+def create_ingredients(count):
+    start = Ingredient.objects.count()
+    return bulk_create(Ingredient, [
+        Ingredient(name=f'bench-ingredient-{start + i}',
+                   measurement_unit='г')
+        for i in range(count)
+    ], 'name')
+
+
+def create_recipes(authors, per_author, ingredients=(), tags=(),
+                   ingredients_per_recipe=0, batch_size=1000):
+    recipes = bulk_create(Recipe, [
+        Recipe(author=author, name=f'{author.username} #{i}',
+               text='Описание рецепта', image=IMAGE, cooking_time=10)
+        for author in authors for i in range(per_author)
+    ], 'name', batch_size)
+    User.objects.filter(pk__in=[author.pk for author in authors]).update(
+        recipes_count=F('recipes_count') + per_author
+    )
+    if tags:
+        for n, recipe in enumerate(recipes):
+            recipe.tags_mask = tags_mask([tags[n % len(tags)].pk])
+        Recipe.objects.bulk_update(recipes, ('tags_mask',), batch_size)
+    if ingredients and ingredients_per_recipe:
+        RecipeIngredient.objects.bulk_create(
+            (RecipeIngredient(
+                recipe=recipe,
+                ingredient=ingredients[(n + k) % len(ingredients)],
+                amount=k + 1
+            ) for n, recipe in enumerate(recipes)
+                for k in range(min(ingredients_per_recipe,
+                                   len(ingredients)))),
+            batch_size=batch_size
+        )
+    if tags:
+        through = Recipe.tags.through
+        through.objects.bulk_create(
+            (through(recipe=recipe, tag=tags[n % len(tags)])
+             for n, recipe in enumerate(recipes)),
+            batch_size=batch_size
+        )
+    return recipes
+
+
+def count_followers(authors):
+    """Пересчёт followers_count после подписок в обход сигналов."""
+    User.objects.filter(pk__in=[author.pk for author in authors]).update(
+        followers_count=Coalesce(Subquery(
+            Subscribe.objects.filter(author=OuterRef('pk')).order_by()
+            .values('author').annotate(total=Count('pk')).values('total')
+        ), 0)
+    )
+
+
+def subscribe(user, authors):
+    Subscribe.objects.bulk_create(
+        Subscribe(user=user, author=author) for author in authors
+    )
+    count_followers(authors)
+
+
+def add_subscriptions(users, authors, per_user, batch_size=1000):
+    """Подписки: каждый пользователь подписан на per_user авторов."""
+    Subscribe.objects.bulk_create(
+        (Subscribe(user=user, author=authors[(n + k) % len(authors)])
+         for n, user in enumerate(users)
+         for k in range(min(per_user, len(authors)))),
+        batch_size=batch_size
+    )
+    count_followers(authors)
+
+
+def add_to_lists(users, recipes, per_user, batch_size=1000):
+    """Избранное и корзины: каждому пользователю по per_user рецептов."""
+    for model in (Favorite, Carts):
+        model.objects.bulk_create(
+            (model(user=user, recipe=recipes[(n * per_user + k)
+                                             % len(recipes)])
+             for n, user in enumerate(users)
+             for k in range(min(per_user, len(recipes)))),
+            batch_size=batch_size
+        )
+
+
+def get_client(user):
+    client = APIClient()
+    token, _ = Token.objects.get_or_create(user=user)
+    client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+    return client
+
+
+def make_image(megapixels):
+    side = int((megapixels * 10 ** 6) ** 0.5)
+    image = Image.effect_noise((side, side), 64).convert('RGB')
+    buffer = io.BytesIO()
+    image.save(buffer, 'JPEG', quality=90)
+    return buffer.getvalue()
+
+
+def percentile(values, percent):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * percent / 100))]
+
+
+def measure(client, path, method='get', **kwargs):
+    """Время ответа в секундах, число запросов к БД и сам ответ.
+
+    Потоковый ответ читается целиком внутри замера, его размер
+    в байтах сохраняется в response.size. Замеры идут в откатываемой
+    транзакции, поэтому действия transaction.on_commit, например сброс
+    кеша, выполняются сразу после запроса, как при его фиксации.
+    """
+    with CaptureQueriesContext(connection) as queries:
+        started = time.perf_counter()
+        with TestCase.captureOnCommitCallbacks(execute=True):
+            response = getattr(client, method)(path, **kwargs)
+        response.size = len(
+            b''.join(response.streaming_content) if response.streaming
+            else response.content
+        )
+        elapsed = time.perf_counter() - started
+    return elapsed, len(queries), response
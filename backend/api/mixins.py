@@ -0,0 +1,108 @@
+from hashlib import md5
+
+from django.conf import settings
+from django.core.cache import cache
+from django.urls import reverse
+from django.utils.http import http_date, parse_http_date_safe
+from rest_framework import status
+from rest_framework.response import Response
+
+from foodgram.metrics import count_cache
+from recipes.cache import get_version
+from .serializers import JobSerializer
+
+
+class VersionedCacheMixin:
+    """Кеширование ответов list/retrieve по версии набора данных.
+
+    Версия меняется при любом изменении моделей набора, поэтому ключи
+    кеша не нужно удалять: устаревшие записи просто истекают. На
+    условные запросы с актуальной версией отвечает 304 без обращения
+    к базе данных.
+    """
+
+    cache_version = None
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(
+            super().retrieve, request, *args, **kwargs
+        )
+
+    def cached_response(self, view, request, *args, **kwargs):
+        version = get_version(self.cache_version)
+        headers = {
+            'ETag': f'"{self.cache_version}-{version}"',
+            'Last-Modified': http_date(version // 1000),
+        }
+        if self.not_modified(request, headers['ETag'], version):
+            return Response(status=status.HTTP_304_NOT_MODIFIED,
+                            headers=headers)
+        # Путь хешируется: memcached не принимает ключи длиннее 250
+        # символов и с пробелами.
+        path = md5(request.get_full_path().encode()).hexdigest()
+        key = f'response:{self.cache_version}:{version}:{path}'
+        data = cache.get(key)
+        count_cache('response', int(data is not None), int(data is None))
+        if data is None:
+            response = view(request, *args, **kwargs)
+            if response.status_code != status.HTTP_200_OK:
+                return response
+            data = response.data
+            cache.set(key, data, settings.RESPONSE_CACHE_TIMEOUT)
+        return Response(data, headers=headers)
+
+    def not_modified(self, request, etag, version):
+        if_none_match = request.headers.get('If-None-Match')
+        if if_none_match:
+            return (if_none_match.strip() == '*'
+                    or etag in (tag.strip().removeprefix('W/')
+                                for tag in if_none_match.split(',')))
+        if_modified_since = parse_http_date_safe(
+            request.headers.get('If-Modified-Since', '')
+        )
+        return (if_modified_since is not None
+                and version // 1000 <= if_modified_since)
+
+
+class CursorPaginationMixin:
+    """Выбор пагинации по курсору параметром ?pagination=cursor.
+
+    Ссылки next/previous курсорной выдачи содержат параметр cursor,
+    по нему режим сохраняется при переходе между страницами.
+    """
+
+    cursor_pagination_class = None
+
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            params = self.request.query_params
+            if params.get('pagination') == 'cursor' or 'cursor' in params:
+                self._paginator = self.cursor_pagination_class()
+        return super().paginator
+
+
+class AsyncJobMixin:
+    """Ответ 202 с фоновой задачей на заголовок Prefer: respond-async.
+
+    Статус задачи доступен по ссылке из заголовка Location.
+    """
+
+    def prefers_async(self):
+        return 'respond-async' in self.request.headers.get('Prefer', '')
+
+    def accepted(self, job, **kwargs):
+        return Response(
+            JobSerializer(job).data,
+            status=status.HTTP_202_ACCEPTED,
+            headers={
+                'Location': self.request.build_absolute_uri(
+                    reverse('api:job-detail', args=(job.pk,))
+                ),
+                'Preference-Applied': 'respond-async',
+            },
+            **kwargs
+        )
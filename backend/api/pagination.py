@@ -1,5 +1,77 @@
-from rest_framework.pagination import PageNumberPagination
+from django.conf import settings
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import (Cursor, CursorPagination,
+                                       PageNumberPagination)
 
 
 class CustomPaginator(PageNumberPagination):
     page_size_query_param = 'limit'
+    max_page_size = settings.MAX_PAGE_SIZE
+
+
+class RecipeCursorPaginator(CursorPagination):
+    """Постраничная выдача по курсору без COUNT(*) и OFFSET.
+
+    Позиция курсора — значение первого поля сортировки, поэтому
+    доступна только сортировка по умолчанию и по релевантности поиска.
+    Число добавлений в избранное совпадает у многих рецептов и меняется
+    между запросами: курсор по нему пропускал бы и повторял рецепты.
+    """
+    ordering = ('-pub_date', '-id')
+    page_size_query_param = 'limit'
+    max_page_size = settings.MAX_PAGE_SIZE
+
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+        field = self.ordering[0].lstrip('-')
+        if ordering[0].lstrip('-') not in (field, 'search_rank'):
+            raise ValidationError({'errors': (
+                f'Выдача по курсору доступна только с сортировкой по {field}'
+            )})
+        return ordering
+
+
+class SubscriptionCursorPaginator(RecipeCursorPaginator):
+    """Подписки в том же порядке, что и постраничная выдача: логин
+    уникален, поэтому курсор по нему не пропускает и не повторяет
+    авторов."""
+    ordering = ('username',)
+
+
+class FeedCursorPaginator(RecipeCursorPaginator):
+    """Курсор ленты: дата публикации и id последнего рецепта страницы.
+
+    Лента сливается из нескольких источников, поэтому курсор хранит
+    саму позицию, без смещения, и ведёт только вперёд.
+    """
+
+    def paginate_feed(self, read, request):
+        """Страница ключей (pub_date, id); read(position, limit) читает
+        ленту после позиции."""
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        cursor = self.decode_cursor(request)
+        position = None
+        if cursor is not None:
+            pub_date, _, pk = (cursor.position or '').partition('|')
+            pub_date = parse_datetime(pub_date)
+            if pub_date is None or not pk.isdigit():
+                raise NotFound(self.invalid_cursor_message)
+            position = (pub_date, int(pk))
+        keys = read(position, self.page_size + 1)
+        self.has_next = len(keys) > self.page_size
+        self.page = keys[:self.page_size]
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        pub_date, pk = self.page[-1]
+        return self.encode_cursor(Cursor(
+            offset=0, reverse=False, position=f'{pub_date.isoformat()}|{pk}'
+        ))
+
+    def get_previous_link(self):
+        return None
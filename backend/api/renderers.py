@@ -0,0 +1,32 @@
+import json
+
+from rest_framework.renderers import BaseRenderer
+
+
+class ShoppingCartRenderer(BaseRenderer):
+    """Рендерер формата выгрузки списка покупок.
+
+    Сам файл отдаётся потоковым ответом, а через render проходят только
+    сообщения об ошибках.
+    """
+
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return json.dumps(data, ensure_ascii=False).encode()
+
+
+class TextRenderer(ShoppingCartRenderer):
+    media_type = 'text/plain'
+    format = 'txt'
+
+
+class CSVRenderer(ShoppingCartRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
+
+
+class PDFRenderer(ShoppingCartRenderer):
+    media_type = 'application/pdf'
+    format = 'pdf'
+    charset = None
@@ -1,10 +1,18 @@
 from django.conf import settings
-from drf_extra_fields.fields import Base64ImageField
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Manager, prefetch_related_objects
+from django.http import QueryDict
 from rest_framework import serializers
 
+from foodgram.metrics import count_cache
+from jobs.models import Job
+from recipes.cache import recipe_keys
+from recipes.image_variants import VARIANTS, schedule_variants
 from recipes.models import (Carts, Favorite, Ingredient, Recipe,
-                            RecipeIngredient, Subscribe, Tag)
+                            RecipeIngredient, ShoppingListItem, Subscribe, Tag)
 from users.models import User
+from .fields import RecipeImageField, parse_multipart
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -16,6 +24,8 @@ class UserSerializer(serializers.ModelSerializer):
         model = User
 
     def get_is_subscribed(self, author):
+        if hasattr(author, 'is_subscribed'):
+            return author.is_subscribed
         user = self.context.get('request').user
         return (user.is_authenticated
                 and user.follower.filter(author=author).exists())
@@ -63,17 +73,40 @@ class UserSetPasswordSerializer(serializers.Serializer):
         return instance
 
 
+def build_url(request, url):
+    return request.build_absolute_uri(url) if request else url
+
+
 class RecipeShortSerializer(serializers.ModelSerializer):
+    image = serializers.SerializerMethodField()
 
     class Meta:
         model = Recipe
         fields = ('id', 'name', 'image', 'cooking_time')
 
+    def get_image(self, recipe):
+        return build_url(self.context.get('request'),
+                         recipe.get_image_url('thumbnail'))
+
+
+def get_recipes_limit(request):
+    """Значение recipes_limit из запроса или None."""
+    recipes_limit = request.query_params.get('recipes_limit')
+    if recipes_limit and recipes_limit.isdigit() and int(recipes_limit):
+        return int(recipes_limit)
+    return None
+
+
+def get_amounts(ingredients):
+    return {
+        ingredient['id']: ingredient['amount'] for ingredient in ingredients
+    }
+
 
 class SubscribeUserSerializer(serializers.ModelSerializer):
     is_subscribed = serializers.SerializerMethodField()
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.SerializerMethodField()
+    recipes_count = serializers.IntegerField(read_only=True)
 
     class Meta:
         model = User
@@ -81,17 +114,18 @@ class SubscribeUserSerializer(serializers.ModelSerializer):
                   'is_subscribed', 'recipes', 'recipes_count')
 
     def get_recipes(self, obj):
-        request = self.context.get('request')
-        recipes = obj.recipes.all()
-        recipes_limit = request.query_params.get('recipes_limit')
-        if recipes_limit:
-            recipes = recipes[:int(recipes_limit)]
+        if hasattr(obj, 'latest_recipes'):
+            recipes = obj.latest_recipes
+        else:
+            recipes = obj.recipes.all()
+            recipes_limit = get_recipes_limit(self.context.get('request'))
+            if recipes_limit:
+                recipes = recipes[:recipes_limit]
         return RecipeShortSerializer(recipes, many=True).data
 
-    def get_recipes_count(self, obj):
-        return obj.recipes.count()
-
     def get_is_subscribed(self, author):
+        if hasattr(author, 'is_subscribed'):
+            return author.is_subscribed
         user = self.context.get('request').user
         return (user.is_authenticated
                 and user.follower.filter(author=author).exists())
@@ -165,11 +199,40 @@ class RecipeIngredientSerializer(serializers.ModelSerializer):
         model = RecipeIngredient
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class AuthorSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        fields = ('id', 'email', 'username', 'first_name', 'last_name')
+        model = User
+
+
+class RecipeFragmentSerializer(serializers.ModelSerializer):
+    """Не зависящая от пользователя часть рецепта, кешируется целиком."""
     tags = TagSerializer(many=True, read_only=True)
     ingredients = RecipeIngredientSerializer(many=True, read_only=True,
                                              source='recipe_ingredients')
-    author = UserSerializer(read_only=True)
+    author = AuthorSerializer(read_only=True)
+    image = serializers.CharField(source='image.url', read_only=True)
+    image_variants = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Recipe
+        fields = ('id', 'tags', 'author', 'ingredients', 'name',
+                  'image', 'image_variants', 'text', 'cooking_time')
+
+    def get_image_variants(self, recipe):
+        return {variant: recipe.get_image_url(variant)
+                for variant in VARIANTS}
+
+
+class RecipeListSerializer(serializers.ListSerializer):
+
+    def to_representation(self, data):
+        recipes = data.all() if isinstance(data, Manager) else data
+        return self.child.represent_many(list(recipes))
+
+
+class RecipeSerializer(RecipeFragmentSerializer):
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
 
@@ -177,27 +240,90 @@ class RecipeSerializer(serializers.ModelSerializer):
         model = Recipe
         fields = ('id', 'tags', 'author', 'ingredients',
                   'is_favorited', 'is_in_shopping_cart', 'name',
-                  'image', 'text', 'cooking_time')
+                  'image', 'image_variants', 'text', 'cooking_time')
         read_only_fields = ('is_favorited', 'is_in_shopping_cart')
+        list_serializer_class = RecipeListSerializer
+
+    def to_representation(self, instance):
+        return self.represent_many([instance])[0]
+
+    def represent_many(self, recipes):
+        """Рецепты из кеша с подставленными флагами пользователя."""
+        keys = recipe_keys(recipe.pk for recipe in recipes)
+        fragments = cache.get_many(keys.values())
+        missing = [recipe for recipe in recipes
+                   if keys[recipe.pk] not in fragments]
+        count_cache('recipe', len(recipes) - len(missing), len(missing))
+        if missing:
+            prefetch_related_objects(
+                missing, 'author', 'tags', 'recipe_ingredients__ingredient'
+            )
+            created = {
+                keys[recipe.pk]: RecipeFragmentSerializer(recipe).data
+                for recipe in missing
+            }
+            cache.set_many(created, settings.RESPONSE_CACHE_TIMEOUT)
+            fragments.update(created)
+        return [self.merge(fragments[keys[recipe.pk]], recipe)
+                for recipe in recipes]
+
+    def merge(self, fragment, recipe):
+        request = self.context.get('request')
+        values = {
+            **fragment,
+            'author': {**fragment['author'],
+                       'is_subscribed': self.get_author_is_subscribed(recipe)},
+            'is_favorited': self.get_is_favorited(recipe),
+            'is_in_shopping_cart': self.get_is_in_shopping_cart(recipe),
+            'image': build_url(request, fragment['image']),
+            'image_variants': {
+                variant: build_url(request, url)
+                for variant, url in fragment['image_variants'].items()
+            },
+        }
+        return {field: values[field] for field in self.Meta.fields}
+
+    def get_author_is_subscribed(self, recipe):
+        if hasattr(recipe, 'author_is_subscribed'):
+            return recipe.author_is_subscribed
+        request = self.context.get('request')
+        return bool(request and request.user.is_authenticated
+                    and request.user.follower.filter(
+                        author=recipe.author_id
+                    ).exists())
 
     def get_is_favorited(self, recipe):
+        if hasattr(recipe, 'is_favorited'):
+            return recipe.is_favorited
         request = self.context.get('request')
         return (request and request.user.is_authenticated
                 and request.user.favorite.filter(recipe=recipe).exists())
 
     def get_is_in_shopping_cart(self, recipe):
+        if hasattr(recipe, 'is_in_shopping_cart'):
+            return recipe.is_in_shopping_cart
         request = self.context.get('request')
         return (request and request.user.is_authenticated
                 and request.user.carts.filter(recipe=recipe).exists())
 
 
+class RecipeMatchSerializer(serializers.Serializer):
+    """Параметры подбора рецептов по имеющимся ингредиентам."""
+
+    ingredients = serializers.ListField(
+        child=serializers.IntegerField(min_value=1), min_length=1,
+        max_length=settings.INGREDIENT_MATCH_MAX_INGREDIENTS
+    )
+    mode = serializers.ChoiceField(('partial', 'full'), default='partial')
+
+
 class RecipeCreateSerializer(serializers.ModelSerializer):
     ingredients = IngredientPostSerializer(many=True,
                                            source='recipe_ingredients')
     tags = serializers.PrimaryKeyRelatedField(
         queryset=Tag.objects.all(), many=True
     )
-    image = Base64ImageField(use_url=True)
+    image = RecipeImageField(use_url=True)
     cooking_time = serializers.IntegerField()
 
     class Meta:
@@ -205,21 +331,64 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
         fields = ('name', 'cooking_time', 'text',
                   'tags', 'ingredients', 'image')
 
+    def to_internal_value(self, data):
+        if isinstance(data, QueryDict):
+            data = parse_multipart(data, ('tags', 'ingredients'))
+        return super().to_internal_value(data)
+
     def validate_cooking_time(self, value):
         if value < settings.LEN_MIN_LIMIT or value > settings.LEN_MAX_LIMIT:
             raise serializers.ValidationError(
                 'Время приготовления должно быть от 1 мин до 32000 мин')
         return value
 
-    def create_ingredients(self, ingredients, recipe):
+    def validate_ingredients(self, value):
+        ids = [ingredient['id'] for ingredient in value]
+        if len(ids) != len(set(ids)):
+            raise serializers.ValidationError(
+                'Ингредиенты не должны повторяться')
+        missing = set(ids) - set(Ingredient.objects.filter(
+            id__in=ids
+        ).values_list('id', flat=True))
+        if missing:
+            raise serializers.ValidationError(
+                'Ингредиенты не найдены: '
+                + ', '.join(map(str, sorted(missing))))
+        return value
+
+    def save_ingredients(self, recipe, amounts):
+        """Применение к рецепту только изменившихся ингредиентов.
+
+        amounts — словарь {id ингредиента: количество}. Возвращает
+        прежние количества ингредиентов рецепта.
+        """
+        current = {
+            item.ingredient_id: item
+            for item in RecipeIngredient.objects.filter(recipe=recipe)
+        }
+        old_amounts = {
+            ingredient: item.amount for ingredient, item in current.items()
+        }
+        removed = current.keys() - amounts.keys()
+        if removed:
+            RecipeIngredient.objects.filter(
+                recipe=recipe, ingredient__in=removed
+            ).delete()
+        changed = []
+        for ingredient, item in current.items():
+            if ingredient in amounts and item.amount != amounts[ingredient]:
+                item.amount = amounts[ingredient]
+                changed.append(item)
+        RecipeIngredient.objects.bulk_update(changed, ('amount',))
         RecipeIngredient.objects.bulk_create(
-            [RecipeIngredient(
-                recipe=recipe,
-                ingredient=Ingredient.objects.get(id=ingredient['id']),
-                amount=ingredient['amount']
-            ) for ingredient in ingredients]
+            RecipeIngredient(recipe=recipe, ingredient_id=ingredient,
+                             amount=amount)
+            for ingredient, amount in amounts.items()
+            if ingredient not in current
         )
+        return old_amounts
 
+    @transaction.atomic
     def create(self, validated_data):
         ingredients = validated_data.pop('recipe_ingredients')
         tags = validated_data.pop('tags')
@@ -228,7 +397,8 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
             **validated_data
         )
         recipe.tags.set(tags)
-        self.create_ingredients(ingredients, recipe)
+        self.save_ingredients(recipe, get_amounts(ingredients))
+        schedule_variants(recipe)
         return recipe
 
     def to_representation(self, instance):
@@ -239,13 +409,21 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
             }
         ).data
 
+    @transaction.atomic
     def update(self, instance, validated_data):
-        tags = validated_data.pop('tags')
-        ingredients = validated_data.pop('recipe_ingredients')
-        instance.tags.clear()
-        instance.tags.set(tags)
-        RecipeIngredient.objects.filter(recipe=instance).delete()
-        self.create_ingredients(ingredients, instance)
+        tags = validated_data.pop('tags', None)
+        ingredients = validated_data.pop('recipe_ingredients', None)
+        if tags is not None:
+            instance.tags.set(tags)
+        if ingredients is not None:
+            amounts = get_amounts(ingredients)
+            old_amounts = self.save_ingredients(instance, amounts)
+            ShoppingListItem.objects.change_recipe(
+                instance, {*old_amounts, *amounts}
+            )
+        if 'image' in validated_data:
+            validated_data['image_variants'] = {}
+            schedule_variants(instance)
         return super().update(instance, validated_data)
 
 
@@ -285,3 +463,12 @@ class CartsSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError(
                 {'errors': 'Этот рецепт уже добавлен в список покупок'})
         return data
+
+
+class JobSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = Job
+        fields = ('id', 'name', 'status', 'attempts', 'result', 'error',
+                  'created', 'finished')
+        read_only_fields = fields
@@ -0,0 +1,26 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from users.models import User
+from .authentication import invalidate_tokens
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(instance, **kwargs):
+    # Версия меняется после фиксации, иначе параллельный запрос успеет
+    # закешировать ещё не удалённый токен.
+    keys = [instance.key]
+    transaction.on_commit(lambda: invalidate_tokens(keys))
+
+
+@receiver(post_save, sender=User)
+def user_changed(instance, created, **kwargs):
+    """Смена пароля, отключение и другие изменения пользователя
+    сбрасывают закешированные токены."""
+    if not created:
+        keys = list(Token.objects.filter(user=instance).values_list(
+            'key', flat=True
+        ))
+        transaction.on_commit(lambda: invalidate_tokens(keys))
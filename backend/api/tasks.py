@@ -0,0 +1,38 @@
+import tempfile
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+
+from jobs.runner import task
+from recipes.models import Recipe, ShoppingListItem
+from .exporters import export
+
+SHOPPING_LISTS_DIR = 'shopping_lists'
+
+
+@task('api.delete_recipe', priority=10)
+def delete_recipe_job(recipe_id):
+    recipe = Recipe.objects.filter(pk=recipe_id).first()
+    if recipe is not None:
+        recipe.delete()
+
+
+@task('api.export_shopping_list', priority=10)
+def export_shopping_list(user_id, file_format):
+    """Выгрузка списка покупок в файл хранилища, результат — его адрес."""
+    ingredients = ShoppingListItem.objects.filter(user_id=user_id).values_list(
+        'ingredient__name', 'ingredient__measurement_unit', 'amount'
+    ).order_by('ingredient__name')
+    with tempfile.TemporaryFile() as file:
+        for chunk in export(
+            ingredients.iterator(chunk_size=settings.ITERATOR_CHUNK),
+            file_format
+        ):
+            file.write(chunk)
+        file.seek(0)
+        path = default_storage.save(
+            f'{SHOPPING_LISTS_DIR}/{uuid4().hex}.{file_format}', File(file)
+        )
+    return {'url': default_storage.url(path)}
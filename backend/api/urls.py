@@ -1,8 +1,9 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from .views import (IngredientViewSet, RecipeViewSet, SubscribeListViewSet,
-                    SubscribeViewSet, TagViewSet, UserViewSet)
+from .views import (IngredientViewSet, JobViewSet, RecipeViewSet,
+                    SubscribeListViewSet, SubscribeViewSet, TagViewSet,
+                    UserViewSet)
 
 app_name = 'api'
 
@@ -11,6 +12,7 @@ v1_router.register('users', UserViewSet)
 v1_router.register('tags', TagViewSet)
 v1_router.register('ingredients', IngredientViewSet)
 v1_router.register('recipes', RecipeViewSet)
+v1_router.register('jobs', JobViewSet)
 
 urlpatterns = [
     path(
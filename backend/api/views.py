@@ -1,5 +1,8 @@
-from django.db.models import Sum
-from django.shortcuts import HttpResponse, get_object_or_404
+from django.conf import settings
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.db.models import BooleanField, Prefetch, Value
+from django.http import StreamingHttpResponse
+from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 
 from rest_framework import filters, status
@@ -7,23 +10,33 @@ from rest_framework.decorators import action
 from rest_framework.generics import ListAPIView
 from rest_framework.mixins import (CreateModelMixin, ListModelMixin,
                                    RetrieveModelMixin)
+from rest_framework.parsers import FormParser, JSONParser, MultiPartParser
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.viewsets import GenericViewSet, ModelViewSet
 
 from users.models import User
-from recipes.models import (Carts, Favorite, Ingredient, Recipe,
-                            RecipeIngredient, Subscribe, Tag)
-from .filters import IngredienFilter, RecipeFilter
-from .pagination import CustomPaginator
+from jobs.models import Job
+from jobs.runner import enqueue
+from recipes.autocomplete import search_ingredients
+from recipes.feed import read_feed
+from recipes.matching import match_recipes
+from recipes.models import Carts, Favorite, Ingredient, Recipe, Subscribe, Tag
+from .exporters import export, format_error
+from .filters import IngredienFilter, RecipeFilter, RecipeOrderingFilter
+from .mixins import AsyncJobMixin, CursorPaginationMixin, VersionedCacheMixin
+from .pagination import (CustomPaginator, FeedCursorPaginator,
+                         RecipeCursorPaginator, SubscriptionCursorPaginator)
 from .permissions import IsAuthorOrReadOnly
+from .renderers import CSVRenderer, PDFRenderer, TextRenderer
 from .serializers import (CartsSerializer, FavoriteSerializer,
-                          IngredientSerializer, RecipeCreateSerializer,
+                          IngredientSerializer, JobSerializer,
+                          RecipeCreateSerializer, RecipeMatchSerializer,
                           RecipeSerializer, SubscribeSerializer,
                           SubscribeUserSerializer, TagSerializer,
                           UserCreateSerializer, UserSerializer,
-                          UserSetPasswordSerializer)
+                          UserSetPasswordSerializer, get_recipes_limit)
 
 
 class CreateListRetrieveViewSet(CreateModelMixin,
@@ -40,6 +53,7 @@ class ListRetrieveViewSet(ListModelMixin, RetrieveModelMixin, GenericViewSet):
 class UserViewSet(CreateListRetrieveViewSet):
     queryset = User.objects.all()
     permission_classes = (AllowAny,)
+    pagination_class = CustomPaginator
 
     def get_serializer_class(self):
         if self.action in ('list', 'retrieve'):
@@ -94,49 +108,138 @@ class SubscribeViewSet(APIView):
         )
 
 
-class SubscribeListViewSet(ListAPIView):
+class SubscribeListViewSet(CursorPaginationMixin, ListAPIView):
     serializer_class = SubscribeUserSerializer
     permission_classes = (IsAuthenticated,)
     pagination_class = CustomPaginator
+    cursor_pagination_class = SubscriptionCursorPaginator
 
     def get_queryset(self):
-        return User.objects.filter(following__user=self.request.user)
+        recipes = Recipe.objects.order_by('-pub_date', '-id')
+        recipes_limit = get_recipes_limit(self.request)
+        if recipes_limit:
+            recipes = recipes.latest_per_author(recipes_limit)
+        return User.objects.filter(
+            following__user=self.request.user
+        ).annotate(
+            is_subscribed=Value(True, output_field=BooleanField())
+        ).prefetch_related(
+            Prefetch('recipes', queryset=recipes, to_attr='latest_recipes')
+        ).order_by('username')
 
 
-class TagViewSet(ListRetrieveViewSet):
+class TagViewSet(VersionedCacheMixin, ListRetrieveViewSet):
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
+    authentication_classes = ()
     permission_classes = (AllowAny,)
     pagination_class = None
+    cache_version = 'tags'
 
 
-class IngredientViewSet(ListRetrieveViewSet):
+class IngredientViewSet(VersionedCacheMixin, ListRetrieveViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
+    authentication_classes = ()
     permission_classes = (IsAuthorOrReadOnly,)
     pagination_class = None
-    filter_backends = (filters.SearchFilter,)
+    filter_backends = (filters.SearchFilter, DjangoFilterBackend)
     search_fields = ('^name',)
     filterset_class = IngredienFilter
+    cache_version = 'ingredients'
+
+    def list(self, request, *args, **kwargs):
+        name = request.query_params.get('name')
+        if name and settings.INGREDIENT_SEARCH_INDEX:
+            return Response(search_ingredients(
+                name, settings.INGREDIENT_SEARCH_LIMIT
+            ))
+        return super().list(request, *args, **kwargs)
 
 
-class RecipeViewSet(ModelViewSet):
+class RecipeViewSet(AsyncJobMixin, CursorPaginationMixin, ModelViewSet):
     queryset = Recipe.objects.all()
     permission_classes = (IsAuthorOrReadOnly,)
     pagination_class = CustomPaginator
-    filter_backends = (DjangoFilterBackend,)
+    cursor_pagination_class = RecipeCursorPaginator
+    filter_backends = (DjangoFilterBackend, RecipeOrderingFilter)
     filterset_class = RecipeFilter
+    ordering_fields = ('pub_date', 'favorites_count')
+    ordering = ('-pub_date', '-id')
+    parser_classes = (JSONParser, MultiPartParser, FormParser)
+
+    def initialize_request(self, request, *args, **kwargs):
+        # Файлы из multipart-запроса сразу пишутся во временный файл,
+        # а не накапливаются в памяти процесса.
+        request.upload_handlers = [TemporaryFileUploadHandler(request)]
+        return super().initialize_request(request, *args, **kwargs)
 
     def get_serializer_class(self):
-        if self.action in ('list', 'retrieve'):
+        if self.action in ('list', 'retrieve', 'match', 'feed'):
             return RecipeSerializer
         return RecipeCreateSerializer
 
     def get_queryset(self):
-        recipes = Recipe.objects.prefetch_related(
-            'recipe_ingredients__ingredient', 'tags'
-        ).all()
-        return recipes
+        if self.action in ('list', 'retrieve', 'match', 'feed'):
+            return Recipe.objects.with_user_flags(self.request.user)
+        return Recipe.objects.all()
+
+    def destroy(self, request, *args, **kwargs):
+        if not self.prefers_async():
+            return super().destroy(request, *args, **kwargs)
+        recipe = self.get_object()
+        return self.accepted(enqueue(
+            'api.delete_recipe', user=request.user, recipe_id=recipe.pk
+        ))
+
+    @action(detail=False, methods=['get'], url_path='match')
+    def match(self, request):
+        """Рецепты по доле ингредиентов, которые уже есть у пользователя.
+
+        Параметры: ingredients — id ингредиентов (повторяется), mode=full —
+        только рецепты, для которых есть все ингредиенты.
+        """
+        params = RecipeMatchSerializer(data={
+            'ingredients': request.query_params.getlist('ingredients'),
+            'mode': request.query_params.get('mode', 'partial'),
+        })
+        params.is_valid(raise_exception=True)
+        # Выдача идёт по индексу, а не по queryset, поэтому курсорная
+        # пагинация здесь не применяется.
+        paginator = CustomPaginator()
+        matches = paginator.paginate_queryset(match_recipes(
+            params.validated_data['ingredients'],
+            params.validated_data['mode'] == 'full'
+        ), request, view=self)
+        recipes = self.get_queryset().in_bulk(
+            [item['id'] for item in matches]
+        )
+        matches = [item for item in matches if item['id'] in recipes]
+        data = self.get_serializer(
+            [recipes[item['id']] for item in matches], many=True
+        ).data
+        for recipe, item in zip(data, matches):
+            recipe['coverage'] = round(item['coverage'], 4)
+            recipe['missing'] = item['missing']
+        return paginator.get_paginated_response(data)
+
+    @action(
+        detail=False,
+        methods=['get'],
+        url_path='feed',
+        permission_classes=(IsAuthenticated,)
+    )
+    def feed(self, request):
+        """Рецепты авторов из подписок по убыванию даты публикации."""
+        paginator = FeedCursorPaginator()
+        keys = paginator.paginate_feed(
+            lambda position, limit: read_feed(request.user, position, limit),
+            request
+        )
+        recipes = self.get_queryset().in_bulk([pk for _, pk in keys])
+        return paginator.get_paginated_response(self.get_serializer(
+            [recipes[pk] for _, pk in keys if pk in recipes], many=True
+        ).data)
 
     @action(
         detail=True,
@@ -177,9 +280,10 @@ class RecipeViewSet(ModelViewSet):
             return Response(serializer.data, status=status.HTTP_201_CREATED)
 
         if request.method == 'DELETE':
-            shopping_cart = Carts.objects.filter(user=user, recipe=recipe)
-            if shopping_cart.exists():
-                shopping_cart.delete()
+            deleted, _ = Carts.objects.filter(
+                user=user, recipe=recipe
+            ).delete()
+            if deleted:
                 return Response(status=status.HTTP_204_NO_CONTENT)
             return Response(status=status.HTTP_400_BAD_REQUEST)
 
@@ -187,22 +291,43 @@ class RecipeViewSet(ModelViewSet):
         detail=False,
         methods=['get'],
         url_path='download_shopping_cart',
-        permission_classes=(IsAuthenticated,)
+        permission_classes=(IsAuthenticated,),
+        renderer_classes=(TextRenderer, CSVRenderer, PDFRenderer)
     )
     def download_shopping_cart(self, request):
         """Скачивание файла со списком покупок."""
-        ingredients = RecipeIngredient.objects.filter(
-            recipe__carts__user=request.user
-        ).values(
-            'ingredient__name', 'ingredient__measurement_unit'
-        ).annotate(amount=Sum('amount'))
-        shopping_list = ['Список покупок:\n']
-        for ingredient in ingredients:
-            name = ingredient['ingredient__name']
-            unit = ingredient['ingredient__measurement_unit']
-            amount = ingredient['amount']
-            shopping_list.append(f'{name} - {amount}, {unit}\n')
-        response = HttpResponse(shopping_list, content_type='text/plain')
-        response['Content-Disposition'] = ('attachment; '
-                                           'filename="shopping_cart.txt"')
+        renderer = request.accepted_renderer
+        error = format_error(renderer.format)
+        if error:
+            return Response({'errors': error},
+                            status=status.HTTP_503_SERVICE_UNAVAILABLE,
+                            content_type='application/json')
+        if self.prefers_async():
+            return self.accepted(enqueue(
+                'api.export_shopping_list', user=request.user,
+                user_id=request.user.pk, file_format=renderer.format
+            ), content_type='application/json')
+        ingredients = request.user.shopping_list.values_list(
+            'ingredient__name', 'ingredient__measurement_unit', 'amount'
+        ).order_by('ingredient__name')
+        response = StreamingHttpResponse(
+            export(ingredients.iterator(chunk_size=settings.ITERATOR_CHUNK),
+                   renderer.format),
+            content_type=(f'{renderer.media_type}; charset={renderer.charset}'
+                          if renderer.charset else renderer.media_type)
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="shopping_cart.{renderer.format}"'
+        )
         return response
+
+
+class JobViewSet(RetrieveModelMixin, GenericViewSet):
+    """Статус фоновой задачи текущего пользователя."""
+
+    queryset = Job.objects.all()
+    serializer_class = JobSerializer
+    permission_classes = (IsAuthenticated,)
+
+    def get_queryset(self):
+        return self.request.user.jobs.all()
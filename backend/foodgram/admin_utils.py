@@ -0,0 +1,67 @@
+from django.conf import settings
+from django.contrib import admin
+from django.contrib.admin.views.main import PAGE_VAR
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+
+class EstimatedCountPaginator(Paginator):
+    """Пагинатор, берущий число строк большой таблицы из статистики.
+
+    Для запросов без условий на PostgreSQL используется оценка
+    pg_class.reltuples вместо COUNT(*) по всей таблице.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if connection.vendor == 'postgresql' and not queryset.query.where:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT reltuples FROM pg_class WHERE oid = %s::regclass',
+                    [queryset.model._meta.db_table]
+                )
+                row = cursor.fetchone()
+            if row and row[0] >= settings.ADMIN_ESTIMATED_COUNT_MIN:
+                return int(row[0])
+        return super().count
+
+
+class InputFilter(admin.SimpleListFilter):
+    """Фильтр с полем ввода вместо списка всех возможных значений."""
+
+    template = 'admin/input_filter.html'
+    lookup = None
+
+    def lookups(self, request, model_admin):
+        return ((None, None),)
+
+    def queryset(self, request, queryset):
+        value = self.value()
+        if value:
+            return queryset.filter(**{self.lookup: value.strip()})
+        return queryset
+
+    def choices(self, changelist):
+        choice = next(super().choices(changelist))
+        choice['query_parts'] = [
+            (key, value) for key, value in changelist.params.items()
+            if key not in (self.parameter_name, PAGE_VAR)
+        ]
+        yield choice
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+
+def username_filter(title, field):
+    """Фильтр по точному логину пользователя в поле field."""
+    return type(f'{field.title()}Filter', (InputFilter,), {
+        'title': title,
+        'parameter_name': field,
+        'lookup': f'{field}__username',
+    })
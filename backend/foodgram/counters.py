@@ -0,0 +1,28 @@
+from django.db.models import F
+from django.db.models.functions import Greatest
+
+
+class CountersMixin:
+    """Модель со счётчиками, которые меняются только через F-выражения.
+
+    Обычное сохранение объекта не записывает счётчики, чтобы не
+    затереть их значениями, прочитанными до чужих изменений.
+    """
+
+    counter_fields = ()
+
+    def save(self, *args, **kwargs):
+        if (not self._state.adding and not kwargs.get('force_insert')
+                and kwargs.get('update_fields') is None):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.counter_fields
+            ]
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def increment(cls, pk, field, delta=1):
+        return cls.objects.filter(pk=pk).update(
+            **{field: Greatest(F(field) + delta, 0)}
+        )
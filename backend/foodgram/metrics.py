@@ -0,0 +1,196 @@
+import atexit
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.http import Http404, HttpResponse
+
+METRICS = {
+    'foodgram_http_requests_total': (
+        'counter', 'Число запросов по маршруту, методу и статусу', None
+    ),
+    'foodgram_http_request_duration_seconds': (
+        'histogram', 'Время ответа',
+        (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+    ),
+    'foodgram_http_request_queries': (
+        'histogram', 'Число запросов к БД на один запрос',
+        (0, 1, 2, 3, 5, 10, 20, 50, 100)
+    ),
+    'foodgram_http_response_size_bytes': (
+        'histogram', 'Размер тела ответа',
+        (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+    ),
+    'foodgram_cache_requests_total': (
+        'counter', 'Обращения к кешу по результату hit/miss', None
+    ),
+    'foodgram_db_pool_checkouts_total': (
+        'counter', 'Выдачи соединений из пула', None
+    ),
+    'foodgram_db_pool_waits_total': (
+        'counter', 'Ожидания свободного соединения', None
+    ),
+    'foodgram_db_pool_wait_seconds_total': (
+        'counter', 'Суммарное время ожидания соединения', None
+    ),
+    'foodgram_db_pool_timeouts_total': (
+        'counter', 'Ожидания соединения, завершённые по таймауту', None
+    ),
+    'foodgram_db_pool_connects_total': (
+        'counter', 'Открытые пулом соединения', None
+    ),
+    'foodgram_db_pool_closes_total': (
+        'counter', 'Закрытые пулом соединения', None
+    ),
+    'foodgram_db_pool_health_check_failures_total': (
+        'counter', 'Соединения, не прошедшие проверку перед выдачей', None
+    ),
+}
+
+
+class Registry:
+    """Метрики процесса с общим хранилищем в каталоге METRICS_DIR.
+
+    Каждый процесс раз в METRICS_FLUSH_INTERVAL секунд записывает свои
+    значения в отдельный файл, а выдача складывает файлы всех
+    процессов. Файлы завершившихся процессов остаются, поэтому
+    счётчики не уменьшаются при перезапуске воркеров. Функции из
+    collectors добавляют к записи значения, которые считаются вне
+    реестра.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.values = {}
+        self.collectors = []
+        self.flushed = time.monotonic()
+
+    def inc(self, name, labels, value=1):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + value
+
+    def observe(self, name, labels, value):
+        buckets = METRICS[name][2]
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            counts = self.values.get(key)
+            if counts is None:
+                counts = self.values[key] = [0] * (len(buckets) + 2)
+            for n, bound in enumerate(buckets):
+                if value <= bound:
+                    counts[n] += 1
+                    break
+            else:
+                counts[len(buckets)] += 1
+            counts[-1] += value
+
+    def maybe_flush(self):
+        if time.monotonic() - self.flushed >= settings.METRICS_FLUSH_INTERVAL:
+            self.flush()
+
+    def flush(self):
+        directory = Path(settings.METRICS_DIR)
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f'{os.getpid()}.json'
+        temporary = path.with_suffix('.tmp')
+        collected = [entry for collect in self.collectors
+                     for entry in collect()]
+        with self.lock:
+            temporary.write_text(json.dumps([
+                [name, dict(labels), value]
+                for (name, labels), value in self.values.items()
+            ] + collected))
+            os.replace(temporary, path)
+            self.flushed = time.monotonic()
+
+    def collect(self):
+        """Сумма значений всех процессов."""
+        self.flush()
+        totals = {}
+        for path in Path(settings.METRICS_DIR).glob('*.json'):
+            try:
+                entries = json.loads(path.read_text())
+            except (OSError, ValueError):
+                continue
+            for name, labels, value in entries:
+                if name not in METRICS:
+                    continue
+                key = (name, tuple(sorted(labels.items())))
+                if isinstance(value, list):
+                    total = totals.setdefault(key, [0] * len(value))
+                    totals[key] = [a + b for a, b in zip(total, value)]
+                else:
+                    totals[key] = totals.get(key, 0) + value
+        return totals
+
+    def render(self):
+        """Выдача в текстовом формате Prometheus."""
+        totals = self.collect()
+        lines = []
+        for name, (kind, help_text, buckets) in METRICS.items():
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            for (metric, labels), value in sorted(totals.items()):
+                if metric != name:
+                    continue
+                if kind == 'counter':
+                    lines.append(f'{name}{format_labels(labels)} {value}')
+                    continue
+                cumulative = 0
+                for bound, count in zip((*buckets, '+Inf'), value):
+                    cumulative += count
+                    lines.append(
+                        f'{name}_bucket'
+                        f'{format_labels((*labels, ("le", str(bound))))} '
+                        f'{cumulative}'
+                    )
+                lines.append(f'{name}_sum{format_labels(labels)} '
+                             f'{value[-1]}')
+                lines.append(f'{name}_count{format_labels(labels)} '
+                             f'{cumulative}')
+        return '\n'.join(lines) + '\n'
+
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(
+        '{}="{}"'.format(key, str(value).replace('\\', r'\\')
+                         .replace('"', r'\"').replace('\n', r'\n'))
+        for key, value in labels
+    ) + '}'
+
+
+registry = Registry()
+
+
+def count_cache(cache, hits, misses):
+    """Учёт обращений к кешу; без METRICS_ENABLED ничего не делает."""
+    if not settings.METRICS_ENABLED:
+        return
+    if hits:
+        registry.inc('foodgram_cache_requests_total',
+                     {'cache': cache, 'result': 'hit'}, hits)
+    if misses:
+        registry.inc('foodgram_cache_requests_total',
+                     {'cache': cache, 'result': 'miss'}, misses)
+
+
+def metrics_view(request):
+    """Метрики всех процессов в текстовом формате Prometheus."""
+    if (not settings.METRICS_ENABLED
+            or request.META.get('REMOTE_ADDR')
+            not in settings.METRICS_ALLOWED_IPS):
+        raise Http404
+    return HttpResponse(registry.render(),
+                        content_type='text/plain; version=0.0.4')
+
+
+@atexit.register
+def flush_on_exit():
+    if settings.configured and settings.METRICS_ENABLED and registry.values:
+        registry.flush()
@@ -0,0 +1,188 @@
+import json
+import logging
+import random
+import time
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from rest_framework import serializers
+
+from .metrics import registry
+
+logger = logging.getLogger('foodgram.timing')
+
+current = ContextVar('server_timing', default=None)
+
+
+class Timing:
+    """Замеры одного запроса, время в секундах."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.view = None
+        self.queries = 0
+        self.db = 0.0
+        self.serialize = 0.0
+        self.render = 0.0
+        self.serializing = False
+
+    def execute(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db += time.perf_counter() - started
+
+
+def timed_data(prop):
+    """Свойство data сериализатора с замером внешнего вызова.
+
+    Вложенные сериализаторы и вызовы super().data не считаются
+    повторно. Запросы к БД при сериализации входят и в db.
+    """
+    def data(serializer):
+        timing = current.get()
+        if timing is None or timing.serializing:
+            return prop.fget(serializer)
+        timing.serializing = True
+        started = time.perf_counter()
+        try:
+            return prop.fget(serializer)
+        finally:
+            timing.serialize += time.perf_counter() - started
+            timing.serializing = False
+    data.timed = True
+    return property(data)
+
+
+def instrument_serializers():
+    for cls in (serializers.BaseSerializer, serializers.Serializer,
+                serializers.ListSerializer):
+        if not getattr(cls.data.fget, 'timed', False):
+            cls.data = timed_data(cls.data)
+
+
+def view_name(view_func, method):
+    """Имя DRF-представления с действием, например
+    RecipeViewSet.download_shopping_cart."""
+    cls = getattr(view_func, 'cls', None)
+    if cls is None:
+        return None
+    actions = getattr(view_func, 'actions', None) or {}
+    return f'{cls.__name__}.{actions.get(method.lower(), method.lower())}'
+
+
+class ServerTimingMiddleware:
+    """Заголовок Server-Timing с числом запросов и временем SQL,
+    сериализации и рендеринга для представлений DRF.
+
+    Включается настройкой SERVER_TIMING. Доля запросов
+    SERVER_TIMING_LOG_SAMPLE пишется в лог строкой JSON. Для потоковых
+    ответов учитывается только работа до начала отдачи тела.
+    Выключенный middleware не загружается вовсе.
+    """
+
+    def __init__(self, get_response):
+        if not settings.SERVER_TIMING:
+            raise MiddlewareNotUsed
+        instrument_serializers()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timing = Timing()
+        token = current.set(timing)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(timing.execute)
+                    )
+                response = self.get_response(request)
+        finally:
+            current.reset(token)
+        if timing.view is None:
+            return response
+        total = time.perf_counter() - timing.started
+        response['Server-Timing'] = ', '.join((
+            f'db;dur={timing.db * 1000:.1f};desc="{timing.queries} queries"',
+            f'serialize;dur={timing.serialize * 1000:.1f}',
+            f'render;dur={timing.render * 1000:.1f}',
+            f'total;dur={total * 1000:.1f}',
+        ))
+        if random.random() < settings.SERVER_TIMING_LOG_SAMPLE:
+            logger.info(json.dumps({
+                'view': timing.view,
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code,
+                'queries': timing.queries,
+                'db_ms': round(timing.db * 1000, 1),
+                'serialize_ms': round(timing.serialize * 1000, 1),
+                'render_ms': round(timing.render * 1000, 1),
+                'total_ms': round(total * 1000, 1),
+            }))
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        current.get().view = view_name(view_func, request.method)
+
+    def process_template_response(self, request, response):
+        timing = current.get()
+        started = time.perf_counter()
+
+        def rendered(response):
+            timing.render += time.perf_counter() - started
+
+        response.add_post_render_callback(rendered)
+        return response
+
+
+class QueryCounter:
+
+    def __init__(self):
+        self.queries = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries += 1
+        return execute(sql, params, many, context)
+
+
+class MetricsMiddleware:
+    """Метрики запросов: число, время ответа, запросы к БД и размер
+    ответа по имени маршрута.
+
+    Включается настройкой METRICS_ENABLED.
+    """
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        counter = QueryCounter()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(counter))
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+        match = request.resolver_match
+        route = match.view_name if match else 'unmatched'
+        registry.inc('foodgram_http_requests_total', {
+            'route': route, 'method': request.method,
+            'status': response.status_code,
+        })
+        registry.observe('foodgram_http_request_duration_seconds',
+                         {'route': route, 'method': request.method}, elapsed)
+        registry.observe('foodgram_http_request_queries', {'route': route},
+                         counter.queries)
+        if not response.streaming:
+            registry.observe('foodgram_http_response_size_bytes',
+                             {'route': route}, len(response.content))
+        registry.maybe_flush()
+        return response
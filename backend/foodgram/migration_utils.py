@@ -0,0 +1,41 @@
+from django.db import migrations
+
+
+def postgresql_index(name, table, definition, extension=None,
+                     remove=False):
+    """Операция миграции с индексом, который создаётся только в
+    PostgreSQL: индексы по выражениям и GIN не объявлены в моделях.
+
+    definition — описание индекса после имени таблицы, extension —
+    нужное ему расширение. При remove индекс удаляется, а при откате
+    миграции создаётся снова.
+    """
+
+    def create(apps, schema_editor):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        if extension:
+            schema_editor.execute(
+                f'CREATE EXTENSION IF NOT EXISTS {extension}'
+            )
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {name} ON {table} {definition}'
+        )
+
+    def drop(apps, schema_editor):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+    if remove:
+        return migrations.RunPython(drop, create)
+    return migrations.RunPython(create, drop)
+
+
+def trigram_index(name, table, column):
+    """GIN-индекс pg_trgm по UPPER(column) для поиска подстроки без
+    учёта регистра."""
+    return postgresql_index(
+        name, table, f'USING gin (UPPER({column}::text) gin_trgm_ops)',
+        extension='pg_trgm'
+    )
@@ -0,0 +1,71 @@
+import os
+import threading
+
+from django.db.backends.postgresql import base
+
+from foodgram.metrics import registry
+
+from .pool import ConnectionPool
+
+POOL_STATS = ('checkouts', 'waits', 'wait_seconds', 'timeouts', 'connects',
+              'closes', 'health_check_failures')
+
+pools = {}
+pools_lock = threading.Lock()
+
+
+def get_pool(alias, options):
+    """Пул соединения alias в текущем процессе.
+
+    После fork пул родителя не используется: его сокеты общие
+    с родительским процессом.
+    """
+    with pools_lock:
+        pool = pools.get(alias)
+        if pool is None or pool.pid != os.getpid():
+            pool = pools[alias] = ConnectionPool(**{
+                key.lower(): value for key, value in options.items()
+            })
+        return pool
+
+
+def collect_stats():
+    return [
+        [f'foodgram_db_pool_{name}_total', {'alias': alias}, value]
+        for alias, pool in pools.items() if pool.pid == os.getpid()
+        for name, value in pool.snapshot().items() if name in POOL_STATS
+    ]
+
+
+registry.collectors.append(collect_stats)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """PostgreSQL с пулом соединений процесса.
+
+    Закрытие соединения в конце запроса возвращает его в пул.
+    Параметры пула задаются словарём POOL в настройках базы данных.
+    """
+
+    @property
+    def pool(self):
+        return get_pool(self.alias, self.settings_dict.get('POOL', {}))
+
+    def pool_stats(self):
+        return self.pool.snapshot()
+
+    def get_new_connection(self, conn_params):
+        connection = self.pool.getconn(
+            lambda: super(DatabaseWrapper, self).get_new_connection(
+                conn_params
+            )
+        )
+        self.isolation_level = self.settings_dict['OPTIONS'].get(
+            'isolation_level', connection.isolation_level
+        )
+        return connection
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                self.pool.putconn(self.connection)
@@ -0,0 +1,149 @@
+import os
+import threading
+import time
+from collections import Counter, deque
+
+import psycopg2
+from psycopg2.extensions import (TRANSACTION_STATUS_IDLE,
+                                 TRANSACTION_STATUS_INERROR,
+                                 TRANSACTION_STATUS_INTRANS,
+                                 TRANSACTION_STATUS_UNKNOWN)
+
+
+class ConnectionPool:
+    """Пул соединений PostgreSQL одного процесса.
+
+    В простое хранится не больше size соединений. Сверх них можно
+    открыть ещё overflow соединений, они закрываются при возврате.
+    Когда заняты все size + overflow, запрос ждёт свободного соединения
+    не дольше timeout секунд. Соединение, простоявшее дольше
+    check_interval, перед выдачей проверяется запросом SELECT 1, а
+    открытое дольше max_lifetime закрывается.
+    """
+
+    def __init__(self, size=10, overflow=5, timeout=10, check_interval=30,
+                 max_lifetime=3600):
+        self.size = size
+        self.overflow = overflow
+        self.timeout = timeout
+        self.check_interval = check_interval
+        self.max_lifetime = max_lifetime
+        self.pid = os.getpid()
+        self.condition = threading.Condition()
+        self.idle = deque()
+        self.created = {}
+        self.opened = 0
+        self.stats = Counter()
+
+    def getconn(self, connect):
+        """Свободное соединение из пула или новое, открытое connect()."""
+        while True:
+            connection, returned = self.reserve()
+            if connection is None:
+                try:
+                    connection = connect()
+                except Exception:
+                    self.release()
+                    raise
+                with self.condition:
+                    self.created[connection] = time.monotonic()
+                    self.stats['connects'] += 1
+            elif not self.usable(connection, returned):
+                self.discard(connection)
+                continue
+            with self.condition:
+                self.stats['checkouts'] += 1
+            return connection
+
+    def reserve(self):
+        """Соединение из простоя или место под новое соединение."""
+        with self.condition:
+            started = None
+            while (not self.idle
+                   and self.opened >= self.size + self.overflow):
+                now = time.monotonic()
+                if started is None:
+                    started = now
+                    self.stats['waits'] += 1
+                remaining = started + self.timeout - now
+                if remaining <= 0:
+                    self.stats['timeouts'] += 1
+                    self.stats['wait_seconds'] += now - started
+                    raise psycopg2.OperationalError(
+                        f'Нет свободного соединения в пуле за '
+                        f'{self.timeout} с'
+                    )
+                self.condition.wait(remaining)
+            if started is not None:
+                self.stats['wait_seconds'] += time.monotonic() - started
+            if self.idle:
+                return self.idle.pop()
+            self.opened += 1
+            return None, None
+
+    def usable(self, connection, returned):
+        now = time.monotonic()
+        if connection.closed or self.expired(connection, now):
+            return False
+        if now - returned < self.check_interval:
+            return True
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+        except psycopg2.Error:
+            with self.condition:
+                self.stats['health_check_failures'] += 1
+            return False
+        return True
+
+    def expired(self, connection, now):
+        created = self.created.get(connection)
+        return created is None or now - created > self.max_lifetime
+
+    def putconn(self, connection):
+        """Возврат соединения: незавершённая транзакция откатывается,
+        сломанное или лишнее соединение закрывается."""
+        status = (TRANSACTION_STATUS_UNKNOWN if connection.closed
+                  else connection.info.transaction_status)
+        try:
+            if status in (TRANSACTION_STATUS_INTRANS,
+                          TRANSACTION_STATUS_INERROR):
+                connection.rollback()
+                status = TRANSACTION_STATUS_IDLE
+            if status == TRANSACTION_STATUS_IDLE and not connection.autocommit:
+                connection.autocommit = True
+        except psycopg2.Error:
+            status = TRANSACTION_STATUS_UNKNOWN
+        now = time.monotonic()
+        with self.condition:
+            self.stats['checkins'] += 1
+            if (status == TRANSACTION_STATUS_IDLE
+                    and len(self.idle) < self.size
+                    and not self.expired(connection, now)):
+                self.idle.append((connection, now))
+                self.condition.notify()
+                return
+        self.discard(connection)
+
+    def discard(self, connection):
+        try:
+            connection.close()
+        except psycopg2.Error:
+            pass
+        with self.condition:
+            # Соединение, унаследованное от родительского процесса,
+            # не занимает место в этом пуле.
+            tracked = self.created.pop(connection, None) is not None
+            self.stats['closes'] += 1
+        if tracked:
+            self.release()
+
+    def release(self):
+        with self.condition:
+            self.opened -= 1
+            self.condition.notify()
+
+    def snapshot(self):
+        with self.condition:
+            return {**self.stats, 'opened': self.opened,
+                    'idle': len(self.idle)}
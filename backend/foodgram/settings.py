@@ -1,4 +1,5 @@
 import os
+import tempfile
 from pathlib import Path
 
 from dotenv import load_dotenv
@@ -27,10 +28,13 @@ INSTALLED_APPS = [
     'django_filters',
     'users',
     'recipes',
+    'jobs',
     'api',
 ]
 
 MIDDLEWARE = [
+    'foodgram.middleware.MetricsMiddleware',
+    'foodgram.middleware.ServerTimingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -45,7 +49,7 @@ ROOT_URLCONF = 'foodgram.urls'
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
-        'DIRS': [],
+        'DIRS': [BASE_DIR / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
@@ -60,17 +64,53 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'foodgram.wsgi.application'
 
+DB_POOL = os.getenv('DB_POOL', 'False') == 'True'
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': ('foodgram.postgresql_pool' if DB_POOL
+                   else 'django.db.backends.postgresql'),
         'NAME': os.getenv('POSTGRES_DB', 'foodgram'),
         'USER': os.getenv('POSTGRES_USER', 'foodgram'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
         'HOST': os.getenv('DB_HOST', ''),
-        'PORT': os.getenv('DB_PORT', 5432)
+        'PORT': os.getenv('DB_PORT', 5432),
+        'POOL': {
+            'SIZE': int(os.getenv('DB_POOL_SIZE', 10)),
+            'OVERFLOW': int(os.getenv('DB_POOL_OVERFLOW', 5)),
+            'TIMEOUT': 10,
+            'CHECK_INTERVAL': 30,
+            'MAX_LIFETIME': 3600,
+        },
     }
 }
 
+# Кеш общий для процессов приложения и обработчика задач: в нём лежат
+# версии кешированных ответов, токены и журнал индекса подбора.
+CACHE_BACKEND = os.getenv(
+    'CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache'
+)
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': os.getenv(
+            'CACHE_LOCATION',
+            os.path.join(tempfile.gettempdir(), 'foodgram-cache')
+        ),
+    }
+}
+if CACHE_BACKEND.endswith('.FileBasedCache'):
+    # По умолчанию файловый кеш хранит 300 ключей и при переполнении
+    # удаляет треть из них на каждой записи, вместе с версиями данных.
+    CACHES['default']['OPTIONS'] = {
+        'MAX_ENTRIES': int(os.getenv('CACHE_MAX_ENTRIES', 100000)),
+    }
+
+RESPONSE_CACHE_TIMEOUT = 60 * 60 * 24
+TOKEN_CACHE_TIMEOUT = 60 * 60
+TOKEN_CACHE_SIZE = 10000
+TOKEN_LOCAL_TIMEOUT = 10
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -112,6 +152,60 @@ LEN_MEASUREMENT_UNIT = 200
 LEN_MAX_LIMIT = 32000
 LEN_MIN_LIMIT = 1
 
+ITERATOR_CHUNK = 2000
+
+JOBS_EAGER = os.getenv('JOBS_EAGER', 'False') == 'True'
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', 2))
+JOB_POLL_INTERVAL = 1
+JOB_MAX_POLL_INTERVAL = 60
+JOB_MAX_ATTEMPTS = 3
+JOB_RETRY_DELAY = 10
+JOB_TIMEOUT = 600
+
+RECIPE_IMAGE_MAX_SIZE = int(os.getenv('RECIPE_IMAGE_MAX_SIZE', 10 * 1024 ** 2))
+RECIPE_IMAGE_MAX_PIXELS = int(os.getenv('RECIPE_IMAGE_MAX_PIXELS', 40_000_000))
+
+INGREDIENT_SEARCH_INDEX = os.getenv('INGREDIENT_SEARCH_INDEX', 'True') == 'True'
+INGREDIENT_SEARCH_LIMIT = 20
+
+RECIPE_SEARCH_CONFIG = 'russian'
+
+INGREDIENT_MATCH_MAX_INGREDIENTS = 100
+INGREDIENT_MATCH_MAX_CHANGES = 1000
+INGREDIENT_MATCH_LOG_TIMEOUT = 60 * 60 * 24
+
+FEED_FAN_OUT_LIMIT = int(os.getenv('FEED_FAN_OUT_LIMIT', 10000))
+FEED_BATCH_SIZE = 1000
+
+SHOPPING_CART_FONT = os.getenv(
+    'SHOPPING_CART_FONT', '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'
+)
+
+SERVER_TIMING = os.getenv('SERVER_TIMING', 'False') == 'True'
+SERVER_TIMING_LOG_SAMPLE = float(os.getenv('SERVER_TIMING_LOG_SAMPLE', 0.01))
+
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'False') == 'True'
+METRICS_DIR = os.getenv(
+    'METRICS_DIR', os.path.join(tempfile.gettempdir(), 'foodgram-metrics')
+)
+METRICS_FLUSH_INTERVAL = 5
+METRICS_ALLOWED_IPS = os.getenv('METRICS_ALLOWED_IPS', '127.0.0.1').split(',')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'foodgram.timing': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
+
 AUTH_USER_MODEL = 'users.User'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
@@ -121,7 +215,7 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAuthenticated',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend',
@@ -132,6 +226,10 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 6,
 }
 
+MAX_PAGE_SIZE = 100
+
+ADMIN_ESTIMATED_COUNT_MIN = 100000
+
 DJOSER = {
     'HIDE_USERS': False,
     'LOGIN_FIELD': 'email',
@@ -0,0 +1,15 @@
+from django.contrib import admin
+
+from .models import Job
+
+
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'name', 'status', 'priority', 'attempts',
+                    'user', 'created', 'finished')
+    search_fields = ('name',)
+    list_filter = ('status', 'name')
+    list_select_related = ('user',)
+    empty_value_display = '-пусто-'
+
+
+admin.site.register(Job, JobAdmin)
@@ -0,0 +1,72 @@
+import logging
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, close_old_connections
+
+from jobs.runner import claim, execute, requeue_stale
+
+logger = logging.getLogger('jobs.runner')
+
+
+class Command(BaseCommand):
+    help = 'Обработчик очереди фоновых задач'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int,
+                            default=settings.JOB_WORKERS)
+        parser.add_argument('--poll-interval', type=float,
+                            default=settings.JOB_POLL_INTERVAL)
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Выполнить готовые задачи и завершиться'
+        )
+
+    def handle(self, *args, **options):
+        workers = options['workers']
+        self.stdout.write(f'Обработчик задач запущен, потоков: {workers}')
+        running = set()
+        done = failures = 0
+        with ThreadPoolExecutor(max_workers=workers,
+                                thread_name_prefix='jobs') as executor:
+            try:
+                while True:
+                    try:
+                        requeue_stale()
+                        claimed = claim(workers - len(running))
+                    except DatabaseError:
+                        # Например, «database is locked» или разрыв
+                        # соединения: обработчик ждёт и опрашивает дальше.
+                        failures += 1
+                        delay = min(
+                            options['poll_interval'] * 2 ** failures,
+                            settings.JOB_MAX_POLL_INTERVAL
+                        )
+                        logger.exception('Ошибка опроса очереди, повтор '
+                                         'через %.0f с', delay)
+                        close_old_connections()
+                        time.sleep(delay)
+                        continue
+                    failures = 0
+                    running.update(executor.submit(execute, pk)
+                                   for pk in claimed)
+                    if not running:
+                        if options['once']:
+                            break
+                        time.sleep(options['poll_interval'])
+                        continue
+                    finished, running = wait(
+                        running,
+                        timeout=options['poll_interval'],
+                        return_when=FIRST_COMPLETED
+                    )
+                    for future in finished:
+                        if future.exception() is not None:
+                            logger.error('Сбой обработчика задачи',
+                                         exc_info=future.exception())
+                    done += len(finished)
+            except KeyboardInterrupt:
+                self.stdout.write('Ожидание выполняющихся задач...')
+        self.stdout.write(self.style.SUCCESS(f'Выполнено задач: {done}'))
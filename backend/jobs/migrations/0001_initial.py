@@ -0,0 +1,46 @@
+# Generated by Django 3.2.3 on 2026-10-18 20:07
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=200, verbose_name='Задача')),
+                ('payload', models.JSONField(blank=True, default=dict, verbose_name='Параметры')),
+                ('status', models.CharField(choices=[('pending', 'В очереди'), ('running', 'Выполняется'), ('done', 'Выполнена'), ('failed', 'Ошибка')], default='pending', max_length=16, verbose_name='Статус')),
+                ('priority', models.SmallIntegerField(default=0, verbose_name='Приоритет')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Попытки')),
+                ('max_attempts', models.PositiveSmallIntegerField(default=3, verbose_name='Максимум попыток')),
+                ('result', models.JSONField(blank=True, null=True, verbose_name='Результат')),
+                ('error', models.TextField(blank=True, verbose_name='Ошибка')),
+                ('run_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Запустить после')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Создана')),
+                ('started', models.DateTimeField(blank=True, null=True, verbose_name='Начата')),
+                ('finished', models.DateTimeField(blank=True, null=True, verbose_name='Завершена')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='jobs', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Фоновая задача',
+                'verbose_name_plural': 'Фоновые задачи',
+                'ordering': ('-created',),
+            },
+        ),
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(fields=['status', '-priority', 'run_at'], name='job_queue_idx'),
+        ),
+    ]
@@ -0,0 +1,61 @@
+from django.conf import settings
+from django.db import models
+from django.utils import timezone
+
+from users.models import User
+
+
+class Job(models.Model):
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = (
+        (PENDING, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Выполнена'),
+        (FAILED, 'Ошибка'),
+    )
+
+    name = models.CharField('Задача', max_length=settings.LEN_NAME)
+    payload = models.JSONField('Параметры', default=dict, blank=True)
+    status = models.CharField(
+        'Статус',
+        max_length=16,
+        choices=STATUSES,
+        default=PENDING
+    )
+    priority = models.SmallIntegerField('Приоритет', default=0)
+    attempts = models.PositiveSmallIntegerField('Попытки', default=0)
+    max_attempts = models.PositiveSmallIntegerField(
+        'Максимум попыток',
+        default=settings.JOB_MAX_ATTEMPTS
+    )
+    result = models.JSONField('Результат', null=True, blank=True)
+    error = models.TextField('Ошибка', blank=True)
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='jobs',
+        verbose_name='Пользователь',
+        null=True,
+        blank=True
+    )
+    run_at = models.DateTimeField('Запустить после', default=timezone.now)
+    created = models.DateTimeField('Создана', auto_now_add=True)
+    started = models.DateTimeField('Начата', null=True, blank=True)
+    finished = models.DateTimeField('Завершена', null=True, blank=True)
+
+    class Meta:
+        verbose_name = 'Фоновая задача'
+        verbose_name_plural = 'Фоновые задачи'
+        ordering = ('-created',)
+        indexes = (
+            models.Index(
+                fields=('status', '-priority', 'run_at'),
+                name='job_queue_idx'
+            ),
+        )
+
+    def __str__(self) -> str:
+        return f'{self.name} #{self.pk} ({self.status})'
@@ -0,0 +1,122 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+TASKS = {}
+
+executor = ThreadPoolExecutor(
+    max_workers=settings.JOB_WORKERS, thread_name_prefix='jobs'
+)
+
+
+def task(name, priority=0):
+    """Регистрация функции как фоновой задачи с именем name."""
+    def decorator(func):
+        func.task_name = name
+        func.priority = priority
+        TASKS[name] = func
+        return func
+    return decorator
+
+
+def enqueue(name, user=None, priority=None, **payload):
+    """Постановка задачи в очередь.
+
+    Запись создаётся в текущей транзакции, поэтому обработчик увидит
+    задачу только после её фиксации. При JOBS_EAGER задача выполняется
+    в пуле потоков текущего процесса без отдельного обработчика.
+    """
+    job = Job.objects.create(
+        name=name,
+        payload=payload,
+        user=user,
+        priority=TASKS[name].priority if priority is None else priority,
+    )
+    if settings.JOBS_EAGER:
+        transaction.on_commit(lambda: executor.submit(run_job, job.pk))
+    return job
+
+
+def requeue_stale():
+    """Возврат в очередь задач, обработчик которых перестал отвечать."""
+    return Job.objects.filter(
+        status=Job.RUNNING,
+        started__lt=timezone.now() - timedelta(seconds=settings.JOB_TIMEOUT)
+    ).update(status=Job.PENDING)
+
+
+def claim(limit, pks=None):
+    """Захват до limit готовых к запуску задач в порядке приоритета."""
+    now = timezone.now()
+    with transaction.atomic():
+        jobs = Job.objects.filter(status=Job.PENDING, run_at__lte=now)
+        if pks is not None:
+            jobs = jobs.filter(pk__in=pks)
+        candidates = list(jobs.select_for_update(skip_locked=True).order_by(
+            '-priority', 'run_at', 'id'
+        ).values_list('id', flat=True)[:limit])
+        # Условие на статус защищает от гонки там, где SKIP LOCKED
+        # не поддерживается.
+        return [
+            pk for pk in candidates
+            if Job.objects.filter(pk=pk, status=Job.PENDING).update(
+                status=Job.RUNNING, started=now, attempts=F('attempts') + 1
+            )
+        ]
+
+
+def execute(pk):
+    """Выполнение захваченной задачи.
+
+    Возвращает задержку повторной попытки в секундах или None.
+    """
+    job = Job.objects.get(pk=pk)
+    func = TASKS.get(job.name)
+    try:
+        if func is None:
+            raise LookupError(f'Неизвестная задача {job.name}')
+        result = func(**job.payload)
+    except Exception as error:
+        logger.exception('Задача %s #%s завершилась с ошибкой',
+                         job.name, job.pk)
+        if func is not None and job.attempts < job.max_attempts:
+            delay = settings.JOB_RETRY_DELAY * 2 ** (job.attempts - 1)
+            Job.objects.filter(pk=pk).update(
+                status=Job.PENDING,
+                error=repr(error),
+                run_at=timezone.now() + timedelta(seconds=delay)
+            )
+            return delay
+        Job.objects.filter(pk=pk).update(
+            status=Job.FAILED, error=repr(error), finished=timezone.now()
+        )
+    else:
+        Job.objects.filter(pk=pk).update(
+            status=Job.DONE, result=result, error='', finished=timezone.now()
+        )
+    finally:
+        close_old_connections()
+
+
+def run_job(pk):
+    """Выполнение задачи в процессе веб-приложения (JOBS_EAGER)."""
+    try:
+        if not claim(1, pks=[pk]):
+            return
+        delay = execute(pk)
+    finally:
+        close_old_connections()
+    if delay is not None:
+        timer = threading.Timer(delay, executor.submit, (run_job, pk))
+        timer.daemon = True
+        timer.start()
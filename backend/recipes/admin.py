@@ -1,5 +1,6 @@
 from django.contrib import admin
 
+from foodgram.admin_utils import LargeTableAdmin, username_filter
 from .models import (Carts, Favorite, Ingredient, Recipe, RecipeIngredient,
                      Subscribe, Tag)
 
@@ -23,38 +24,45 @@ class RecipeIngredientAdmin(admin.TabularInline):
     autocomplete_fields = ('ingredient',)
 
 
-class RecipeAdmin(admin.ModelAdmin):
+class RecipeAdmin(LargeTableAdmin):
     inlines = (RecipeIngredientAdmin,)
     list_display = (
-        'id', 'author', 'name', 'image', 'text', 'pub_date', 'in_favorite'
+        'id', 'author', 'name', 'image', 'text', 'pub_date',
+        'favorites_count', 'carts_count'
     )
-    search_fields = ('author', 'name', 'tags')
-    list_filter = ('author', 'name', 'tags')
+    list_select_related = ('author',)
+    search_fields = ('name', '^author__username')
+    list_filter = (username_filter('Автор', 'author'), 'tags')
+    autocomplete_fields = ('author',)
     empy_value_display = '-пусто-'
     min_num = 1
 
-    def in_favorite(self, obj):
-        return obj.favorite.all().count()
 
-
-class SubscribeAdmin(admin.ModelAdmin):
+class SubscribeAdmin(LargeTableAdmin):
     list_display = ('id', 'user', 'author')
-    search_fields = ('user', 'author')
-    list_filter = ('user', 'author')
+    list_select_related = ('user', 'author')
+    search_fields = ('^user__username', '^author__username')
+    list_filter = (username_filter('Подписчик', 'user'),
+                   username_filter('Автор', 'author'))
+    autocomplete_fields = ('user', 'author')
     empy_value_display = '-пусто-'
 
 
-class FavoriteAdmin(admin.ModelAdmin):
+class FavoriteAdmin(LargeTableAdmin):
     list_display = ('id', 'user', 'recipe')
-    search_fields = ('user', 'recipe')
-    list_filter = ('user', 'recipe')
+    list_select_related = ('user', 'recipe')
+    search_fields = ('^user__username', 'recipe__name')
+    list_filter = (username_filter('Пользователь', 'user'),)
+    autocomplete_fields = ('user', 'recipe')
     empy_value_display = '-пусто-'
 
 
-class CartsAdmin(admin.ModelAdmin):
+class CartsAdmin(LargeTableAdmin):
     list_display = ('id', 'user', 'recipe')
-    search_fields = ('user', 'recipe')
-    list_filter = ('user', 'recipe')
+    list_select_related = ('user', 'recipe')
+    search_fields = ('^user__username', 'recipe__name')
+    list_filter = (username_filter('Пользователь', 'user'),)
+    autocomplete_fields = ('user', 'recipe')
     empy_value_display = '-пусто-'
 
 
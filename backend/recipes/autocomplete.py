@@ -0,0 +1,58 @@
+from bisect import bisect_left, bisect_right
+
+from .cache import LocalCache
+from .models import Ingredient
+
+SEPARATOR = '\n'
+
+
+class IngredientIndex:
+    """Отсортированный индекс названий ингредиентов в памяти процесса.
+
+    Совпадения по началу названия ищутся бинарным поиском, совпадения
+    внутри названия — через str.find по склеенной строке всех названий.
+    """
+
+    def __init__(self, rows=()):
+        self.entries = sorted(
+            (name.lower(), pk, name, unit) for pk, name, unit in rows
+        )
+        self.keys = [entry[0] for entry in self.entries]
+        self.text = SEPARATOR.join(self.keys)
+        self.offsets = []
+        offset = 0
+        for key in self.keys:
+            self.offsets.append(offset)
+            offset += len(key) + len(SEPARATOR)
+
+    def search(self, query, limit):
+        query = query.lower().replace(SEPARATOR, ' ')
+        start = bisect_left(self.keys, query)
+        end = min(bisect_right(self.keys, query + '\uffff'), start + limit)
+        found = list(range(start, end))
+        position = 0
+        while len(found) < limit:
+            position = self.text.find(query, position)
+            if position < 0:
+                break
+            index = bisect_right(self.offsets, position) - 1
+            if position != self.offsets[index]:
+                found.append(index)
+            position = self.offsets[index] + len(self.keys[index]) + 1
+        return [
+            {'id': pk, 'name': name, 'measurement_unit': unit}
+            for _, pk, name, unit in map(self.entries.__getitem__, found)
+        ]
+
+
+def build_ingredient_index():
+    return IngredientIndex(Ingredient.objects.values_list(
+        'id', 'name', 'measurement_unit'
+    ).iterator())
+
+
+ingredient_index = LocalCache('ingredients', build_ingredient_index)
+
+
+def search_ingredients(query, limit):
+    return ingredient_index.get().search(query, limit)
@@ -0,0 +1,94 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.cache import cache
+from django.db import close_old_connections
+
+VERSION_KEY = 'version:{}'
+RECIPE_KEY = 'recipe:{}:{}:{}'
+
+refresher = ThreadPoolExecutor(max_workers=1,
+                               thread_name_prefix='local-cache')
+
+
+def now():
+    return int(time.time() * 1000)
+
+
+def get_version(name):
+    """Версия набора данных: метка времени последнего изменения в мс.
+
+    Если ключ вытеснен из кеша, версия начинается заново с текущего
+    времени, поэтому никогда не совпадает с устаревшими значениями.
+    """
+    key = VERSION_KEY.format(name)
+    version = cache.get(key)
+    if version is None:
+        version = now()
+        if not cache.add(key, version, timeout=None):
+            version = cache.get(key, version)
+    return version
+
+
+def bump_version(*names):
+    for name in names:
+        key = VERSION_KEY.format(name)
+        cache.set(key, max(now(), (cache.get(key) or 0) + 1), timeout=None)
+
+
+def recipe_keys(pks):
+    """Ключи кешированных представлений рецептов.
+
+    В ключ входят версии тегов и ингредиентов: их изменение затрагивает
+    все рецепты сразу.
+    """
+    tags, ingredients = get_version('tags'), get_version('ingredients')
+    return {pk: RECIPE_KEY.format(tags, ingredients, pk) for pk in pks}
+
+
+def invalidate_recipes(pks):
+    cache.delete_many(list(recipe_keys(pks).values()))
+
+
+class LocalCache:
+    """Значение в памяти процесса, пересобираемое при смене версии.
+
+    Первое значение строится в запросе. При смене версии запросы
+    получают прежнее значение, пока новое строится в фоновом потоке.
+    """
+
+    def __init__(self, name, build):
+        self.name = name
+        self.build = build
+        self.lock = threading.Lock()
+        self.value = None
+        self.version = None
+        self.refreshing = False
+
+    def get(self):
+        version = get_version(self.name)
+        if version == self.version:
+            return self.value
+        with self.lock:
+            if self.version is None:
+                self.value, self.version = self.build(), version
+                return self.value
+            if self.refreshing:
+                return self.value
+            self.refreshing = True
+        refresher.submit(self.refresh, version)
+        return self.value
+
+    def refresh(self, version):
+        try:
+            value = self.build()
+            with self.lock:
+                self.value, self.version = value, version
+        finally:
+            self.refreshing = False
+            close_old_connections()
+
+    def reset(self):
+        with self.lock:
+            self.value = self.version = None
@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.core.checks import Warning, register
+
+LOCAL_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+@register()
+def check_shared_cache(app_configs, **kwargs):
+    """Версии наборов данных хранятся в кеше: при кеше в памяти процесса
+    их смену командами и обработчиком задач не видит приложение."""
+    if settings.CACHES['default']['BACKEND'] not in LOCAL_BACKENDS:
+        return []
+    return [Warning(
+        'Кеш по умолчанию не общий для процессов.',
+        hint=('Версии кеша, изменённые обработчиком задач и командами '
+              'вроде importcsv, не увидят процессы приложения. Укажите '
+              'CACHE_BACKEND с memcached, файловым кешем или кешем в '
+              'базе данных.'),
+        id='recipes.W001',
+    )]
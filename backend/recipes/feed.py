@@ -0,0 +1,134 @@
+from heapq import merge
+from itertools import islice
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+
+from jobs.runner import enqueue
+from users.models import User
+from .models import FeedItem, Recipe, Subscribe
+
+
+def fans_out(followers_count):
+    """Рецепты автора пишутся в ленты подписчиков, пока их меньше
+    порога; рецепты популярных авторов читаются при запросе ленты."""
+    return followers_count < settings.FEED_FAN_OUT_LIMIT
+
+
+def followers_count(author_id):
+    return User.objects.filter(pk=author_id).values_list(
+        'followers_count', flat=True
+    ).first()
+
+
+def write_items(author_id, followers, recipes):
+    """Пакетная запись рецептов recipes в ленты followers."""
+    items = (
+        FeedItem(user_id=user, recipe_id=recipe, author_id=author_id,
+                 pub_date=pub_date)
+        for recipe, pub_date in recipes for user in followers
+    )
+    while True:
+        batch = list(islice(items, settings.FEED_BATCH_SIZE))
+        if not batch:
+            break
+        FeedItem.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def fan_out(recipe_id):
+    """Запись нового рецепта в ленты подписчиков автора."""
+    recipe = Recipe.objects.filter(pk=recipe_id).values_list(
+        'author', 'pub_date', 'author__followers_count'
+    ).first()
+    if recipe is None or not fans_out(recipe[2]):
+        return
+    author, pub_date, _ = recipe
+    write_items(author, Subscribe.objects.filter(author=author).values_list(
+        'user', flat=True
+    ), [(recipe_id, pub_date)])
+
+
+def fan_out_author(author_id):
+    """Запись всех рецептов автора в ленты всех его подписчиков.
+
+    Нужна, когда автор опускается ниже порога: пока он был популярным,
+    его рецепты в ленты не писались.
+    """
+    count = followers_count(author_id)
+    if count is None or not fans_out(count):
+        return
+    write_items(author_id, list(Subscribe.objects.filter(
+        author=author_id
+    ).values_list('user', flat=True)), Recipe.objects.filter(
+        author=author_id
+    ).values_list('pk', 'pub_date'))
+
+
+def follow(user_id, author_id):
+    """Новая подписка: счётчик подписчиков; рецепты автора попадают в
+    ленту фоновой задачей, а не в запросе подписки."""
+    User.increment(author_id, 'followers_count')
+    if fans_out(followers_count(author_id)):
+        enqueue('recipes.backfill_feed', user_id=user_id,
+                author_id=author_id)
+
+
+def backfill(user_id, author_id):
+    """Запись рецептов автора в ленту нового подписчика.
+
+    Строка подписки блокируется: отписка, пришедшая во время записи,
+    дождётся её и удалит записанное.
+    """
+    with transaction.atomic():
+        subscribed = list(Subscribe.objects.select_for_update().filter(
+            user=user_id, author=author_id
+        ).values_list('pk'))
+        if subscribed and fans_out(followers_count(author_id)):
+            write_items(author_id, [user_id], Recipe.objects.filter(
+                author=author_id
+            ).values_list('pk', 'pub_date'))
+
+
+def unfollow(user_id, author_id):
+    """Отписка: рецепты автора убираются из ленты.
+
+    Переход автора ниже порога определяется одним условным UPDATE,
+    поэтому при одновременных отписках задача заполнения лент
+    ставится ровно один раз.
+    """
+    FeedItem.objects.filter(user=user_id, author=author_id).delete()
+    limit = settings.FEED_FAN_OUT_LIMIT
+    if User.objects.filter(pk=author_id, followers_count=limit).update(
+        followers_count=limit - 1
+    ):
+        enqueue('recipes.fan_out_author', author_id=author_id)
+    else:
+        User.increment(author_id, 'followers_count', -1)
+
+
+def read_feed(user, position=None, limit=None):
+    """Ключи (pub_date, id) рецептов ленты по убыванию после position.
+
+    Рецепты обычных авторов берутся из таблицы ленты, популярных — из
+    рецептов напрямую; оба источника упорядочены одинаково и сливаются.
+    """
+    celebrities = list(Subscribe.objects.filter(
+        user=user, author__followers_count__gte=settings.FEED_FAN_OUT_LIMIT
+    ).values_list('author', flat=True))
+    items = FeedItem.objects.filter(user=user).exclude(
+        author__in=celebrities
+    ).order_by('-pub_date', '-recipe')
+    recipes = Recipe.objects.filter(
+        author__in=celebrities
+    ).order_by('-pub_date', '-id')
+    if position is not None:
+        pub_date, pk = position
+        items = items.filter(Q(pub_date__lt=pub_date)
+                             | Q(pub_date=pub_date, recipe__lt=pk))
+        recipes = recipes.filter(Q(pub_date__lt=pub_date)
+                                 | Q(pub_date=pub_date, pk__lt=pk))
+    sources = [items.values_list('pub_date', 'recipe')[:limit]]
+    if celebrities:
+        sources.append(recipes.values_list('pub_date', 'pk')[:limit])
+    return list(islice(merge(*sources, reverse=True), limit))
@@ -0,0 +1,55 @@
+import hashlib
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+from jobs.runner import enqueue
+from .cache import invalidate_recipes
+from .models import Recipe
+
+VARIANTS = {
+    'thumbnail': ((320, 320), 'JPEG', 'jpg'),
+    'medium': ((960, 960), 'JPEG', 'jpg'),
+    'webp': ((960, 960), 'WEBP', 'webp'),
+}
+VARIANTS_DIR = 'recipes/images/variants'
+
+
+def render_variant(image, size, image_format):
+    variant = image.copy()
+    variant.thumbnail(size)
+    if image_format == 'JPEG' and variant.mode not in ('RGB', 'L'):
+        variant = variant.convert('RGB')
+    buffer = BytesIO()
+    variant.save(buffer, image_format, quality=85, optimize=True)
+    return buffer.getvalue()
+
+
+def make_variants(recipe_id):
+    """Уменьшенные копии изображения рецепта с именами по хешу файла."""
+    recipe = Recipe.objects.filter(pk=recipe_id).only('image').first()
+    if recipe is None or not recipe.image:
+        return
+    with recipe.image.open('rb') as file:
+        data = file.read()
+    digest = hashlib.sha256(data).hexdigest()[:32]
+    image = ImageOps.exif_transpose(Image.open(BytesIO(data)))
+    variants = {}
+    for name, (size, image_format, extension) in VARIANTS.items():
+        path = f'{VARIANTS_DIR}/{digest}-{name}.{extension}'
+        if not default_storage.exists(path):
+            path = default_storage.save(path, ContentFile(
+                render_variant(image, size, image_format)
+            ))
+        variants[name] = path
+    if Recipe.objects.filter(
+        pk=recipe_id, image=recipe.image.name
+    ).update(image_variants=variants):
+        invalidate_recipes([recipe_id])
+
+
+def schedule_variants(recipe):
+    """Обработка изображения фоновой задачей."""
+    enqueue('recipes.make_variants', recipe_id=recipe.pk)
@@ -1,22 +1,155 @@
 import csv
+import io
+import json
 import os
+import time
+from itertools import islice
 
-from django.core.management.base import BaseCommand
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
 
-from foodgram.settings import BASE_DIR
+from recipes.cache import bump_version
 from recipes.models import Ingredient
 
+FORMATS = ('csv', 'json')
+
+
+def read_csv(file):
+    reader = csv.reader(file)
+    for row in reader:
+        if not row:
+            continue
+        if len(row) < 2:
+            raise CommandError(
+                f'Строка {reader.line_num}: нужны название и единица измерения'
+            )
+        yield row[0], row[1]
+
+
+def read_json(file, chunk_size=64 * 1024):
+    """Потоковое чтение JSON-массива объектов без загрузки файла целиком."""
+    decoder = json.JSONDecoder()
+    buffer = file.read(chunk_size).lstrip()
+    if not buffer.startswith('['):
+        raise CommandError('JSON-файл должен содержать массив объектов')
+    buffer = buffer[1:]
+    while True:
+        buffer = buffer.lstrip().lstrip(',').lstrip()
+        if buffer.startswith(']'):
+            return
+        try:
+            item, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError:
+            chunk = file.read(chunk_size)
+            if not chunk:
+                raise CommandError('Некорректный JSON-файл')
+            buffer += chunk
+            continue
+        yield item['name'], item['measurement_unit']
+        buffer = buffer[end:]
+
+
+class CSVStream(io.RawIOBase):
+    """Файлоподобный объект для COPY: строки отдаются в формате CSV."""
+
+    def __init__(self, rows, progress):
+        self.rows = rows
+        self.progress = progress
+        self.buffer = b''
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        output = io.StringIO()
+        writer = csv.writer(output)
+        while size < 0 or len(self.buffer) + output.tell() < size:
+            batch = list(islice(self.rows, 1000))
+            if not batch:
+                break
+            writer.writerows(batch)
+            self.progress(len(batch))
+        self.buffer += output.getvalue().encode()
+        if size < 0:
+            size = len(self.buffer)
+        data, self.buffer = self.buffer[:size], self.buffer[size:]
+        return data
+
 
 class Command(BaseCommand):
-    help = 'Загрузка данных из CSV-файлов'
+    help = 'Загрузка ингредиентов из CSV- или JSON-файла'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path',
+            default=os.path.join(settings.BASE_DIR, 'data', 'ingredients.csv'),
+            help='Путь к файлу с ингредиентами'
+        )
+        parser.add_argument(
+            '--format', choices=FORMATS,
+            help='Формат файла, по умолчанию определяется по расширению'
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--no-copy', action='store_true',
+            help='Не использовать COPY на PostgreSQL'
+        )
 
     def handle(self, *args, **options):
-        file_path = os.path.join(BASE_DIR, 'data')
-        with open(
-            f'{file_path}/ingredients.csv', 'r', encoding='UTF-8'
-        ) as file:
-            csv_reader = csv.reader(file)
-            for row in csv_reader:
-                Ingredient.objects.get_or_create(
-                    name=row[0], measurement_unit=row[1]
-                )
+        path = options['path']
+        file_format = (options['format']
+                       or os.path.splitext(path)[1].lstrip('.').lower())
+        if file_format not in FORMATS:
+            raise CommandError(f'Неизвестный формат файла: {path}')
+        self.started = time.perf_counter()
+        self.processed = 0
+        before = Ingredient.objects.count()
+        with open(path, encoding='UTF-8') as file:
+            rows = read_csv(file) if file_format == 'csv' else read_json(file)
+            if connection.vendor == 'postgresql' and not options['no_copy']:
+                self.copy(rows)
+            else:
+                self.bulk_create(rows, options['batch_size'])
+        bump_version('ingredients')
+        created = Ingredient.objects.count() - before
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано строк: {self.processed}, добавлено: {created}, '
+            f'{self.rate():.0f} строк/с'
+        ))
+
+    def rate(self):
+        return self.processed / max(time.perf_counter() - self.started, 1e-9)
+
+    def report(self, count):
+        self.processed += count
+        self.stdout.write(f'{self.processed} строк, {self.rate():.0f} строк/с')
+
+    def bulk_create(self, rows, batch_size):
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                return
+            Ingredient.objects.bulk_create(
+                (Ingredient(name=name, measurement_unit=unit)
+                 for name, unit in batch),
+                ignore_conflicts=True
+            )
+            self.report(len(batch))
+
+    def copy(self, rows):
+        table = connection.ops.quote_name(Ingredient._meta.db_table)
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                'CREATE TEMPORARY TABLE ingredient_import '
+                '(name text, measurement_unit text) ON COMMIT DROP'
+            )
+            cursor.copy_expert(
+                'COPY ingredient_import FROM STDIN WITH (FORMAT csv)',
+                CSVStream(rows, self.report)
+            )
+            cursor.execute(
+                f'INSERT INTO {table} (name, measurement_unit) '
+                'SELECT DISTINCT name, measurement_unit '
+                'FROM ingredient_import ON CONFLICT DO NOTHING'
+            )
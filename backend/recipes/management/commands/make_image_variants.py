@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from recipes.image_variants import make_variants
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Создание уменьшенных копий изображений рецептов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Пересоздать варианты и для уже обработанных рецептов'
+        )
+
+    def handle(self, *args, **options):
+        recipes = Recipe.objects.exclude(image='')
+        if not options['all']:
+            recipes = recipes.filter(image_variants={})
+        processed = 0
+        for pk in recipes.values_list('pk', flat=True).iterator():
+            make_variants(pk)
+            processed += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано рецептов: {processed}'
+        ))
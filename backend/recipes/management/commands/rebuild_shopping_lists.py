@@ -0,0 +1,56 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from recipes.models import ShoppingListItem
+
+
+class Command(BaseCommand):
+    help = 'Пересчёт или проверка сохранённых списков покупок'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify', action='store_true',
+            help='Только сравнить сохранённые суммы с пересчитанными'
+        )
+
+    def handle(self, *args, **options):
+        if not options['verify']:
+            ShoppingListItem.objects.rebuild()
+            self.stdout.write(self.style.SUCCESS(
+                'Списки покупок пересчитаны: '
+                f'{ShoppingListItem.objects.count()} строк'
+            ))
+            return
+        drift, users = self.drift()
+        if drift:
+            raise CommandError(
+                f'Расхождений в списках покупок: {drift}, '
+                f'пользователей: {users}. '
+                'Запустите команду без --verify.'
+            )
+        self.stdout.write(self.style.SUCCESS('Расхождений не найдено'))
+
+    def drift(self):
+        """Число расхождений и затронутых пользователей.
+
+        Пересчитанные суммы сравниваются с сохранёнными в базе одним
+        FULL OUTER JOIN по (пользователь, ингредиент): строка, которой
+        нет с одной из сторон, тоже считается расхождением.
+        """
+        expected, params = (
+            ShoppingListItem.objects.expected().query.sql_with_params()
+        )
+        user = connection.ops.quote_name('user')
+        table = connection.ops.quote_name(ShoppingListItem._meta.db_table)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT COUNT(*), COUNT(DISTINCT COALESCE('
+                f'expected.{user}, stored.user_id)) '
+                f'FROM ({expected}) AS expected '
+                f'FULL OUTER JOIN {table} AS stored '
+                f'ON expected.{user} = stored.user_id '
+                'AND expected.ingredient_id = stored.ingredient_id '
+                'WHERE expected.total IS DISTINCT FROM stored.amount',
+                params
+            )
+            return cursor.fetchone()
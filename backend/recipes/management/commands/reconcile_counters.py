@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from recipes.models import Carts, Favorite, Recipe, Subscribe
+from users.models import User
+
+COUNTERS = (
+    (Recipe, 'favorites_count', Favorite, 'recipe'),
+    (Recipe, 'carts_count', Carts, 'recipe'),
+    (User, 'recipes_count', Recipe, 'author'),
+    (User, 'followers_count', Subscribe, 'author'),
+)
+
+
+def actual_count(model, field):
+    return Coalesce(Subquery(
+        model.objects.filter(**{field: OuterRef('pk')}).order_by()
+        .values(field).annotate(total=Count('pk')).values('total')
+    ), 0)
+
+
+class Command(BaseCommand):
+    help = 'Проверка и исправление счётчиков рецептов и пользователей'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify', action='store_true',
+            help='Только найти расхождения, не исправляя их'
+        )
+
+    def handle(self, *args, **options):
+        total = 0
+        for model, counter, source, field in COUNTERS:
+            actual = actual_count(source, field)
+            drifted = model.objects.annotate(actual=actual).exclude(
+                **{counter: F('actual')}
+            ).values('pk')
+            count = drifted.count()
+            total += count
+            self.stdout.write(
+                f'{model._meta.model_name}.{counter}: расхождений {count}'
+            )
+            if count and not options['verify']:
+                model.objects.filter(pk__in=drifted).update(
+                    **{counter: actual}
+                )
+        if total and options['verify']:
+            raise CommandError(
+                f'Расхождений в счётчиках: {total}. '
+                'Запустите команду без --verify.'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            'Счётчики исправлены' if total else 'Расхождений не найдено'
+        ))
@@ -0,0 +1,308 @@
+import re
+import threading
+from array import array
+from bisect import bisect_left, insort
+from collections import defaultdict
+from itertools import islice
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .cache import now
+from .models import RecipeIngredient
+
+SEQUENCE_KEY = 'ingredient-match:sequence'
+CHANGE_KEY = 'ingredient-match:{}'
+NONZERO = re.compile(rb'[^\x00]')
+
+popcount = getattr(int, 'bit_count', lambda value: bin(value).count('1'))
+
+
+def to_bitset(recipes):
+    data = bytearray((recipes[-1] >> 3) + 1 if recipes else 0)
+    for recipe in recipes:
+        data[recipe >> 3] |= 1 << (recipe & 7)
+    return int.from_bytes(data, 'little')
+
+
+def descending(bitset):
+    """Номера единичных битов по убыванию."""
+    length = (bitset.bit_length() + 7) // 8
+    data = bitset.to_bytes(length, 'big')
+    for match in NONZERO.finditer(data):
+        byte = data[match.start()]
+        base = (length - 1 - match.start()) * 8
+        for bit in range(7, -1, -1):
+            if byte >> bit & 1:
+                yield base + bit
+
+
+class IngredientMatchIndex:
+    """Обратный индекс «ингредиент → рецепты» в памяти процесса.
+
+    Рецепты ингредиента хранятся отсортированным массивом id или
+    битовым множеством по id — тем, что компактнее: частые ингредиенты
+    занимают по биту на рецепт, редкие — по 4 байта на вхождение.
+    Рецепты также разбиты на битовые множества по числу ингредиентов,
+    а обратная карта «рецепт → ингредиенты» позволяет обновить рецепт,
+    не перебирая списки всех ингредиентов.
+    """
+
+    def __init__(self, rows=()):
+        postings = defaultdict(list)
+        ingredients = defaultdict(list)
+        for recipe, ingredient in rows:
+            postings[ingredient].append(recipe)
+            ingredients[recipe].append(ingredient)
+        self.ingredients = {recipe: tuple(values)
+                            for recipe, values in ingredients.items()}
+        self.sizes = array('H')
+        for recipes in postings.values():
+            recipes.sort()
+            self.grow(recipes[-1])
+            for recipe in recipes:
+                self.sizes[recipe] += 1
+        self.postings = {
+            ingredient: (to_bitset(recipes)
+                         if len(recipes) * 32 > len(self.sizes)
+                         else array('I', recipes))
+            for ingredient, recipes in postings.items()
+        }
+        by_size = defaultdict(list)
+        for recipe, size in enumerate(self.sizes):
+            if size:
+                by_size[size].append(recipe)
+        self.by_size = {
+            size: to_bitset(recipes) for size, recipes in by_size.items()
+        }
+
+    def grow(self, recipe):
+        if recipe >= len(self.sizes):
+            self.sizes.extend([0] * (recipe + 1 - len(self.sizes)))
+
+    def update(self, recipes, rows):
+        """Замена ингредиентов рецептов recipes на строки rows."""
+        for recipe in recipes:
+            bit = 1 << recipe
+            for ingredient in self.ingredients.pop(recipe, ()):
+                postings = self.postings[ingredient]
+                if isinstance(postings, int):
+                    self.postings[ingredient] = postings & ~bit
+                    continue
+                index = bisect_left(postings, recipe)
+                if index < len(postings) and postings[index] == recipe:
+                    del postings[index]
+            if recipe < len(self.sizes) and self.sizes[recipe]:
+                self.resize(recipe, 0)
+        ingredients = defaultdict(list)
+        for recipe, ingredient in rows:
+            postings = self.postings.setdefault(ingredient, array('I'))
+            if isinstance(postings, int):
+                self.postings[ingredient] = postings | 1 << recipe
+            else:
+                insort(postings, recipe)
+            ingredients[recipe].append(ingredient)
+        for recipe, values in ingredients.items():
+            self.ingredients[recipe] = tuple(values)
+            self.grow(recipe)
+            self.resize(recipe, len(values))
+
+    def resize(self, recipe, size):
+        bit = 1 << recipe
+        old = self.sizes[recipe]
+        if old:
+            self.by_size[old] &= ~bit
+        if size:
+            self.by_size[size] = self.by_size.get(size, 0) | bit
+        self.sizes[recipe] = size
+
+    def match(self, ingredients, full=False):
+        """Рецепты, которые покрывает набор ingredients.
+
+        Покрытие — доля ингредиентов рецепта, входящих в набор; в режиме
+        full остаются только полностью покрытые рецепты. Число совпавших
+        ингредиентов считается поразрядным сложением битовых множеств:
+        i-е множество counters содержит рецепты с единицей в i-м бите
+        счётчика.
+        """
+        counters = []
+        for ingredient in set(ingredients):
+            postings = self.postings.get(ingredient)
+            if postings is None:
+                continue
+            carry = (postings if isinstance(postings, int)
+                     else to_bitset(postings))
+            for index, counter in enumerate(counters):
+                counters[index], carry = counter ^ carry, counter & carry
+                if not carry:
+                    break
+            if carry:
+                counters.append(carry)
+        return Matches(counters, dict(self.by_size), full)
+
+
+class Matches:
+    """Результат подбора по убыванию покрытия, затем числа совпавших
+    ингредиентов и id рецепта.
+
+    Рецепты группируются по паре (совпало, всего ингредиентов): групп
+    немного, и они упорядочены так же, как рецепты. Срез перебирает
+    группы по порядку и достаёт рецепты только из попавших в него.
+    """
+
+    def __init__(self, counters, by_size, full=False):
+        self.counters = counters
+        self.by_size = by_size
+        self.full = full
+        self.equal = {}
+        self.groups = sorted(
+            ((count / size, count, size)
+             for size in by_size
+             for count in range(1, min(size, 2 ** len(counters) - 1) + 1)
+             if not full or count == size),
+            reverse=True
+        )
+        matched = 0
+        if full:
+            for _, count, size in self.groups:
+                matched |= self.group(count, size)
+        else:
+            for counter in counters:
+                matched |= counter
+        self.total = popcount(matched)
+
+    def count_equals(self, count):
+        """Рецепты, у которых совпало ровно count ингредиентов."""
+        if count not in self.equal:
+            result = -1
+            for index, counter in enumerate(self.counters):
+                result &= counter if count >> index & 1 else ~counter
+            self.equal[count] = result
+        return self.equal[count]
+
+    def group(self, count, size):
+        return self.count_equals(count) & self.by_size[size]
+
+    def __len__(self):
+        return self.total
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start, stop, _ = index.indices(self.total)
+        skip, need = start, stop - start
+        found = []
+        for coverage, count, size in self.groups:
+            if len(found) >= need:
+                break
+            group = self.group(count, size)
+            if not group:
+                continue
+            if skip:
+                number = popcount(group)
+                if number <= skip:
+                    skip -= number
+                    continue
+            found.extend(
+                {'id': recipe, 'coverage': coverage, 'missing': size - count}
+                for recipe in islice(descending(group), skip,
+                                     skip + need - len(found))
+            )
+            skip = 0
+        return found
+
+
+class IngredientMatchCache:
+    """Индекс, догоняющий журнал изменённых рецептов в общем кеше.
+
+    Процесс применяет к индексу только рецепты из журнала с момента
+    своей последней синхронизации. Если журнал неполон или отстаёт
+    больше чем на INGREDIENT_MATCH_MAX_CHANGES записей, индекс
+    строится заново. Запросы к базе и построение идут вне lock: пока
+    один поток строит индекс, остальные отвечают по прежнему.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.build_lock = threading.Lock()
+        self.index = None
+        self.sequence = None
+
+    def sync(self):
+        sequence = cache.get(SEQUENCE_KEY)
+        with self.lock:
+            index, current = self.index, self.sequence
+        if index is not None:
+            if sequence == current or self.catch_up(current, sequence):
+                return
+        # Без индекса ждём построения, с индексом — не строим его
+        # одновременно в нескольких потоках.
+        if not self.build_lock.acquire(blocking=index is None):
+            return
+        try:
+            if self.index is not index:
+                return
+            # Номер журнала прочитан до индекса: изменения, попавшие
+            # между ними, применятся повторно, что безопасно.
+            index = IngredientMatchIndex(
+                RecipeIngredient.objects.values_list(
+                    'recipe', 'ingredient'
+                ).iterator(chunk_size=settings.ITERATOR_CHUNK)
+            )
+            with self.lock:
+                self.index, self.sequence = index, sequence
+        finally:
+            self.build_lock.release()
+
+    def catch_up(self, current, sequence):
+        """Применение журнала с номера current до sequence; False, если
+        журнала не хватает."""
+        if (None in (sequence, current)
+                or not 0 < sequence - current
+                <= settings.INGREDIENT_MATCH_MAX_CHANGES):
+            return False
+        keys = [CHANGE_KEY.format(number)
+                for number in range(current + 1, sequence + 1)]
+        changes = cache.get_many(keys)
+        if len(changes) != len(keys):
+            return False
+        recipes = set().union(*changes.values())
+        rows = list(RecipeIngredient.objects.filter(
+            recipe__in=recipes
+        ).values_list('recipe', 'ingredient'))
+        with self.lock:
+            # Другой поток мог уже продвинуть или перестроить индекс.
+            if self.sequence == current:
+                self.index.update(recipes, rows)
+                self.sequence = sequence
+        return True
+
+    def match(self, ingredients, full=False):
+        self.sync()
+        with self.lock:
+            return self.index.match(ingredients, full)
+
+
+ingredient_match = IngredientMatchCache()
+
+
+def match_recipes(ingredients, full=False):
+    return ingredient_match.match(ingredients, full)
+
+
+def record_changes(pks):
+    """Запись изменённых рецептов в журнал индекса подбора."""
+    pks = list(pks)
+    if not pks:
+        return
+    # Отсчёт с текущего времени: после вытеснения ключа номера не
+    # совпадают с прежними.
+    cache.add(SEQUENCE_KEY, now(), timeout=None)
+    try:
+        sequence = cache.incr(SEQUENCE_KEY)
+    except ValueError:
+        # Ключ вытеснен: процессы не найдут свой номер и перестроят
+        # индекс целиком.
+        return
+    cache.set(CHANGE_KEY.format(sequence), pks,
+              settings.INGREDIENT_MATCH_LOG_TIMEOUT)
@@ -0,0 +1,59 @@
+# Generated by Django 3.2.3 on 2026-10-18 19:54
+
+from django.db import migrations, models
+
+SMALLINT_MAX = 32767
+
+
+def merge_amounts(model, owner, keep, others, limit=None):
+    """Перенос строк model с ингредиентов others на keep.
+
+    Количества одного владельца (рецепта или пользователя) по всем
+    дублям складываются в одну строку с ингредиентом keep, сумма
+    ограничивается limit.
+    """
+    totals = model.objects.filter(
+        ingredient__in=[keep, *others]
+    ).values(owner).annotate(total=models.Sum('amount')).order_by()
+    totals = {row[owner]: min(row['total'], limit or row['total'])
+              for row in totals}
+    model.objects.filter(ingredient__in=others).delete()
+    for pk, total in totals.items():
+        model.objects.update_or_create(
+            **{f'{owner}_id': pk}, ingredient_id=keep,
+            defaults={'amount': total}
+        )
+
+
+def merge_duplicates(apps, schema_editor):
+    Ingredient = apps.get_model('recipes', 'Ingredient')
+    RecipeIngredient = apps.get_model('recipes', 'RecipeIngredient')
+    ShoppingListItem = apps.get_model('recipes', 'ShoppingListItem')
+    duplicates = Ingredient.objects.values(
+        'name', 'measurement_unit'
+    ).annotate(
+        keep=models.Min('id'), total=models.Count('id')
+    ).filter(total__gt=1).order_by()
+    for row in duplicates:
+        others = list(Ingredient.objects.filter(
+            name=row['name'], measurement_unit=row['measurement_unit']
+        ).exclude(id=row['keep']).values_list('id', flat=True))
+        merge_amounts(RecipeIngredient, 'recipe', row['keep'], others,
+                      SMALLINT_MAX)
+        merge_amounts(ShoppingListItem, 'user', row['keep'], others)
+        Ingredient.objects.filter(id__in=others).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0003_shoppinglistitem'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicates, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='ingredient',
+            constraint=models.UniqueConstraint(fields=('name', 'measurement_unit'), name='unique_ingredient_unit'),
+        ),
+    ]
@@ -0,0 +1,15 @@
+from django.db import migrations
+
+from foodgram.migration_utils import trigram_index
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0004_unique_ingredient_unit'),
+    ]
+
+    operations = [
+        trigram_index('recipes_ingredient_name_trgm', 'recipes_ingredient',
+                      'name'),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.3 on 2026-10-18 19:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0005_ingredient_name_trgm'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict, verbose_name='Варианты изображения'),
+        ),
+    ]
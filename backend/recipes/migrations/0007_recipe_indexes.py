@@ -0,0 +1,26 @@
+# Generated by Django 3.2.3 on 2026-10-18 20:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0006_recipe_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-pub_date', '-id'], name='recipe_pub_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['author', '-pub_date', '-id'], name='recipe_author_pub_date_idx'),
+        ),
+        migrations.RunSQL(
+            'CREATE INDEX recipe_tags_tag_recipe_idx '
+            'ON recipes_recipe_tags (tag_id, recipe_id)',
+            'DROP INDEX recipe_tags_tag_recipe_idx',
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 3.2.3 on 2026-10-18 20:11
+
+from django.db import migrations, models
+
+
+def fill_tags_masks(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    masks = {}
+    for recipe, tag in Recipe.tags.through.objects.filter(
+        tag__lte=63
+    ).values_list('recipe', 'tag').iterator():
+        masks[recipe] = masks.get(recipe, 0) | 1 << (tag - 1)
+    Recipe.objects.bulk_update(
+        [Recipe(pk=pk, tags_mask=mask) for pk, mask in masks.items()],
+        ('tags_mask',),
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_recipe_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='tags_mask',
+            field=models.BigIntegerField(default=0, editable=False, verbose_name='Битовая маска тегов'),
+        ),
+        migrations.RunPython(fill_tags_masks, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 3.2.3 on 2026-10-18 20:13
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def count(model, field):
+    return Coalesce(models.Subquery(
+        model.objects.filter(**{field: models.OuterRef('pk')}).order_by()
+        .values(field).annotate(total=models.Count('pk')).values('total')
+    ), 0)
+
+
+def fill_counters(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    Favorite = apps.get_model('recipes', 'Favorite')
+    Carts = apps.get_model('recipes', 'Carts')
+    User = apps.get_model('users', 'User')
+    Recipe.objects.update(
+        favorites_count=count(Favorite, 'recipe'),
+        carts_count=count(Carts, 'recipe'),
+    )
+    User.objects.update(recipes_count=count(Recipe, 'author'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0008_recipe_tags_mask'),
+        ('users', '0002_user_recipes_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='carts_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='В списках покупок'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='В избранном'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['-favorites_count', '-id'], name='recipe_favorites_count_idx'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
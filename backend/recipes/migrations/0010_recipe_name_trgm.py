@@ -0,0 +1,14 @@
+from django.db import migrations
+
+from foodgram.migration_utils import trigram_index
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0009_recipe_counters'),
+    ]
+
+    operations = [
+        trigram_index('recipes_recipe_name_trgm', 'recipes_recipe', 'name'),
+    ]
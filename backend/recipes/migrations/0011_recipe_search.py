@@ -0,0 +1,48 @@
+# Generated by Django 3.2.3 on 2026-10-18 20:26
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+INGREDIENT_NAMES = (
+    "(SELECT string_agg(i.name, ' ') FROM recipes_recipeingredient ri "
+    "JOIN recipes_ingredient i ON i.id = ri.ingredient_id "
+    "WHERE ri.recipe_id = r.id)"
+)
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        "UPDATE recipes_recipe r SET search_vector = "
+        "setweight(to_tsvector('russian', r.name), 'A') || "
+        "setweight(to_tsvector('russian', "
+        f"coalesce({INGREDIENT_NAMES}, '')), 'B') "
+        "|| setweight(to_tsvector('russian', r.text), 'C')"
+    )
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS recipe_search_idx '
+        'ON recipes_recipe USING gin (search_vector)'
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS recipe_search_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0010_recipe_name_trgm'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='Поисковый вектор'),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,81 @@
+# Generated by Django 3.2.3 on 2026-10-18 20:47
+
+from itertools import islice
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models.functions import Coalesce
+
+
+def fill_feed(apps, schema_editor):
+    User = apps.get_model('users', 'User')
+    Subscribe = apps.get_model('recipes', 'Subscribe')
+    Recipe = apps.get_model('recipes', 'Recipe')
+    FeedItem = apps.get_model('recipes', 'FeedItem')
+    User.objects.update(followers_count=Coalesce(models.Subquery(
+        Subscribe.objects.filter(author=models.OuterRef('pk')).order_by()
+        .values('author').annotate(total=models.Count('pk')).values('total')
+    ), 0))
+    # Ленты заполняются только рецептами авторов ниже порога:
+    # рецепты популярных авторов читаются при запросе ленты.
+    for author in User.objects.filter(
+        followers_count__gt=0,
+        followers_count__lt=settings.FEED_FAN_OUT_LIMIT
+    ).values_list('pk', flat=True).iterator():
+        followers = list(Subscribe.objects.filter(
+            author=author
+        ).values_list('user', flat=True))
+        items = (
+            FeedItem(user_id=user, recipe_id=recipe, author_id=author,
+                     pub_date=pub_date)
+            for recipe, pub_date in Recipe.objects.filter(
+                author=author
+            ).values_list('pk', 'pub_date')
+            for user in followers
+        )
+        while True:
+            batch = list(islice(items, 1000))
+            if not batch:
+                break
+            FeedItem.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0011_recipe_search'),
+        ('users', '0004_user_followers_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pub_date', models.DateTimeField(verbose_name='Дата публикации')),
+                ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Автор')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_items', to='recipes.recipe', verbose_name='Рецепт')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_items', to=settings.AUTH_USER_MODEL, verbose_name='Подписчик')),
+            ],
+            options={
+                'verbose_name': 'Запись ленты',
+                'verbose_name_plural': 'Записи ленты',
+                'ordering': ('-pub_date', '-recipe'),
+            },
+        ),
+        migrations.AddIndex(
+            model_name='feeditem',
+            index=models.Index(fields=['user', '-pub_date', '-recipe'], name='feed_item_user_pub_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='feeditem',
+            index=models.Index(fields=['user', 'author'], name='feed_item_user_author_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='feeditem',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='unique_feed_item'),
+        ),
+        migrations.RunPython(fill_feed, migrations.RunPython.noop),
+    ]
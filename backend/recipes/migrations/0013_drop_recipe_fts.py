@@ -0,0 +1,18 @@
+from django.db import migrations
+
+
+def drop_fts_table(apps, schema_editor):
+    # Таблица FTS5 создавалась прежней версией 0011 для поиска в SQLite.
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS recipes_recipe_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0012_feed_item'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_fts_table, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,11 @@
 from django.conf import settings
-from django.db import models
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVectorField)
+from django.core.files.storage import default_storage
+from django.db import connections, models, transaction
+from django.db.models.functions import Cast
 
+from foodgram.counters import CountersMixin
 from foodgram.validators import (validate_amount_ingredient,
                                  validate_cooking_time, validate_slug)
 from users.models import User
@@ -49,12 +54,111 @@ class Ingredient(models.Model):
         verbose_name = 'Ингредиент'
         verbose_name_plural = 'Ингредиенты'
         ordering = ('name',)
+        constraints = (
+            models.UniqueConstraint(
+                fields=['name', 'measurement_unit'],
+                name='unique_ingredient_unit'
+            ),
+        )
 
     def __str__(self) -> str:
         return f'{self.name} ({self.measurement_unit})'
 
 
-class Recipe(models.Model):
+TAGS_MASK_BITS = 63
+
+
+def tags_mask(tag_ids):
+    """Битовая маска тегов: тегу с id n соответствует бит n - 1.
+
+    Теги с id больше TAGS_MASK_BITS в маску не попадают.
+    """
+    mask = 0
+    for pk in tag_ids:
+        if 0 < pk <= TAGS_MASK_BITS:
+            mask |= 1 << (pk - 1)
+    return mask
+
+
+class RecipeQuerySet(models.QuerySet):
+
+    def with_user_flags(self, user):
+        """Флаги избранного, списка покупок и подписки для пользователя."""
+        if not user.is_authenticated:
+            false = models.Value(False, output_field=models.BooleanField())
+            return self.annotate(
+                is_favorited=false,
+                is_in_shopping_cart=false,
+                author_is_subscribed=false,
+            )
+        return self.annotate(
+            is_favorited=models.Exists(Favorite.objects.filter(
+                user=user, recipe=models.OuterRef('pk')
+            )),
+            is_in_shopping_cart=models.Exists(Carts.objects.filter(
+                user=user, recipe=models.OuterRef('pk')
+            )),
+            author_is_subscribed=models.Exists(Subscribe.objects.filter(
+                user=user, author=models.OuterRef('author')
+            )),
+        )
+
+    def with_tags(self, tag_ids, match_all=False):
+        """Рецепты с любым из тегов или, при match_all, со всеми.
+
+        Теги из битовой маски проверяются по полю tags_mask без
+        обращения к таблице связей, остальные — подзапросом EXISTS.
+        """
+        tag_ids = set(tag_ids)
+        mask = tags_mask(tag_ids)
+        others = [pk for pk in tag_ids if not 0 < pk <= TAGS_MASK_BITS]
+        through = Recipe.tags.through.objects
+        queryset = self.alias(tag_bits=models.F('tags_mask').bitand(mask))
+        if match_all:
+            queryset = queryset.filter(tag_bits=mask)
+            for pk in others:
+                queryset = queryset.filter(models.Exists(through.filter(
+                    recipe=models.OuterRef('pk'), tag=pk
+                )))
+            return queryset
+        condition = models.Q(tag_bits__gt=0)
+        if others:
+            condition |= models.Q(models.Exists(through.filter(
+                recipe=models.OuterRef('pk'), tag__in=others
+            )))
+        return queryset.filter(condition)
+
+    def search(self, value):
+        """Полнотекстовый поиск с релевантностью в поле search_rank.
+
+        Поиск идёт по полю search_vector с GIN-индексом PostgreSQL. В
+        других базах, например SQLite для локального запуска, рецепты
+        отбираются по вхождению всех слов в название, без релевантности.
+        """
+        if connections[self.db].vendor != 'postgresql':
+            queryset = self
+            for word in value.split():
+                queryset = queryset.filter(name__icontains=word)
+            return queryset
+        query = SearchQuery(value, config=settings.RECIPE_SEARCH_CONFIG,
+                            search_type='websearch')
+        # ts_rank возвращает real: без приведения к double precision
+        # позиция курсора, записанная как float, не совпадает с
+        # рангом в базе, и курсор не продвигается.
+        return self.filter(search_vector=query).annotate(
+            search_rank=Cast(SearchRank(models.F('search_vector'), query),
+                             models.FloatField())
+        )
+
+    def latest_per_author(self, limit):
+        """Не больше limit последних рецептов каждого автора."""
+        latest = Recipe.objects.filter(
+            author=models.OuterRef('author')
+        ).order_by('-pub_date', '-id').values('pk')[:limit]
+        return self.filter(pk__in=models.Subquery(latest))
+
+
+class Recipe(CountersMixin, models.Model):
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -69,6 +173,11 @@ class Recipe(models.Model):
         'Изображение',
         upload_to='recipes/images/',
     )
+    image_variants = models.JSONField(
+        'Варианты изображения',
+        default=dict,
+        blank=True
+    )
     text = models.TextField(
         'Описание рецепта',
     )
@@ -81,6 +190,11 @@ class Recipe(models.Model):
         verbose_name='Теги',
         related_name='tags'
     )
+    tags_mask = models.BigIntegerField(
+        'Битовая маска тегов',
+        default=0,
+        editable=False
+    )
     ingredients = models.ManyToManyField(
         Ingredient,
         through='RecipeIngredient',
@@ -91,15 +205,58 @@ class Recipe(models.Model):
         'Время приготовления, мин.',
         validators=(validate_cooking_time,)
     )
+    favorites_count = models.PositiveIntegerField(
+        'В избранном',
+        default=0,
+        editable=False
+    )
+    carts_count = models.PositiveIntegerField(
+        'В списках покупок',
+        default=0,
+        editable=False
+    )
+    search_vector = SearchVectorField(
+        'Поисковый вектор',
+        null=True,
+        editable=False
+    )
+
+    objects = RecipeQuerySet.as_manager()
+
+    counter_fields = ('favorites_count', 'carts_count')
 
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
         ordering = ('-pub_date',)
+        indexes = (
+            models.Index(
+                fields=('-pub_date', '-id'),
+                name='recipe_pub_date_idx'
+            ),
+            models.Index(
+                fields=('author', '-pub_date', '-id'),
+                name='recipe_author_pub_date_idx'
+            ),
+            models.Index(
+                fields=('-favorites_count', '-id'),
+                name='recipe_favorites_count_idx'
+            ),
+        )
 
     def __str__(self) -> str:
         return self.name
 
+    def get_image_url(self, variant):
+        """Адрес варианта изображения или оригинала, пока он не готов."""
+        name = self.image_variants.get(variant)
+        return default_storage.url(name) if name else self.image.url
+
+    def ingredient_amounts(self):
+        return dict(self.recipe_ingredients.values_list(
+            'ingredient', 'amount'
+        ))
+
 
 class RecipeIngredient(models.Model):
     recipe = models.ForeignKey(
@@ -161,6 +318,57 @@ class Subscribe(models.Model):
         return f'Подписка {self.user} на {self.author}'
 
 
+class FeedItem(models.Model):
+    """Рецепт в ленте подписчика, записанный при публикации.
+
+    Автор и дата публикации повторяют поля рецепта: по ним лента
+    читается одним индексом и очищается при отписке.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_items',
+        verbose_name='Подписчик'
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='feed_items',
+        verbose_name='Рецепт'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор'
+    )
+    pub_date = models.DateTimeField('Дата публикации')
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        ordering = ('-pub_date', '-recipe')
+        constraints = (
+            models.UniqueConstraint(
+                fields=['user', 'recipe'],
+                name='unique_feed_item'
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=('user', '-pub_date', '-recipe'),
+                name='feed_item_user_pub_date_idx'
+            ),
+            models.Index(
+                fields=('user', 'author'),
+                name='feed_item_user_author_idx'
+            ),
+        )
+
+    def __str__(self) -> str:
+        return f'{self.recipe} в ленте {self.user}'
+
+
 class Favorite(models.Model):
     user = models.ForeignKey(
         User,
@@ -215,3 +423,115 @@ class Carts(models.Model):
 
     def __str__(self) -> str:
         return f'{self.user} - {self.recipe}'
+
+
+class ShoppingListQuerySet(models.QuerySet):
+
+    def refresh(self, user_ids, ingredient_ids=None):
+        """Пересчёт сумм ингредиентов ingredient_ids (по умолчанию всех)
+        в списках покупок пользователей по содержимому их корзин.
+
+        Строки пользователей блокируются: пересчёты одного списка идут
+        по очереди, и последний читает все зафиксированные изменения.
+        """
+        user_ids = list(user_ids)
+        if ingredient_ids is not None:
+            ingredient_ids = list(ingredient_ids)
+        if not user_ids or ingredient_ids == []:
+            return
+        with transaction.atomic(using=self.db):
+            list(User.objects.select_for_update().filter(
+                pk__in=user_ids
+            ).order_by('pk').values_list('pk'))
+            items = self.filter(user__in=user_ids)
+            if ingredient_ids is not None:
+                items = items.filter(ingredient__in=ingredient_ids)
+            items.delete()
+            self.bulk_create(
+                ShoppingListItem(user_id=user, ingredient_id=ingredient,
+                                 amount=total)
+                for user, ingredient, total in self.expected(
+                    user_ids, ingredient_ids
+                )
+            )
+
+    def refresh_on_commit(self, user_ids, ingredient_ids=None):
+        """Пересчёт после фиксации текущей транзакции.
+
+        Пересчитанные суммы не зависят от порядка изменений, поэтому
+        отложенный пересчёт не теряет параллельных правок корзин и
+        рецептов.
+        """
+        user_ids = list(user_ids)
+        if ingredient_ids is not None:
+            ingredient_ids = list(ingredient_ids)
+        transaction.on_commit(
+            lambda: self.refresh(user_ids, ingredient_ids), using=self.db
+        )
+
+    def change_recipe(self, recipe, ingredient_ids):
+        """Пересчёт ingredient_ids во всех списках с рецептом recipe.
+
+        Нужен после пакетных изменений ингредиентов рецепта, которые
+        не вызывают сигналов моделей.
+        """
+        self.refresh_on_commit(
+            recipe.carts.values_list('user', flat=True), ingredient_ids
+        )
+
+    def rebuild(self):
+        """Полный пересчёт списков покупок по содержимому корзин."""
+        with transaction.atomic():
+            self.all().delete()
+            self.bulk_create(
+                (ShoppingListItem(user_id=user, ingredient_id=ingredient,
+                                  amount=total)
+                 for user, ingredient, total in self.expected().iterator()),
+                batch_size=1000
+            )
+
+    def expected(self, user_ids=None, ingredient_ids=None):
+        """Суммы ингредиентов, посчитанные заново по спискам покупок."""
+        # Условия в одном filter(): иначе каждое соединяется с корзинами
+        # отдельно и суммы умножаются.
+        filters = {'recipe__carts__isnull': False}
+        if user_ids is not None:
+            filters['recipe__carts__user__in'] = user_ids
+        if ingredient_ids is not None:
+            filters['ingredient__in'] = ingredient_ids
+        return RecipeIngredient.objects.filter(**filters).values(
+            'ingredient', user=models.F('recipe__carts__user')
+        ).annotate(
+            total=models.Sum('amount')
+        ).values_list('user', 'ingredient', 'total').order_by()
+
+
+class ShoppingListItem(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='shopping_list',
+        verbose_name='Пользователь'
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='shopping_list_items',
+        verbose_name='Ингредиент'
+    )
+    amount = models.PositiveIntegerField('Количество')
+
+    objects = ShoppingListQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'Ингредиент списка покупок'
+        verbose_name_plural = 'Ингредиенты списков покупок'
+        ordering = ('user', 'ingredient')
+        constraints = (
+            models.UniqueConstraint(
+                fields=['user', 'ingredient'], name='unique_shopping_list'
+            ),
+        )
+
+    def __str__(self) -> str:
+        return f'{self.user} - {self.amount} {self.ingredient}'
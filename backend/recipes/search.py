@@ -0,0 +1,36 @@
+from django.conf import settings
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchVector
+from django.db import connection
+from django.db.models import OuterRef, Subquery
+
+from .models import Recipe, RecipeIngredient
+
+BATCH_SIZE = 1000
+
+
+def ingredient_names():
+    return Subquery(
+        RecipeIngredient.objects.filter(
+            recipe=OuterRef('pk')
+        ).order_by().values('recipe').annotate(
+            names=StringAgg('ingredient__name', ' ')
+        ).values('names')
+    )
+
+
+def update_search_index(pks):
+    """Пересчёт поискового вектора рецептов по названию, ингредиентам
+    и описанию. Вектор есть только в PostgreSQL."""
+    if connection.vendor != 'postgresql':
+        return
+    pks = list(pks)
+    config = settings.RECIPE_SEARCH_CONFIG
+    for start in range(0, len(pks), BATCH_SIZE):
+        Recipe.objects.filter(
+            pk__in=pks[start:start + BATCH_SIZE]
+        ).update(search_vector=(
+            SearchVector('name', weight='A', config=config)
+            + SearchVector(ingredient_names(), weight='B', config=config)
+            + SearchVector('text', weight='C', config=config)
+        ))
@@ -0,0 +1,206 @@
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete)
+from django.dispatch import receiver
+
+from jobs.runner import enqueue
+from users.models import User
+from .cache import bump_version, invalidate_recipes
+from .feed import fans_out, follow, followers_count, unfollow
+from .matching import record_changes
+from .models import (Carts, Favorite, Ingredient, Recipe, RecipeIngredient,
+                     ShoppingListItem, Subscribe, Tag, tags_mask)
+from .search import update_search_index
+
+AUTHOR_FIELDS = {'email', 'username', 'first_name', 'last_name'}
+COUNTERS = {Favorite: 'favorites_count', Carts: 'carts_count'}
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def ingredients_changed(**kwargs):
+    transaction.on_commit(lambda: bump_version('ingredients'))
+
+
+@receiver((post_save, post_delete), sender=Tag)
+def tags_changed(**kwargs):
+    transaction.on_commit(lambda: bump_version('tags'))
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+def recipe_changed(instance, **kwargs):
+    # Кеш сбрасывается после фиксации: иначе параллельный запрос успеет
+    # закешировать ещё не изменённый рецепт.
+    pk = instance.pk
+    transaction.on_commit(lambda: invalidate_recipes([pk]))
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_saved(instance, **kwargs):
+    # Ингредиенты пишутся после сохранения рецепта в той же транзакции.
+    transaction.on_commit(lambda: update_search_index([instance.pk]))
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+def recipe_ingredients_changed(instance, **kwargs):
+    # Django обнуляет pk удалённого объекта до фиксации транзакции.
+    pk = instance.pk
+    transaction.on_commit(lambda: record_changes([pk]))
+
+
+@receiver(pre_delete, sender=Ingredient)
+def ingredient_removed(instance, **kwargs):
+    # Рецепты читаются до каскадного удаления их строк.
+    pks = list(instance.recipes.values_list('pk', flat=True))
+    transaction.on_commit(lambda: record_changes(pks))
+
+
+@receiver(post_save, sender=Ingredient)
+def ingredient_saved(instance, created, **kwargs):
+    if not created:
+        transaction.on_commit(lambda: update_search_index(
+            instance.recipes.values_list('pk', flat=True)
+        ))
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_created(instance, created, **kwargs):
+    if created:
+        User.increment(instance.author_id, 'recipes_count')
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_deleted(instance, **kwargs):
+    User.increment(instance.author_id, 'recipes_count', -1)
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_published(instance, created, **kwargs):
+    if not created:
+        return
+    count = followers_count(instance.author_id)
+    if count and fans_out(count):
+        enqueue('recipes.fan_out', recipe_id=instance.pk)
+
+
+@receiver(post_save, sender=Subscribe)
+def author_followed(instance, created, **kwargs):
+    if created:
+        follow(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Subscribe)
+def author_unfollowed(instance, **kwargs):
+    unfollow(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=Carts)
+def recipe_listed(sender, instance, created, **kwargs):
+    if created:
+        Recipe.increment(instance.recipe_id, COUNTERS[sender])
+
+
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=Carts)
+def recipe_unlisted(sender, instance, **kwargs):
+    Recipe.increment(instance.recipe_id, COUNTERS[sender], -1)
+
+
+@receiver((post_save, post_delete), sender=RecipeIngredient)
+def recipe_ingredient_changed(instance, **kwargs):
+    pk = instance.recipe_id
+    transaction.on_commit(lambda: invalidate_recipes([pk]))
+
+
+@receiver((post_save, post_delete), sender=Carts)
+def cart_changed(instance, created=False, signal=None, **kwargs):
+    # Изменённая корзина могла указывать на другой рецепт: список
+    # пользователя пересчитывается целиком.
+    ingredients = None
+    if created or signal is post_delete:
+        ingredients = RecipeIngredient.objects.filter(
+            recipe=instance.recipe_id
+        ).values_list('ingredient', flat=True)
+    ShoppingListItem.objects.refresh_on_commit([instance.user_id],
+                                               ingredients)
+
+
+@receiver((post_save, post_delete), sender=RecipeIngredient)
+def recipe_amount_changed(instance, created=False, signal=None, **kwargs):
+    ingredients = None
+    if created or signal is post_delete:
+        ingredients = [instance.ingredient_id]
+    ShoppingListItem.objects.refresh_on_commit(Carts.objects.filter(
+        recipe=instance.recipe_id
+    ).values_list('user', flat=True), ingredients)
+
+
+@receiver(pre_delete, sender=Recipe)
+def recipe_removed_from_lists(instance, **kwargs):
+    # Корзины и ингредиенты читаются до каскадного удаления: при
+    # удалении их собственных строк другой из них может уже не быть.
+    ShoppingListItem.objects.refresh_on_commit(
+        instance.carts.values_list('user', flat=True),
+        instance.recipe_ingredients.values_list('ingredient', flat=True)
+    )
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipe_tags_changed(instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        pks = [instance.pk]
+        transaction.on_commit(lambda: invalidate_recipes(pks))
+    elif pk_set:
+        pks = list(pk_set)
+        transaction.on_commit(lambda: invalidate_recipes(pks))
+    else:
+        transaction.on_commit(lambda: bump_version('tags'))
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def sync_tags_mask(instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        instance.tags_mask = tags_mask(
+            instance.tags.values_list('pk', flat=True)
+        )
+        Recipe.objects.filter(pk=instance.pk).update(
+            tags_mask=instance.tags_mask
+        )
+        return
+    bit = tags_mask([instance.pk])
+    if not bit:
+        return
+    recipes = Recipe.objects.all()
+    if pk_set is not None:
+        recipes = recipes.filter(pk__in=pk_set)
+    if action == 'post_add':
+        recipes.update(tags_mask=F('tags_mask').bitor(bit))
+    else:
+        clear_tag_bit(recipes, bit)
+
+
+@receiver(post_delete, sender=Tag)
+def tag_deleted(instance, **kwargs):
+    bit = tags_mask([instance.pk])
+    if bit:
+        clear_tag_bit(Recipe.objects.all(), bit)
+
+
+def clear_tag_bit(recipes, bit):
+    recipes.alias(tag_bit=F('tags_mask').bitand(bit)).filter(
+        tag_bit=bit
+    ).update(tags_mask=F('tags_mask').bitand(~bit))
+
+
+@receiver(post_save, sender=User)
+def author_changed(instance, created, update_fields, **kwargs):
+    if created or (update_fields and not AUTHOR_FIELDS & set(update_fields)):
+        return
+    transaction.on_commit(lambda: invalidate_recipes(
+        instance.recipes.values_list('pk', flat=True)
+    ))
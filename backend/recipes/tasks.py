@@ -0,0 +1,23 @@
+from jobs.runner import task
+from .feed import backfill, fan_out, fan_out_author
+from .image_variants import make_variants
+
+
+@task('recipes.make_variants')
+def make_image_variants(recipe_id):
+    make_variants(recipe_id)
+
+
+@task('recipes.fan_out')
+def fan_out_recipe(recipe_id):
+    fan_out(recipe_id)
+
+
+@task('recipes.fan_out_author')
+def fan_out_author_recipes(author_id):
+    fan_out_author(author_id)
+
+
+@task('recipes.backfill_feed')
+def backfill_feed(user_id, author_id):
+    backfill(user_id, author_id)
@@ -0,0 +1,63 @@
+import pytest
+from django.core.cache import cache
+
+from api.filters import tag_ids
+from api.management.seeding import (add_to_lists, create_ingredients,
+                                    create_recipes, create_tags, create_users,
+                                    get_client, subscribe)
+from recipes.autocomplete import ingredient_index
+from recipes.matching import ingredient_match
+from recipes.models import ShoppingListItem
+
+
+@pytest.fixture(autouse=True)
+def local_cache(settings):
+    """Отдельный кеш в памяти на каждый тест."""
+    settings.CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+    settings.JOBS_EAGER = False
+    cache.clear()
+    ingredient_match.index = None
+    # Значения прошлого теста устарели бы без пересборки в запросе.
+    tag_ids.reset()
+    ingredient_index.reset()
+    yield
+    cache.clear()
+
+
+@pytest.fixture
+def user(db):
+    user, = create_users(1, prefix='user')
+    return user
+
+
+@pytest.fixture
+def authors(db):
+    return create_users(5, prefix='author')
+
+
+@pytest.fixture
+def recipes(authors):
+    return create_recipes(
+        authors, 4, ingredients=create_ingredients(10), tags=create_tags(3),
+        ingredients_per_recipe=3
+    )
+
+
+@pytest.fixture
+def user_client(user):
+    return get_client(user)
+
+
+@pytest.fixture
+def subscriptions(user, authors, recipes):
+    subscribe(user, authors)
+
+
+@pytest.fixture
+def cart(user, recipes):
+    add_to_lists([user], recipes, 8)
+    ShoppingListItem.objects.rebuild()
@@ -0,0 +1,42 @@
+import pytest
+from django.test import TestCase
+from rest_framework.authtoken.models import Token
+
+from api.authentication import CachedTokenAuthentication, tokens
+
+
+@pytest.fixture
+def token(user):
+    token, _ = Token.objects.get_or_create(user=user)
+    yield token
+    tokens.delete(token.key)
+
+
+@pytest.mark.django_db
+def test_cached_token_skips_database(token, django_assert_num_queries):
+    authentication = CachedTokenAuthentication()
+    with django_assert_num_queries(1):
+        authentication.authenticate_credentials(token.key)
+    with django_assert_num_queries(0):
+        user, _ = authentication.authenticate_credentials(token.key)
+    assert user == token.user
+
+
+@pytest.mark.django_db
+def test_logout_revokes_cached_token(user_client, token):
+    assert user_client.get('/api/users/me/').status_code == 200
+    with TestCase.captureOnCommitCallbacks(execute=True):
+        response = user_client.post('/api/auth/token/logout/')
+    assert response.status_code == 204
+    assert user_client.get('/api/users/me/').status_code == 401
+
+
+@pytest.mark.django_db
+def test_user_change_refreshes_cached_user(user_client, user, token):
+    user_client.get('/api/users/me/')
+    with TestCase.captureOnCommitCallbacks(execute=True):
+        user.first_name = 'Новое имя'
+        user.save()
+    response = user_client.get('/api/users/me/')
+    assert response.status_code == 200
+    assert response.data['first_name'] == 'Новое имя'
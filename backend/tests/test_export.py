@@ -0,0 +1,48 @@
+import os
+import re
+
+import pytest
+from django.conf import settings
+
+from api.exporters import export
+
+font_missing = pytest.mark.skipif(
+    not os.path.exists(settings.SHOPPING_CART_FONT),
+    reason='Нет шрифта для PDF'
+)
+
+LONG_NAME = 'Очень длинное название ингредиента ' * 8
+
+
+def pdf(rows):
+    return b''.join(export(iter(rows), 'pdf'))
+
+
+def pages(data):
+    return int(re.search(rb'/Count (\d+)', data).group(1))
+
+
+@font_missing
+def test_pdf_embeds_font_subset():
+    data = pdf([('Соль', 'г', 5), ('Мука', 'г', 500)])
+    assert data.startswith(b'%PDF-')
+    assert data.rstrip().endswith(b'%%EOF')
+    assert len(data) < os.path.getsize(settings.SHOPPING_CART_FONT) / 10
+
+
+@font_missing
+def test_pdf_pages_and_wrapping():
+    short = [(f'Ингредиент {n}', 'г', n) for n in range(100)]
+    assert pages(pdf(short)) == 3
+    # Длинные строки переносятся и занимают больше страниц.
+    assert pages(pdf([(LONG_NAME, 'г', n) for n in range(40)])) > 1
+
+
+@pytest.mark.django_db
+def test_pdf_without_font(settings, user_client):
+    settings.SHOPPING_CART_FONT = '/nonexistent/font.ttf'
+    response = user_client.get(
+        '/api/recipes/download_shopping_cart/?format=pdf'
+    )
+    assert response.status_code == 503
+    assert 'шрифт' in response.json()['errors']
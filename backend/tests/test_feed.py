@@ -0,0 +1,31 @@
+import pytest
+
+from jobs.models import Job
+from jobs.runner import TASKS
+from recipes.models import FeedItem
+
+
+@pytest.mark.django_db
+def test_follow_backfills_feed_in_job(user_client, user, authors, recipes):
+    author = authors[0]
+    response = user_client.post(f'/api/users/{author.pk}/subscribe/')
+    assert response.status_code == 201
+    assert not FeedItem.objects.filter(user=user).exists()
+    job = Job.objects.get(name='recipes.backfill_feed')
+    TASKS[job.name](**job.payload)
+    assert set(FeedItem.objects.filter(user=user).values_list(
+        'recipe', flat=True
+    )) == {recipe.pk for recipe in recipes if recipe.author == author}
+
+
+@pytest.mark.django_db
+def test_backfill_skips_cancelled_subscription(user_client, user, authors,
+                                               recipes):
+    author = authors[0]
+    user_client.post(f'/api/users/{author.pk}/subscribe/')
+    assert user_client.delete(
+        f'/api/users/{author.pk}/subscribe/'
+    ).status_code == 204
+    job = Job.objects.get(name='recipes.backfill_feed')
+    TASKS[job.name](**job.payload)
+    assert not FeedItem.objects.filter(user=user).exists()
@@ -0,0 +1,24 @@
+from io import StringIO
+
+import pytest
+from django.core.management import CommandError, call_command
+
+from recipes.models import Ingredient
+
+
+@pytest.mark.django_db
+def test_importcsv_reports_short_row(tmp_path):
+    path = tmp_path / 'ingredients.csv'
+    path.write_text('соль,г\n\nперец\n', encoding='UTF-8')
+    with pytest.raises(CommandError, match='Строка 3'):
+        call_command('importcsv', path=str(path), no_copy=True)
+
+
+@pytest.mark.django_db
+def test_importcsv(tmp_path):
+    path = tmp_path / 'ingredients.csv'
+    path.write_text('соль,г\n\nперец,г\n', encoding='UTF-8')
+    call_command('importcsv', path=str(path), stdout=StringIO())
+    assert set(Ingredient.objects.values_list(
+        'name', 'measurement_unit'
+    )) >= {('соль', 'г'), ('перец', 'г')}
@@ -0,0 +1,27 @@
+import threading
+
+from recipes.cache import LocalCache, bump_version, refresher
+
+
+def test_local_cache_refreshes_in_background():
+    """После смены версии запрос получает прежнее значение, а новое
+    строится в фоновом потоке."""
+    builds = []
+    release = threading.Event()
+
+    def build():
+        if builds:
+            release.wait(5)
+        builds.append(len(builds) + 1)
+        return builds[-1]
+
+    local = LocalCache('test', build)
+    assert local.get() == 1
+    bump_version('test')
+    assert local.get() == 1
+    assert local.get() == 1
+    release.set()
+    # Поток обновления один: следующая задача ждёт завершения сборки.
+    refresher.submit(lambda: None).result()
+    assert local.get() == 2
+    assert builds == [1, 2]
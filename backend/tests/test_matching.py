@@ -0,0 +1,53 @@
+import random
+
+from recipes.matching import IngredientMatchIndex
+
+
+def state(index):
+    """Содержимое индекса без пустых множеств и хвостовых нулей."""
+    postings = {
+        ingredient: (postings if isinstance(postings, int)
+                     else sum(1 << recipe for recipe in postings))
+        for ingredient, postings in index.postings.items()
+    }
+    sizes = list(index.sizes)
+    while sizes and not sizes[-1]:
+        sizes.pop()
+    return {
+        'postings': {key: value for key, value in postings.items() if value},
+        'ingredients': {recipe: sorted(values)
+                        for recipe, values in index.ingredients.items()},
+        'sizes': sizes,
+        'by_size': {key: value for key, value in index.by_size.items()
+                    if value},
+    }
+
+
+def build(recipes):
+    return IngredientMatchIndex(
+        (recipe, ingredient)
+        for recipe, ingredients in recipes.items()
+        for ingredient in ingredients
+    )
+
+
+def test_update_matches_rebuilt_index():
+    """Обновление рецептов даёт тот же индекс, что и построение
+    заново."""
+    generator = random.Random(0)
+    # Ингредиент 1 есть в половине рецептов и хранится битовым
+    # множеством, остальные — массивами.
+    recipes = {recipe: [*generator.sample(range(2, 30), 3),
+                        *([1] if recipe % 2 else [])]
+               for recipe in range(1, 200)}
+    index = build(recipes)
+    changed = generator.sample(sorted(recipes), 20)
+    for recipe in changed[:10]:
+        recipes[recipe] = generator.sample(range(1, 40), 3)
+    for recipe in changed[10:]:
+        del recipes[recipe]
+    recipes[300] = [1, 2]
+    rows = [(recipe, ingredient) for recipe in [*changed[:10], 300]
+            for ingredient in recipes[recipe]]
+    index.update([*changed, 300], rows)
+    assert state(index) == state(build(recipes))
@@ -0,0 +1,40 @@
+from importlib import import_module
+
+import pytest
+
+from api.management.seeding import create_ingredients
+from recipes.models import RecipeIngredient, ShoppingListItem
+
+merge_amounts = import_module(
+    'recipes.migrations.0004_unique_ingredient_unit'
+).merge_amounts
+
+
+@pytest.mark.django_db
+def test_merge_duplicate_ingredients(user, recipes):
+    keep, first, second, other = create_ingredients(4)
+    recipe, alone = recipes[:2]
+    RecipeIngredient.objects.bulk_create([
+        RecipeIngredient(recipe=recipe, ingredient=keep, amount=1),
+        RecipeIngredient(recipe=recipe, ingredient=first, amount=2),
+        RecipeIngredient(recipe=recipe, ingredient=second, amount=3),
+        RecipeIngredient(recipe=alone, ingredient=first, amount=4),
+        RecipeIngredient(recipe=alone, ingredient=other, amount=5),
+    ])
+    ShoppingListItem.objects.bulk_create([
+        ShoppingListItem(user=user, ingredient=first, amount=10),
+        ShoppingListItem(user=user, ingredient=second, amount=20),
+    ])
+    merge_amounts(RecipeIngredient, 'recipe', keep.pk,
+                  [first.pk, second.pk])
+    merge_amounts(ShoppingListItem, 'user', keep.pk, [first.pk, second.pk])
+    ingredients = [keep, first, second, other]
+    assert set(RecipeIngredient.objects.filter(
+        ingredient__in=ingredients
+    ).values_list('recipe', 'ingredient', 'amount')) == {
+        (recipe.pk, keep.pk, 6), (alone.pk, keep.pk, 4),
+        (alone.pk, other.pk, 5),
+    }
+    assert list(ShoppingListItem.objects.values_list(
+        'user', 'ingredient', 'amount'
+    )) == [(user.pk, keep.pk, 30)]
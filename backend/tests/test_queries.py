@@ -0,0 +1,204 @@
+"""Число запросов к базе данных на основных страницах API.
+
+Число не должно зависеть от размера страницы: рост означает запросы
+на каждый объект выдачи. Содержимое ответов сверяется с данными,
+прочитанными из базы напрямую, без предзагрузок и аннотаций выдачи.
+"""
+import pytest
+
+from recipes.models import Carts, Favorite, Recipe, Subscribe
+
+TAGS = {'bench-tag-0', 'bench-tag-1'}
+
+
+@pytest.fixture
+def viewer(user, authors, cart):
+    """Флаги пользователя различаются между рецептами: подписка только
+    на первого автора, избранное не совпадает со списком покупок."""
+    Subscribe.objects.create(user=user, author=authors[0])
+    Favorite.objects.filter(user=user).first().delete()
+
+
+def expected_recipe(recipe, user):
+    """Поля рецепта для пользователя user по данным таблиц."""
+    listed = {'user': user, 'recipe': recipe} if user.is_authenticated else {}
+    return {
+        'id': recipe.pk,
+        'author': recipe.author_id,
+        'is_subscribed': bool(listed) and Subscribe.objects.filter(
+            user=user, author=recipe.author_id
+        ).exists(),
+        'tags': set(recipe.tags.values_list('slug', flat=True)),
+        'ingredients': recipe.ingredient_amounts(),
+        'is_favorited': bool(listed)
+        and Favorite.objects.filter(**listed).exists(),
+        'is_in_shopping_cart': bool(listed)
+        and Carts.objects.filter(**listed).exists(),
+    }
+
+
+def received_recipe(data):
+    return {
+        'id': data['id'],
+        'author': data['author']['id'],
+        'is_subscribed': data['author']['is_subscribed'],
+        'tags': {tag['slug'] for tag in data['tags']},
+        'ingredients': {item['id']: item['amount']
+                        for item in data['ingredients']},
+        'is_favorited': data['is_favorited'],
+        'is_in_shopping_cart': data['is_in_shopping_cart'],
+    }
+
+
+def check_recipes(response, user, limit, matches=lambda recipe: True):
+    """Страница содержит первые limit подходящих рецептов с верными
+    флагами, тегами и ингредиентами."""
+    expected = [
+        data for data in (
+            expected_recipe(recipe, user)
+            for recipe in Recipe.objects.order_by('-pub_date', '-id')
+        ) if matches(data)
+    ]
+    assert [received_recipe(data) for data in response.data['results']] == (
+        expected[:limit]
+    )
+    if 'count' in response.data:
+        assert response.data['count'] == len(expected)
+
+
+def get(client, path, method='get'):
+    response = getattr(client, method)(path)
+    if response.streaming:
+        b''.join(response.streaming_content)
+    return response
+
+
+@pytest.mark.parametrize('limit', (2, 10))
+@pytest.mark.parametrize('query, expected, matches', (
+    # Токен, COUNT(*), страница, авторы, теги, ингредиенты рецептов
+    # и сами ингредиенты.
+    ('', 7, lambda recipe, author: True),
+    ('pagination=cursor&', 6, lambda recipe, author: True),
+    ('is_favorite=true&', 7, lambda recipe, author: recipe['is_favorited']),
+    ('is_in_shopping_cart=true&', 7,
+     lambda recipe, author: recipe['is_in_shopping_cart']),
+    # Фильтр проверяет значения параметра отдельным запросом.
+    ('tags=bench-tag-0&tags=bench-tag-1&', 8,
+     lambda recipe, author: recipe['tags'] & TAGS),
+    ('author={author}&', 8,
+     lambda recipe, author: recipe['author'] == author),
+))
+def test_recipe_list(user_client, user, authors, viewer,
+                     django_assert_num_queries, query, expected, matches,
+                     limit):
+    author = authors[0].pk
+    path = f'/api/recipes/?{query}limit={limit}'.format(author=author)
+    with django_assert_num_queries(expected):
+        response = get(user_client, path)
+    assert response.status_code == 200
+    check_recipes(response, user, limit,
+                  lambda recipe: matches(recipe, author))
+
+
+@pytest.mark.parametrize('limit', (2, 10))
+def test_recipe_list_anonymous(client, recipes, django_assert_num_queries,
+                               limit):
+    with django_assert_num_queries(6):
+        response = get(client, f'/api/recipes/?limit={limit}')
+    assert response.status_code == 200
+    check_recipes(response, response.wsgi_request.user, limit)
+
+
+@pytest.mark.parametrize('ordering, status', (
+    ('pub_date', 200),
+    ('-pub_date', 200),
+    ('favorites_count', 400),
+    ('-favorites_count', 400),
+))
+def test_recipe_cursor_ordering(user_client, recipes, ordering, status):
+    """Курсор по числу избранного пропускал бы и повторял рецепты."""
+    response = get(user_client, '/api/recipes/?pagination=cursor'
+                                f'&ordering={ordering}')
+    assert response.status_code == status
+    assert get(user_client, f'/api/recipes/?ordering={ordering}'
+               ).status_code == 200
+
+
+def test_recipe_list_cached(user_client, user, viewer,
+                            django_assert_num_queries):
+    get(user_client, '/api/recipes/?limit=10')
+    # Флаги пользователя не кешируются вместе с рецептами.
+    Favorite.objects.filter(user=user).delete()
+    # Токен и представления рецептов берутся из кеша, флаги
+    # пользователя читаются вместе со страницей.
+    with django_assert_num_queries(2):
+        response = get(user_client, '/api/recipes/?limit=10')
+    assert response.status_code == 200
+    check_recipes(response, user, 10)
+
+
+def test_recipe_detail(user_client, user, viewer,
+                       django_assert_num_queries):
+    recipe = Carts.objects.filter(user=user).first().recipe
+    with django_assert_num_queries(6):
+        response = get(user_client, f'/api/recipes/{recipe.pk}/')
+    assert response.status_code == 200
+    assert received_recipe(response.data) == expected_recipe(recipe, user)
+    assert response.data['is_in_shopping_cart']
+
+
+@pytest.mark.parametrize('limit', (2, 5))
+@pytest.mark.parametrize('query', ('', 'recipes_limit=2&'))
+def test_subscriptions(user_client, subscriptions, django_assert_num_queries,
+                       query, limit):
+    # Токен, COUNT(*), авторы и их рецепты одним запросом.
+    with django_assert_num_queries(4):
+        response = get(user_client,
+                       f'/api/users/subscriptions/?{query}limit={limit}')
+    assert response.status_code == 200
+    assert len(response.data['results']) == limit
+    recipes_limit = 2 if query else None
+    for author in response.data['results']:
+        assert author['is_subscribed']
+        recipes = Recipe.objects.filter(author=author['id'])
+        assert author['recipes_count'] == recipes.count()
+        assert [recipe['id'] for recipe in author['recipes']] == list(
+            recipes.order_by('-pub_date', '-id').values_list(
+                'pk', flat=True
+            )[:recipes_limit]
+        )
+
+
+def test_subscriptions_cursor(user_client, subscriptions,
+                              django_assert_num_queries):
+    with django_assert_num_queries(3):
+        response = get(user_client,
+                       '/api/users/subscriptions/?pagination=cursor&limit=2')
+    assert response.status_code == 200
+    assert response.data['next'] is not None
+    # Курсор проходит авторов в том же порядке, что и номера страниц.
+    seen = []
+    while response.data['next']:
+        seen.extend(author['id'] for author in response.data['results'])
+        response = get(user_client, response.data['next'])
+    seen.extend(author['id'] for author in response.data['results'])
+    pages = get(user_client, '/api/users/subscriptions/?limit=100')
+    assert seen == [author['id'] for author in pages.data['results']]
+
+
+def test_download_shopping_cart(user_client, cart,
+                                django_assert_num_queries):
+    # Список покупок хранится готовым и читается одним запросом.
+    with django_assert_num_queries(2):
+        response = get(user_client, '/api/recipes/download_shopping_cart/')
+    assert response.status_code == 200
+
+
+def test_shopping_cart_add_remove(user_client, cart, recipes,
+                                  django_assert_max_num_queries):
+    path = f'/api/recipes/{recipes[-1].pk}/shopping_cart/'
+    get(user_client, '/api/users/me/')
+    with django_assert_max_num_queries(13):
+        assert get(user_client, path, 'post').status_code == 201
+    with django_assert_max_num_queries(14):
+        assert get(user_client, path, 'delete').status_code == 204
@@ -0,0 +1,18 @@
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+
+pytestmark = pytest.mark.skipif(
+    connection.vendor != 'postgresql',
+    reason='Оценки числа строк в планах есть только у PostgreSQL'
+)
+
+
+@pytest.mark.django_db
+def test_recipe_list_plans():
+    """Список рецептов со всеми сочетаниями фильтров обходится без
+    полного сканирования и сортировки больших таблиц."""
+    call_command('check_query_plans', authors=1000, recipes_per_author=20,
+                 ingredients=500, stdout=StringIO())
@@ -0,0 +1,46 @@
+from urllib.parse import quote
+
+import pytest
+from django.db import connection
+
+from recipes.models import Recipe
+from recipes.search import update_search_index
+
+SEARCH = quote('борщ')
+
+pytestmark = pytest.mark.skipif(
+    connection.vendor != 'postgresql',
+    reason='Полнотекстовый поиск есть только в PostgreSQL'
+)
+
+
+@pytest.fixture
+def found(recipes):
+    """Рецепты со словом «борщ» в названии, описании или в обоих."""
+    for n, recipe in enumerate(recipes[:7]):
+        recipe.name = 'Борщ' if n % 3 else recipe.name
+        recipe.text = 'Борщ со сметаной' if n % 3 != 1 else recipe.text
+        if n % 3 == 0:
+            recipe.text = 'Борщ и ещё раз борщ'
+    Recipe.objects.bulk_update(recipes[:7], ('name', 'text'))
+    update_search_index([recipe.pk for recipe in recipes])
+    return {recipe.pk for recipe in recipes[:7]}
+
+
+def test_search(user_client, found):
+    response = user_client.get(f'/api/recipes/?search={SEARCH}&limit=50')
+    assert response.status_code == 200
+    assert {recipe['id'] for recipe in response.data['results']} == found
+
+
+def test_search_cursor_pages(user_client, found):
+    """Курсорная выдача поиска по релевантности проходит все страницы."""
+    path = f'/api/recipes/?search={SEARCH}&pagination=cursor&limit=2'
+    seen = []
+    while path:
+        response = user_client.get(path)
+        assert response.status_code == 200
+        seen.extend(recipe['id'] for recipe in response.data['results'])
+        path = response.data['next']
+    assert len(seen) == len(set(seen))
+    assert set(seen) == found
@@ -0,0 +1,61 @@
+import pytest
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from api.management.seeding import get_client
+from recipes.models import Carts, ShoppingListItem
+
+# Списки покупок пересчитываются после фиксации транзакции.
+committed = TestCase.captureOnCommitCallbacks
+
+
+def shopping_list(user):
+    return dict(ShoppingListItem.objects.filter(user=user).values_list(
+        'ingredient', 'amount'
+    ))
+
+
+def stored():
+    return set(ShoppingListItem.objects.values_list(
+        'user', 'ingredient', 'amount'
+    ))
+
+
+@pytest.mark.django_db
+def test_shopping_list_follows_cart_and_recipe(user_client, user, recipes):
+    recipe = recipes[0]
+    path = f'/api/recipes/{recipe.pk}/'
+    amounts = recipe.ingredient_amounts()
+    with committed(execute=True):
+        assert user_client.post(f'{path}shopping_cart/').status_code == 201
+    assert shopping_list(user) == amounts
+    ingredient, *_ = amounts
+    with committed(execute=True):
+        response = get_client(recipe.author).patch(path, {
+            'ingredients': [{'id': ingredient, 'amount': 7}],
+        }, format='json')
+    assert response.status_code == 200, response.data
+    assert shopping_list(user) == {ingredient: 7}
+    with committed(execute=True):
+        assert user_client.delete(f'{path}shopping_cart/').status_code == 204
+    assert shopping_list(user) == {}
+
+
+@pytest.mark.django_db
+def test_shopping_list_follows_orm_deletes(user, cart, recipes):
+    """Удаление корзины и рецепта мимо API тоже меняет списки."""
+    cart = Carts.objects.filter(user=user).first()
+    with committed(execute=True):
+        cart.delete()
+    with committed(execute=True):
+        Carts.objects.filter(user=user).first().recipe.delete()
+    assert stored() == set(ShoppingListItem.objects.expected())
+    assert ShoppingListItem.objects.filter(user=user).exists()
+
+
+@pytest.mark.django_db
+def test_verify_finds_drift(user, cart):
+    call_command('rebuild_shopping_lists', verify=True)
+    ShoppingListItem.objects.filter(user=user).first().delete()
+    with pytest.raises(CommandError, match='Расхождений.*: 1,'):
+        call_command('rebuild_shopping_lists', verify=True)
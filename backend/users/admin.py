@@ -1,12 +1,14 @@
 from django.contrib import admin
 
+from foodgram.admin_utils import LargeTableAdmin
 from .models import User
 
 
-class UserAdmin(admin.ModelAdmin):
-    list_display = ('id', 'username', 'email', 'first_name', 'last_name')
-    search_fields = ('username', 'email', 'first_name', 'last_name')
-    list_filter = ('username', 'email')
+class UserAdmin(LargeTableAdmin):
+    list_display = ('id', 'username', 'email', 'first_name', 'last_name',
+                    'recipes_count')
+    search_fields = ('^username', '^email')
+    list_filter = ('is_staff', 'is_active')
     empty_value_display = '-пусто-'
 
 
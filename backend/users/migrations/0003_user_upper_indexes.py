@@ -0,0 +1,36 @@
+from django.db import migrations
+
+INDEXES = (
+    ('user_username_upper_idx', 'username'),
+    ('user_email_upper_idx', 'email'),
+)
+
+
+def create_upper_indexes(apps, schema_editor):
+    # Индексы по выражению не объявлены в модели: SQLite в Django 3.2
+    # не может пересоздать с ними таблицу при следующих миграциях.
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, column in INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX IF NOT EXISTS {name} '
+            f'ON users_user (UPPER({column}::text))'
+        )
+
+
+def drop_upper_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _ in INDEXES:
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_user_recipes_count'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_upper_indexes, drop_upper_indexes),
+    ]
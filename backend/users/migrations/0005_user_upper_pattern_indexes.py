@@ -0,0 +1,33 @@
+from django.db import migrations
+
+from foodgram.migration_utils import postgresql_index
+
+# Поиск в админке по префиксу (^username) выполняется как
+# UPPER(username::text) LIKE 'ABC%': обычный btree-индекс для LIKE
+# не подходит при локали, отличной от C, нужен text_pattern_ops.
+# Он же обслуживает и точное сравнение, поэтому старые индексы не нужны.
+COLUMNS = ('username', 'email')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0004_user_followers_count'),
+    ]
+
+    operations = [
+        *(
+            postgresql_index(
+                f'user_{column}_upper_idx', 'users_user',
+                f'(UPPER({column}::text))', remove=True
+            )
+            for column in COLUMNS
+        ),
+        *(
+            postgresql_index(
+                f'user_{column}_upper_pattern_idx', 'users_user',
+                f'(UPPER({column}::text) text_pattern_ops)'
+            )
+            for column in COLUMNS
+        ),
+    ]
@@ -2,8 +2,10 @@ from django.conf import settings
 from django.contrib.auth.models import AbstractUser
 from django.db import models
 
+from foodgram.counters import CountersMixin
 
-class User(AbstractUser):
+
+class User(CountersMixin, AbstractUser):
     username = models.CharField(
         'Логин',
         max_length=settings.LEN_NAME_USER,
@@ -26,11 +28,25 @@ class User(AbstractUser):
         'Пароль',
         max_length=settings.LEN_PASSWORD
     )
+    recipes_count = models.PositiveIntegerField(
+        'Число рецептов',
+        default=0,
+        editable=False
+    )
+    followers_count = models.PositiveIntegerField(
+        'Число подписчиков',
+        default=0,
+        editable=False
+    )
+
+    counter_fields = ('recipes_count', 'followers_count')
 
     class Meta:
         ordering = ('username',)
         verbose_name = 'Пользователь'
         verbose_name_plural = 'Пользователи'
+        # Индексы по UPPER(username) и UPPER(email) для поиска без учёта
+        # регистра создаются миграцией 0003 только в PostgreSQL.
 
     def __str__(self) -> str:
         return f'{self.username}, {self.email}'